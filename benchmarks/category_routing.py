@@ -0,0 +1,43 @@
+"""
+Бенчмарк визначення категорії за префіксом артикулу (get_category_by_prefix):
+trie порівнюється за часом з перевіркою префіксів по черзі (як до trie) на рядках файлу.
+Паритет результатів перевіряє tests/test_category_routing.py
+
+Запуск: python -m benchmarks.category_routing [кількість_рядків]
+"""
+import random
+import sys
+import time
+from utils.sheets_utils import CATEGORY_PREFIXES, get_category_by_prefix
+
+
+def linear_category_by_prefix(art):
+    """Еталон: перевірка префіксів по черзі, перший збіг виграє"""
+    art_upper = art.upper() if art else ""
+    for prefix, categories in CATEGORY_PREFIXES.items():
+        if art_upper.startswith(prefix.upper()):
+            return categories
+    return None
+
+
+def make_arts(rows_count, distinct_arts=5000, seed=0):
+    """Артикули рядків файлу: rows_count рядків з distinct_arts різних артикулів"""
+    rng = random.Random(seed)
+    prefixes = list(CATEGORY_PREFIXES)
+    arts = [f"{rng.choice(prefixes)}-{i}" for i in range(distinct_arts)]
+    return [rng.choice(arts) for _ in range(rows_count)]
+
+
+def run(rows_count=100000):
+    arts = make_arts(rows_count)
+    for name, func in (("по черзі", linear_category_by_prefix), ("trie + кеш", get_category_by_prefix)):
+        get_category_by_prefix.cache_clear()
+        started = time.perf_counter()
+        for art in arts:
+            func(art)
+        elapsed = time.perf_counter() - started
+        print(f"{name}: {rows_count} рядків: {elapsed * 1000:.1f} мс")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,80 @@
+"""
+Бенчмарк Excel звіту: звичайна книга в пам'яті проти потокового запису (write_only)
+
+Запуск: python -m benchmarks.excel_export [кількість_рядків]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from benchmarks.reconcile import SIZES
+from utils.excel_generator import write_workbook, write_workbook_streaming
+from utils.reconciliation_results import SizeDiff, format_size_diffs
+
+ROW_TYPES = ['extra', 'matched', 'not_scanned', 'not_scanned', 'not_scanned', 'missing', 'not_found']
+
+
+def make_rows(rows_count, seed=0):
+    """Синтетичні рядки звіту (як build_report_rows), переважно "не відскановано" """
+    rng = random.Random(seed)
+    file_rows = []
+    for i in range(rows_count):
+        art = f"Дж-{i}"
+        row_type = rng.choice(ROW_TYPES)
+        sizes = rng.sample(SIZES, 4)
+        diffs = [SizeDiff(art, size, rng.randint(0, 2), rng.randint(1, 3)) for size in sizes[:2]]
+        file_rows.append({
+            'art': art,
+            'sizes': ', '.join(sizes),
+            'missing': 'Не відскановано' if row_type == 'not_scanned' else (
+                format_size_diffs(diffs) if row_type == 'missing' else ''),
+            'extra': format_size_diffs(diffs) if row_type == 'extra' else '',
+            'type': row_type
+        })
+    stats = {'total_sizes': rows_count * 4, 'matched_sizes': rows_count, 'missing_sizes': rows_count // 7,
+             'not_scanned_sizes': rows_count * 2}
+    return file_rows, stats
+
+
+def _write(writer, file_rows, stats, traced):
+    fd, file_path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+    try:
+        if traced:
+            tracemalloc.start()
+        started = time.perf_counter()
+        writer(file_rows, stats, file_path)
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] if traced else 0
+    finally:
+        if traced:
+            tracemalloc.stop()
+        if os.path.exists(file_path):
+            os.remove(file_path)
+    return elapsed, peak
+
+
+def measure(writer, file_rows, stats):
+    """
+    (секунди, пікова пам'ять в байтах) одного запису звіту
+    Час і пам'ять вимірюються окремими прогонами - tracemalloc суттєво сповільнює запис
+    """
+    elapsed, _ = _write(writer, file_rows, stats, traced=False)
+    _, peak = _write(writer, file_rows, stats, traced=True)
+    return elapsed, peak
+
+
+def run(rows_count=20000):
+    file_rows, stats = make_rows(rows_count)
+    results = {}
+    for name, writer in (("write_workbook", write_workbook), ("write_workbook_streaming", write_workbook_streaming)):
+        elapsed, peak = measure(writer, file_rows, stats)
+        results[name] = (elapsed, peak)
+        print(f"{name}: {rows_count} рядків: {elapsed * 1000:.0f} мс, пік пам'яті {peak / 1024 / 1024:.1f} МБ")
+    return results
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
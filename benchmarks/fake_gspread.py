@@ -0,0 +1,155 @@
+"""
+Заміна клієнта gspread для бенчмарків: таблиці в пам'яті з затримкою на кожен запит
+
+Підтримує виклики, якими бот читає таблиці: open_by_key, worksheets, get_worksheet,
+get_all_values, values_batch_get (діапазони 'Лист'!L:L та 'Лист'!A:P, majorDimension ROWS / COLUMNS)
+та get_lastUpdateTime
+"""
+import threading
+import time
+
+
+def column_number(letters):
+    """Буквене позначення колонки A1 -> номер (з 1): A -> 1, AA -> 27"""
+    number = 0
+    for char in letters:
+        number = number * 26 + ord(char) - ord('A') + 1
+    return number
+
+
+def parse_a1(a1):
+    """
+    "'Лист'!L:L", "'Лист'!A:P", "Лист!A1:C10" або "'Лист'" -> (назва листа, (колонка, рядок), (колонка, рядок))
+    Номери з 1; None - без обмеження (весь лист / вся колонка)
+    """
+    title, _, cells = a1.partition("!")
+    if title.startswith("'") and title.endswith("'"):
+        title = title[1:-1].replace("''", "'")
+    if not cells:
+        return title, (None, None), (None, None)
+    first, _, last = cells.partition(":")
+    return title, _parse_cell(first), _parse_cell(last or first)
+
+
+def _parse_cell(cell):
+    letters = cell.rstrip("0123456789")
+    digits = cell[len(letters):]
+    return (column_number(letters.upper()) if letters else None), (int(digits) if digits else None)
+
+
+def _trim(values):
+    """Sheets API не повертає порожні значення в кінці рядка / колонки"""
+    end = len(values)
+    while end and values[end - 1] == "":
+        end -= 1
+    return values[:end]
+
+
+def read_range(rows, first, last, major_dimension="ROWS"):
+    """
+    Значення діапазону листа як у відповіді Sheets API: порожні комірки в кінці рядків / колонок
+    та порожні рядки / колонки в кінці діапазону не повертаються
+    first, last - (колонка, рядок) з parse_a1
+    """
+    first_column, first_row = first
+    last_column, last_row = last
+    rows = rows[(first_row or 1) - 1:last_row]
+    first_column = first_column or 1
+    if last_column is None:
+        last_column = max((len(row) for row in rows), default=0)
+
+    if major_dimension == "COLUMNS":
+        values = [
+            _trim([row[column - 1] if len(row) >= column else "" for row in rows])
+            for column in range(first_column, last_column + 1)
+        ]
+    else:
+        values = [_trim(list(row[first_column - 1:last_column])) for row in rows]
+    while values and not values[-1]:
+        values.pop()
+    return values
+
+
+def group_by_spreadsheet(sheets):
+    """{(spreadsheet_id, індекс_листа): рядки} -> {spreadsheet_id: {індекс_листа: рядки}}"""
+    workbooks = {}
+    for (spreadsheet_id, sheet_number), rows in sheets.items():
+        workbooks.setdefault(spreadsheet_id, {})[sheet_number] = rows
+    return workbooks
+
+
+def sheet_titles(workbook_sheets):
+    """Назви листів книги за індексами (листи без даних між індексами - порожні)"""
+    return [f"Аркуш{i + 1}" for i in range(max(workbook_sheets, default=-1) + 1)]
+
+
+class FakeWorksheet:
+    def __init__(self, client, title, rows):
+        self._client = client
+        self.title = title
+        self.rows = rows
+
+    def get_all_values(self):
+        self._client.request("get_all_values")
+        return [list(row) for row in self.rows]
+
+
+class FakeSpreadsheet:
+    def __init__(self, client, spreadsheet_id, titles, sheets, version):
+        self._client = client
+        self.id = spreadsheet_id
+        self._worksheets = [FakeWorksheet(client, title, sheets.get(i, [])) for i, title in enumerate(titles)]
+        self._version = version
+
+    def worksheets(self):
+        self._client.request("worksheets")
+        return list(self._worksheets)
+
+    def get_worksheet(self, index):
+        self._client.request("get_worksheet")
+        return self._worksheets[index] if index < len(self._worksheets) else None
+
+    def get_lastUpdateTime(self):
+        self._client.request("get_lastUpdateTime")
+        return self._version
+
+    def values_batch_get(self, ranges, params=None):
+        self._client.request("values_batch_get")
+        major_dimension = (params or {}).get("majorDimension", "ROWS")
+        titles = {worksheet.title: worksheet for worksheet in self._worksheets}
+        value_ranges = []
+        for a1 in ranges:
+            title, first, last = parse_a1(a1)
+            values = read_range(titles[title].rows, first, last, major_dimension)
+            value_range = {"range": a1, "majorDimension": major_dimension}
+            if values:
+                value_range["values"] = values
+            value_ranges.append(value_range)
+        return {"spreadsheetId": self.id, "valueRanges": value_ranges}
+
+
+class FakeGspreadClient:
+    """
+    sheets - {(spreadsheet_id, індекс_листа): рядки}; листи без даних між індексами порожні
+    latency - секунди затримки кожного запиту (як мережевий виклик gspread)
+    """
+
+    def __init__(self, sheets, latency=0.0, version="2024-01-01T00:00:00.000Z"):
+        self.latency = latency
+        self.version = version
+        self.requests = {}
+        self._lock = threading.Lock()
+        self._sheets = group_by_spreadsheet(sheets)
+
+    def request(self, name):
+        with self._lock:
+            self.requests[name] = self.requests.get(name, 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def open_by_key(self, spreadsheet_id):
+        self.request("open_by_key")
+        sheets = self._sheets.get(spreadsheet_id)
+        if sheets is None:
+            raise KeyError(f"Таблицю {spreadsheet_id} не знайдено")
+        return FakeSpreadsheet(self, spreadsheet_id, sheet_titles(sheets), sheets, self.version)
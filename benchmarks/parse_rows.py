@@ -0,0 +1,56 @@
+"""
+Мікробенчмарк розбору листа категорії: час та пікова пам'ять parse_category_rows
+
+Запуск: python -m benchmarks.parse_rows [кількість_рядків] [категорія]
+"""
+import random
+import sys
+import time
+import tracemalloc
+from config import data
+from utils.sheets_utils import parse_category_rows
+
+SIZE_TOKENS = ['S', 'M', 'L', 'XL', '2XL', 'м', 'л', 'хл', '2хл', '46', '48', '50', '30', '32', '-2', '-3', '/2']
+
+
+def make_sheet(category, rows_count, seed=0):
+    """Синтетичний лист категорії (як get_all_values) з заголовком"""
+    rng = random.Random(seed)
+    details = data[category]
+    width = max(details["art"], details["size"], details["amount"], details["photo"])
+    header = [""] * width
+    header[details["art"] - 1] = "Артикул"
+    rows = [header]
+    for i in range(rows_count):
+        row = [""] * width
+        row[details["art"] - 1] = f"Арт-{i % (rows_count // 2 or 1)}.{rng.choice([38, 40, 42])}"
+        row[details["size"] - 1] = ", ".join(rng.choice(SIZE_TOKENS) for _ in range(rng.randint(0, 5)))
+        row[details["amount"] - 1] = rng.choice(["1", "2", "2, (,1,-склад)", ""])
+        rows.append(row)
+    return rows
+
+
+def run(rows_count=10000, category="jeans", repeat=5):
+    sheet = make_sheet(category, rows_count)
+
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        parse_category_rows(category, sheet)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    parse_category_rows(category, sheet)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"parse_category_rows {category}, {rows_count} рядків: {best * 1000:.1f} мс, пік пам'яті {peak / 1024:.0f} КБ")
+    return best, peak
+
+
+if __name__ == "__main__":
+    run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 10000,
+        sys.argv[2] if len(sys.argv) > 2 else "jeans"
+    )
@@ -0,0 +1,96 @@
+"""
+Бенчмарк рушіїв CPU-важкої роботи: пул потоків проти пулу процесів на синтетичних даних
+(розбір CSV переобліку, розбір листів категорії, звірка); результати рушіїв порівнюються між собою
+
+Запуск: python -m benchmarks.process_engine [кількість_рядків] [процесів] [рядків_на_завдання]
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+from benchmarks.parse_rows import make_sheet
+from benchmarks.reconcile import SIZES, make_inventory
+from utils.process_engine import ProcessCsvInventoryParser, parse_fetched_sheets
+from utils.reconciliation_service import ReconciliationService
+from utils.sheets_planner import get_spreadsheet_id
+from utils.sheets_utils import CsvInventoryParser, compare_inventory_with_sheets, get_category_worksheets
+
+PREFIXES = ['Дж', 'Ко', 'Кос', 'Фут', 'Бр', 'Об', 'Шап', 'Ре']
+
+
+def make_csv(rows_count, seed=0):
+    """Синтетичний CSV переобліку (байти, як приходить з Telegram)"""
+    rng = random.Random(seed)
+    lines = ["Назва;Артикул;Штрихкод;Інформація;Кількість;Відскановано"]
+    for i in range(rows_count):
+        art = f"{rng.choice(PREFIXES)}-{rng.randint(1, rows_count // 4 or 1)}{rng.choice(['', '.130'])}"
+        lines.append(f"Товар {i};{art};;{rng.choice(SIZES + [''])};1;{rng.choice(['1', '2', ''])}")
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def make_fetched(category, rows_count):
+    """Прочитані листи категорії (як assemble_rows): rows_count рядків порівну між листами"""
+    worksheets = get_category_worksheets(category)
+    sheet = make_sheet(category, rows_count)
+    columns = tuple(range(1, len(sheet[0]) + 1))
+    per_sheet = len(sheet) // len(worksheets) + 1
+    return {
+        (get_spreadsheet_id(link), sheet_number): (columns, sheet[i * per_sheet:(i + 1) * per_sheet])
+        for i, (link, sheet_number) in enumerate(worksheets)
+    }
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+def parse_csv(parser, raw):
+    for start in range(0, len(raw), 65536):
+        parser.write(raw[start:start + 65536])
+    return parser.close()
+
+
+async def compare_in(service, inventory_data, category_sheet_data):
+    return await service.run_cpu(0, compare_inventory_with_sheets, None, inventory_data, category_sheet_data)
+
+
+def run(rows_count=100000, processes=None, chunk_rows=20000):
+    processes = processes or os.cpu_count() or 1
+    threads = ReconciliationService(4)
+    pool = ReconciliationService(4, processes)
+    # Процеси стартують заздалегідь, щоб час запуску не потрапив у вимірювання
+    list(pool._get_process_executor().map(abs, range(processes)))
+    print(f"{rows_count} рядків, процесів: {processes}, рядків на завдання: {chunk_rows}")
+
+    try:
+        raw = make_csv(rows_count)
+        expected, thread_time = timed(parse_csv, CsvInventoryParser(), raw)
+        actual, process_time = timed(parse_csv, ProcessCsvInventoryParser(chunk_rows, pool), raw)
+        assert actual == expected
+        print(f"CSV ({len(raw) / 1024 / 1024:.1f} МБ): потоки {thread_time * 1000:.0f} мс, процеси {process_time * 1000:.0f} мс")
+
+        fetched = make_fetched("jeans", rows_count)
+        expected, thread_time = timed(parse_fetched_sheets, ["jeans"], fetched, chunk_rows, threads)
+        actual, process_time = timed(parse_fetched_sheets, ["jeans"], fetched, chunk_rows, pool)
+        assert actual == expected
+        print(f"Листи: потоки {thread_time * 1000:.0f} мс, процеси {process_time * 1000:.0f} мс")
+
+        inventory_data, category_sheet_data = make_inventory(rows_count // 5, 5)
+        expected, thread_time = timed(asyncio.run, compare_in(threads, inventory_data, category_sheet_data))
+        actual, process_time = timed(asyncio.run, compare_in(pool, inventory_data, category_sheet_data))
+        assert actual == expected
+        print(f"Звірка ({len(inventory_data)} артикулів): потоки {thread_time * 1000:.0f} мс, процеси {process_time * 1000:.0f} мс")
+    finally:
+        threads.shutdown()
+        pool.shutdown()
+
+
+if __name__ == "__main__":
+    run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 100000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else None,
+        int(sys.argv[3]) if len(sys.argv) > 3 else 20000
+    )
@@ -0,0 +1,64 @@
+"""
+Бенчмарк звірки: час compare_inventory_with_sheets на синтетичних даних без запитів до Google
+
+Запуск: python -m benchmarks.reconcile [кількість_артикулів] [розмірів_на_артикул] [частка_розбіжностей]
+"""
+import random
+import sys
+import time
+from utils.sheets_utils import compare_inventory_with_sheets, normalize_art
+
+SIZES = ['XS', 'S', 'M', 'L', 'XL', '2XL', '3XL', '4XL', '30', '31', '32', '33']
+
+
+def make_inventory(arts_count, sizes_per_art, mismatch_rate=0.2, category="jeans", prefix="Дж", seed=0):
+    """
+    Синтетичні (inventory_data, category_sheet_data) для однієї категорії:
+    більшість артикулів є і в файлі, і в таблиці; mismatch_rate артикулів мають розбіжності в кількостях
+    """
+    rng = random.Random(seed)
+    inventory_data = {}
+    sheet_arts = {}
+    for i in range(arts_count):
+        art = f"{prefix}-{i}"
+        normalized_art = normalize_art(art)
+        sheet_sizes = {size: rng.randint(1, 3) for size in rng.sample(SIZES, sizes_per_art)}
+        file_sizes = dict(sheet_sizes)
+        if rng.random() < mismatch_rate:
+            file_sizes = {size: rng.randint(1, 3) for size in rng.sample(SIZES, sizes_per_art)}
+        if rng.random() < 0.95:
+            inventory_data[normalized_art] = {
+                'original_art': art,
+                'sizes': file_sizes,
+                'amount': 0
+            }
+        if rng.random() < 0.95:
+            sheet_arts[normalized_art] = {
+                'sizes': sheet_sizes,
+                'amount': 0,
+                'original_art': art
+            }
+    return inventory_data, {category: sheet_arts}
+
+
+def run(arts_count=10000, sizes_per_art=5, mismatch_rate=0.2, repeat=3):
+    inventory_data, category_sheet_data = make_inventory(arts_count, sizes_per_art, mismatch_rate)
+    pairs = sum(len(data_info['sizes']) for data_info in inventory_data.values())
+
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        compare_inventory_with_sheets(None, inventory_data, category_sheet_data)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    print(f"compare_inventory_with_sheets: {len(inventory_data)} артикулів, {pairs} пар розмірів: {best * 1000:.1f} мс")
+    return best
+
+
+if __name__ == "__main__":
+    run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 10000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 5,
+        float(sys.argv[3]) if len(sys.argv) > 3 else 0.2
+    )
@@ -0,0 +1,226 @@
+"""
+Локальний сервер замість Google Sheets API v4 / Drive API для навантажувального тестування без квоти Google.
+Віддає книги з фікстур за spreadsheet_id з config.data: метадані таблиці, values get,
+values:batchGet та modifiedTime з Drive. Затримка, 429 (квота) та помилки 5xx задаються параметрами.
+
+Бот направляється на сервер через .env (credentials Google тоді не потрібні):
+    SHEETS_API_URL=http://127.0.0.1:8085/v4/spreadsheets
+    DRIVE_API_URL=http://127.0.0.1:8085/drive/v3/files
+
+Запуск: python -m benchmarks.sheets_server [--arts 10000] [--fixtures книги.json] [--latency 0.2]
+        [--rate-limited 0.05] [--errors 0.01] [--quota 300]
+Фікстури (JSON): {spreadsheet_id: {індекс_листа: рядки}}; без --fixtures генеруються з benchmarks.stocktake,
+--dump зберігає згенеровані фікстури у файл. GET /stats - лічильники запитів сервера.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timezone
+from aiohttp import web
+from benchmarks.fake_gspread import group_by_spreadsheet, parse_a1, read_range, sheet_titles
+from benchmarks.stocktake import make_catalog, make_category_sheets
+
+
+class SheetsStub:
+    """
+    Стан сервера: книги {spreadsheet_id: {індекс_листа: рядки}} та параметри відмов
+    latency / jitter - затримка кожної відповіді (секунди), rate_limited / errors - частка відповідей 429 / 500,
+    quota - скільки запитів за хвилину дозволено (далі 429, як квота Google; 0 - без обмеження)
+    """
+
+    def __init__(self, workbooks, latency=0.0, jitter=0.0, rate_limited=0.0, errors=0.0, quota=0, seed=None):
+        self.workbooks = workbooks
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limited = rate_limited
+        self.errors = errors
+        self.quota = quota
+        self.modified_time = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        self.stats = {}
+        self._random = random.Random(seed)
+        self._window_started = time.monotonic()
+        self._window_requests = 0
+
+    def count(self, name):
+        self.stats[name] = self.stats.get(name, 0) + 1
+
+    def _over_quota(self):
+        if not self.quota:
+            return False
+        now = time.monotonic()
+        if now - self._window_started >= 60:
+            self._window_started = now
+            self._window_requests = 0
+        self._window_requests += 1
+        return self._window_requests > self.quota
+
+    async def fault(self, endpoint):
+        """Затримка та штучна відмова; повертає відповідь з помилкою або None"""
+        self.count(endpoint)
+        delay = self.latency + self._random.uniform(0, self.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+        if self._over_quota() or self._random.random() < self.rate_limited:
+            self.count("429")
+            return error_response(429, "RESOURCE_EXHAUSTED", "Quota exceeded for quota metric 'Read requests'",
+                                  headers={"Retry-After": "1"})
+        if self._random.random() < self.errors:
+            self.count("500")
+            return error_response(500, "INTERNAL", "Internal error encountered.")
+        return None
+
+    def workbook(self, spreadsheet_id):
+        workbook = self.workbooks.get(spreadsheet_id)
+        if workbook is None:
+            raise web.HTTPNotFound(
+                text=json.dumps(error_body(404, "NOT_FOUND", "Requested entity was not found.")),
+                content_type="application/json"
+            )
+        return workbook
+
+    def read(self, spreadsheet_id, a1, major_dimension):
+        """Один value range відповіді values get / batchGet"""
+        workbook = self.workbook(spreadsheet_id)
+        title, first, last = parse_a1(a1)
+        titles = sheet_titles(workbook)
+        if title not in titles:
+            raise web.HTTPBadRequest(
+                text=json.dumps(error_body(400, "INVALID_ARGUMENT", f"Unable to parse range: {a1}")),
+                content_type="application/json"
+            )
+        value_range = {"range": a1, "majorDimension": major_dimension}
+        values = read_range(workbook.get(titles.index(title), []), first, last, major_dimension)
+        if values:
+            value_range["values"] = values
+        return value_range
+
+
+def error_body(code, status, message):
+    return {"error": {"code": code, "message": message, "status": status}}
+
+
+def error_response(code, status, message, headers=None):
+    return web.json_response(error_body(code, status, message), status=code, headers=headers)
+
+
+async def get_metadata(request):
+    stub = request.app["stub"]
+    response = await stub.fault("metadata")
+    if response is not None:
+        return response
+    spreadsheet_id = request.match_info["spreadsheet_id"]
+    workbook = stub.workbook(spreadsheet_id)
+    sheets = []
+    for index, title in enumerate(sheet_titles(workbook)):
+        rows = workbook.get(index, [])
+        sheets.append({"properties": {
+            "sheetId": index,
+            "title": title,
+            "index": index,
+            "sheetType": "GRID",
+            "gridProperties": {
+                "rowCount": max(len(rows), 1),
+                "columnCount": max((len(row) for row in rows), default=1)
+            }
+        }})
+    return web.json_response({
+        "spreadsheetId": spreadsheet_id,
+        "properties": {"title": spreadsheet_id, "locale": "uk_UA", "timeZone": "Europe/Kiev"},
+        "sheets": sheets
+    })
+
+
+async def get_values(request):
+    stub = request.app["stub"]
+    response = await stub.fault("values_get")
+    if response is not None:
+        return response
+    spreadsheet_id = request.match_info["spreadsheet_id"]
+    major_dimension = request.query.get("majorDimension", "ROWS")
+    return web.json_response(stub.read(spreadsheet_id, request.match_info["range"], major_dimension))
+
+
+async def batch_get_values(request):
+    stub = request.app["stub"]
+    response = await stub.fault("values_batch_get")
+    if response is not None:
+        return response
+    spreadsheet_id = request.match_info["spreadsheet_id"]
+    major_dimension = request.query.get("majorDimension", "ROWS")
+    return web.json_response({
+        "spreadsheetId": spreadsheet_id,
+        "valueRanges": [
+            stub.read(spreadsheet_id, a1, major_dimension) for a1 in request.query.getall("ranges", [])
+        ]
+    })
+
+
+async def get_drive_file(request):
+    stub = request.app["stub"]
+    response = await stub.fault("drive_file")
+    if response is not None:
+        return response
+    spreadsheet_id = request.match_info["spreadsheet_id"]
+    stub.workbook(spreadsheet_id)
+    return web.json_response({"id": spreadsheet_id, "modifiedTime": stub.modified_time})
+
+
+async def get_stats(request):
+    return web.json_response(request.app["stub"].stats)
+
+
+def create_app(stub):
+    app = web.Application()
+    app["stub"] = stub
+    app.router.add_get("/v4/spreadsheets/{spreadsheet_id}", get_metadata)
+    app.router.add_get("/v4/spreadsheets/{spreadsheet_id}/values:batchGet", batch_get_values)
+    app.router.add_get("/v4/spreadsheets/{spreadsheet_id}/values/{range}", get_values)
+    app.router.add_get("/drive/v3/files/{spreadsheet_id}", get_drive_file)
+    app.router.add_get("/stats", get_stats)
+    return app
+
+
+def load_fixtures(path):
+    """JSON {spreadsheet_id: {індекс_листа: рядки}} -> книги сервера"""
+    with open(path, encoding="utf-8") as f:
+        fixtures = json.load(f)
+    return {
+        spreadsheet_id: {int(sheet_number): rows for sheet_number, rows in sheets.items()}
+        for spreadsheet_id, sheets in fixtures.items()
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Локальний сервер Google Sheets API для тестування")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8085)
+    parser.add_argument("--fixtures", help="JSON з книгами; без нього книги генеруються")
+    parser.add_argument("--arts", type=int, default=10000, help="кількість артикулів згенерованих книг")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dump", help="зберегти згенеровані книги у JSON і завершити")
+    parser.add_argument("--latency", type=float, default=0.0, help="затримка відповіді, секунди")
+    parser.add_argument("--jitter", type=float, default=0.0, help="додаткова випадкова затримка до, секунди")
+    parser.add_argument("--rate-limited", type=float, default=0.0, help="частка відповідей 429")
+    parser.add_argument("--errors", type=float, default=0.0, help="частка відповідей 500")
+    parser.add_argument("--quota", type=int, default=0, help="запитів за хвилину до 429 (0 - без обмеження)")
+    args = parser.parse_args(argv)
+
+    if args.fixtures:
+        workbooks = load_fixtures(args.fixtures)
+    else:
+        workbooks = group_by_spreadsheet(make_category_sheets(make_catalog(args.arts, args.seed), args.seed))
+    if args.dump:
+        with open(args.dump, "w", encoding="utf-8") as f:
+            json.dump(workbooks, f, ensure_ascii=False)
+        print(f"Книги збережено: {args.dump}")
+        return
+
+    stub = SheetsStub(workbooks, args.latency, args.jitter, args.rate_limited, args.errors, args.quota, args.seed)
+    print(f"Таблиць: {len(workbooks)}, адреса: http://{args.host}:{args.port}/v4/spreadsheets")
+    web.run_app(create_app(stub), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Генератори синтетичного переобліку: асортимент усіх категорій з config.data,
+листи категорій (як get_all_values) та CSV сканера з розбіжностями
+
+Розміри в таблицях і файлі пишуться в різних формах (кирилиця, латиниця, числові 46-60),
+кількість в таблицях - суфіксом "M,-2", артикули частково з варіантом ".130"
+"""
+import random
+from config import data
+from utils.sheets_cache import get_spreadsheet_id
+from utils.sheets_utils import CATEGORY_PREFIXES, get_category_worksheets, has_sizes
+
+# Форми, в яких розмір зустрічається в таблицях та у сканера
+LETTER_SIZE_FORMS = {
+    'XS': ['XS', 'ХС', 'хс'],
+    'S': ['S', 'С', 'с', '46'],
+    'M': ['M', 'М', 'м', '48'],
+    'L': ['L', 'Л', 'л', '50'],
+    'XL': ['XL', 'ХЛ', 'хл', '52'],
+    '2XL': ['2XL', '2ХЛ', '2хл', '54'],
+    '3XL': ['3XL', '3ХЛ', '3хл', '56'],
+}
+JEANS_SIZES = ['28', '29', '30', '31', '32', '33', '34', '36']
+SHOE_SIZES = ['39', '40', '41', '42', '43', '44', '45']
+JEANS_CATEGORIES = {'jeans', 'shorts_jeans'}
+SHOE_CATEGORIES = {'shoes', 'wintershoes', 'tapki', 'socks'}
+VARIANTS = ['', '', '.130', '.38']
+CSV_HEADER = "Назва;Артикул;Штрихкод;Інформація;Кількість;Відскановано"
+
+
+def category_prefixes():
+    """{категорія: префікс артикулу} - перший префікс з CATEGORY_PREFIXES, який веде до категорії"""
+    prefixes = {}
+    for prefix, categories in CATEGORY_PREFIXES.items():
+        for category in categories:
+            prefixes.setdefault(category, prefix)
+    return prefixes
+
+
+def size_forms(category):
+    """{розмір: [форми запису]} для категорії"""
+    if category in JEANS_CATEGORIES:
+        return {size: [size] for size in JEANS_SIZES}
+    if category in SHOE_CATEGORIES:
+        return {size: [size] for size in SHOE_SIZES}
+    return LETTER_SIZE_FORMS
+
+
+def make_catalog(arts_count, seed=0):
+    """
+    Асортимент з arts_count артикулів, порівну між усіма категоріями config.data
+    Повертає список (категорія, артикул, {розмір: кількість} або кількість для категорій без розмірів)
+    """
+    rng = random.Random(seed)
+    prefixes = category_prefixes()
+    categories = [category for category in data if category in prefixes]
+    catalog = []
+    for i in range(arts_count):
+        category = categories[i % len(categories)]
+        art = f"{prefixes[category]}-{i}"
+        if has_sizes(category):
+            sizes = rng.sample(list(size_forms(category)), rng.randint(1, 4))
+            catalog.append((category, art, {size: rng.choice([1, 1, 1, 2, 3]) for size in sizes}))
+        else:
+            catalog.append((category, art, rng.randint(1, 4)))
+    return catalog
+
+
+def make_category_sheets(catalog, seed=0):
+    """
+    Листи таблиць з асортиментом: {(spreadsheet_id, індекс_листа): рядки з заголовком}
+    Артикули категорії розподіляються між її листами
+    """
+    rng = random.Random(seed)
+    by_category = {}
+    for category, art, stock in catalog:
+        by_category.setdefault(category, []).append((art, stock))
+
+    sheets = {}
+    for category, items in by_category.items():
+        details = data[category]
+        width = max(details["art"], details["size"], details["amount"], details["photo"])
+        worksheets = [(get_spreadsheet_id(link), sheet_number) for link, sheet_number in get_category_worksheets(category)]
+        for key in worksheets:
+            header = [""] * width
+            header[details["art"] - 1] = "Артикул"
+            header[details["size"] - 1] = "Розмір"
+            sheets[key] = [header]
+        forms = size_forms(category)
+        for i, (art, stock) in enumerate(items):
+            row = [""] * width
+            row[details["art"] - 1] = art + rng.choice(VARIANTS)
+            if isinstance(stock, dict):
+                row[details["size"] - 1] = ", ".join(
+                    rng.choice(forms[size]) + (f",-{quantity}" if quantity > 1 else "")
+                    for size, quantity in stock.items()
+                )
+                row[details["amount"] - 1] = str(sum(stock.values()))
+            else:
+                row[details["amount"] - 1] = rng.choice([str(stock), f"{stock}, (,1,-склад)"])
+            sheets[worksheets[i % len(worksheets)]].append(row)
+    return sheets
+
+
+def make_scanner_csv(catalog, mismatch_rate=0.2, missing_rate=0.05, unknown_rate=0.01, seed=0):
+    """
+    CSV сканера (байти, як приходить з Telegram) для асортименту:
+    missing_rate артикулів не відскановано, у mismatch_rate - інша кількість або зайвий розмір,
+    unknown_rate рядків - артикули без категорії
+    """
+    rng = random.Random(seed)
+    lines = [CSV_HEADER]
+
+    def scan(art, size, quantity):
+        lines.append(f"Товар {len(lines)};{art}{rng.choice(VARIANTS)};;{size};1;{quantity}")
+
+    for category, art, stock in catalog:
+        if rng.random() < missing_rate:
+            continue
+        mismatch = rng.random() < mismatch_rate
+        if isinstance(stock, dict):
+            forms = size_forms(category)
+            for size, quantity in stock.items():
+                if mismatch:
+                    quantity = max(0, quantity + rng.choice([-1, 1]))
+                if quantity:
+                    scan(art, rng.choice(forms[size]), quantity)
+            if mismatch and rng.random() < 0.5:
+                scan(art, rng.choice(rng.choice(list(forms.values()))), 1)
+        else:
+            scan(art, "", max(1, stock + (rng.choice([-1, 1]) if mismatch else 0)))
+        if rng.random() < unknown_rate:
+            scan(f"Х-{len(lines)}", "M", 1)
+    return ("\n".join(lines) + "\n").encode("utf-8")
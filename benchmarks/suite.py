@@ -0,0 +1,201 @@
+"""
+Наскрізний бенчмарк переобліку на синтетичних даних без запитів до Google:
+розбір CSV сканера -> читання листів категорій (заміна gspread з затримкою) -> звірка -> звіт -> Excel.
+Для кожного етапу вимірюються час (найкращий з repeat прогонів) та пікова пам'ять (окремий прогін
+під tracemalloc) на 1k / 10k / 100k артикулів усіх категорій config.data.
+
+Регресійна перевірка: --save записує результати в baselines.json, --check порівнює з ними
+і завершується з кодом 1, якщо етап став повільнішим або вимагає більше пам'яті понад допуск.
+Час залежить від машини - базові значення варто записати (--save) там, де запускається перевірка.
+
+Запуск: python -m benchmarks.suite [--sizes 1000 10000] [--latency 0.05] [--save | --check]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Знімки листів на диску зробили б повторні прогони читання безкоштовними
+os.environ["SNAPSHOTS_ENABLED"] = "0"
+
+from benchmarks.fake_gspread import FakeGspreadClient
+from benchmarks.stocktake import make_catalog, make_category_sheets, make_scanner_csv
+from utils.category_loader import load_categories_sync
+from utils.excel_generator import generate_inventory_excel
+from utils.report_builder import InventoryReport
+from utils.sheets_cache import clear_sheets_cache
+from utils.sheets_utils import (
+    compare_inventory_with_sheets,
+    get_inventory_categories,
+    load_all_arts_from_category,
+    parse_csv_file
+)
+
+SIZES = [1000, 10000, 100000]
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+# Різниця в часі, меншу за цю (секунди), не вважаємо регресією - короткі етапи сильно коливаються
+TIME_SLACK = 0.05
+
+
+class Stocktake:
+    """Дані одного прогону: згенерований переоблік і результати попередніх етапів"""
+
+    def __init__(self, arts_count, latency, seed=0):
+        catalog = make_catalog(arts_count, seed)
+        self.client = FakeGspreadClient(make_category_sheets(catalog, seed), latency)
+        fd, self.csv_path = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(fd, "wb") as f:
+            f.write(make_scanner_csv(catalog, seed=seed))
+        self.inventory_data = None
+        self.categories = None
+        self.category_sheet_data = None
+        self.results = None
+        self.report = None
+
+    def close(self):
+        os.remove(self.csv_path)
+
+
+def stage_csv_parse(stocktake):
+    stocktake.inventory_data = parse_csv_file(stocktake.csv_path)
+    stocktake.categories = sorted(get_inventory_categories(stocktake.inventory_data))
+
+
+def stage_sheets_load_legacy(stocktake):
+    """Читання як до batchGet: get_all_values на кожен лист кожної категорії"""
+    clear_sheets_cache()
+    return {
+        category: load_all_arts_from_category(stocktake.client, category)
+        for category in stocktake.categories
+    }
+
+
+def stage_sheets_load(stocktake):
+    clear_sheets_cache()
+    stocktake.category_sheet_data = load_categories_sync(stocktake.client, stocktake.categories).data
+
+
+def stage_compare(stocktake):
+    stocktake.results = compare_inventory_with_sheets(None, stocktake.inventory_data, stocktake.category_sheet_data)
+
+
+def stage_report(stocktake):
+    stocktake.report = InventoryReport(stocktake.results, stocktake.inventory_data)
+    stocktake.report.rows
+    stocktake.report.stats
+
+
+def stage_excel(stocktake):
+    os.remove(generate_inventory_excel(stocktake.report))
+
+
+STAGES = [
+    ("csv_parse", stage_csv_parse),
+    ("sheets_load_legacy", stage_sheets_load_legacy),
+    ("sheets_load", stage_sheets_load),
+    ("compare", stage_compare),
+    ("report", stage_report),
+    ("excel", stage_excel),
+]
+
+
+def measure(func, repeat):
+    """(найкращий час, пікова пам'ять) - пам'ять окремим прогоном, tracemalloc сповільнює виконання"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def run_size(arts_count, latency, repeat):
+    """{етап: {'time': секунди, 'peak': байти}} для одного розміру переобліку"""
+    stocktake = Stocktake(arts_count, latency)
+    try:
+        measurements = {}
+        for name, stage in STAGES:
+            elapsed, peak = measure(lambda: stage(stocktake), repeat)
+            measurements[name] = {"time": round(elapsed, 4), "peak": peak}
+            print(f"  {name:<20} {elapsed * 1000:>10.1f} мс {peak / 1024 / 1024:>9.1f} МБ")
+        # Обидва способи читання мають давати однакові дані
+        assert stage_sheets_load_legacy(stocktake) == stocktake.category_sheet_data
+        return measurements
+    finally:
+        stocktake.close()
+
+
+def check_regressions(measurements, baselines, time_tolerance, memory_tolerance):
+    """Список описів регресій відносно базових значень (етапи без базового значення пропускаються)"""
+    regressions = []
+    for size, stages in measurements.items():
+        for name, current in stages.items():
+            baseline = baselines.get(size, {}).get(name)
+            if baseline is None:
+                continue
+            if current["time"] > baseline["time"] * (1 + time_tolerance) + TIME_SLACK:
+                regressions.append(f"{size}/{name}: час {current['time']:.3f} с > {baseline['time']:.3f} с")
+            if current["peak"] > baseline["peak"] * (1 + memory_tolerance):
+                regressions.append(
+                    f"{size}/{name}: пам'ять {current['peak'] / 1024 / 1024:.1f} МБ"
+                    f" > {baseline['peak'] / 1024 / 1024:.1f} МБ"
+                )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Наскрізний бенчмарк переобліку")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="кількість артикулів")
+    parser.add_argument("--latency", type=float, default=0.05, help="затримка запиту до таблиць, секунди")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save", action="store_true", help="записати результати як базові")
+    parser.add_argument("--check", action="store_true", help="порівняти з базовими (код 1 при регресії)")
+    parser.add_argument("--time-tolerance", type=float, default=0.5)
+    parser.add_argument("--memory-tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    baseline_file = {"latency": args.latency, "results": {}}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline_file = json.load(f)
+    if args.check and baseline_file["latency"] != args.latency:
+        print(f"Базові значення записані з затримкою {baseline_file['latency']} с, а не {args.latency} с")
+        return 2
+
+    measurements = {}
+    for arts_count in args.sizes:
+        print(f"{arts_count} артикулів:")
+        measurements[str(arts_count)] = run_size(arts_count, args.latency, args.repeat)
+
+    if args.check:
+        regressions = check_regressions(
+            measurements, baseline_file["results"], args.time_tolerance, args.memory_tolerance
+        )
+        for regression in regressions:
+            print(f"Регресія: {regression}")
+        if regressions:
+            return 1
+        print("Регресій немає")
+
+    if args.save:
+        baseline_file["latency"] = args.latency
+        baseline_file["results"].update(measurements)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline_file, f, ensure_ascii=False, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Базові значення збережено: {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
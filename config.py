@@ -24,6 +24,87 @@ else:
 
 administrators = [585621771, 528031850, 671251096]
 
+# Кількість потоків для звірки з Google таблицями та генерації Excel
+# (блокуючі виклики gspread/openpyxl виконуються поза event loop бота)
+reconciliation_workers = int(os.getenv('RECONCILIATION_WORKERS', '4'))
+
+# Рушій CPU-важкої роботи (розбір CSV та листів таблиць, звірка):
+# "thread" - пул потоків (за замовчуванням), "process" - пул процесів (кілька ядер, без конкуренції за GIL з ботом)
+# RECONCILIATION_PROCESSES - кількість процесів (0 - кількість ядер)
+# PROCESS_CHUNK_ROWS - скільки рядків CSV / листа таблиці розбирає процес за одне завдання
+# PROCESS_MIN_ARTS - звірка з меншою кількістю артикулів (файл + таблиці) виконується в пулі потоків:
+# передача даних в процес (pickle) коштує більше, ніж сама звірка
+reconciliation_engine = os.getenv('RECONCILIATION_ENGINE', 'thread')
+reconciliation_processes = int(os.getenv('RECONCILIATION_PROCESSES', '0')) or os.cpu_count() or 1
+process_chunk_rows = int(os.getenv('PROCESS_CHUNK_ROWS', '20000'))
+process_min_arts = int(os.getenv('PROCESS_MIN_ARTS', '50000'))
+
+# Як читати Google таблиці під час звірки:
+# "async" - асинхронний клієнт Sheets API (всі листи категорій завантажуються одночасно)
+# "gspread" - послідовне читання через gspread (як раніше)
+sheets_backend = os.getenv('SHEETS_BACKEND', 'async')
+
+# Адреси Sheets API та Drive API. Для навантажувального тестування без квоти Google їх можна направити
+# на локальний сервер benchmarks.sheets_server (тоді credentials Google не потрібні)
+sheets_api_url = os.getenv('SHEETS_API_URL', 'https://sheets.googleapis.com/v4/spreadsheets').rstrip('/')
+drive_api_url = os.getenv('DRIVE_API_URL', 'https://www.googleapis.com/drive/v3/files').rstrip('/')
+
+# Максимальна кількість одночасних запитів до Sheets API та повторів при 429/5xx
+sheets_max_concurrency = int(os.getenv('SHEETS_MAX_CONCURRENCY', '8'))
+sheets_max_retries = int(os.getenv('SHEETS_MAX_RETRIES', '5'))
+
+# Спільна квота читань Sheets API для всіх запитів бота (gspread, async, фонове оновлення):
+# SHEETS_READS_PER_MINUTE - запитів за хвилину (квота Google на користувача - 60, 0 - без обмеження),
+# SHEETS_READ_BURST - скільки запитів можна виконати підряд без очікування
+sheets_reads_per_minute = int(os.getenv('SHEETS_READS_PER_MINUTE', '60'))
+sheets_read_burst = int(os.getenv('SHEETS_READ_BURST', '10'))
+
+# Скільки секунд тримати відкриті таблиці/листи (метадані) в кеші, щоб не запитувати їх повторно
+sheets_metadata_ttl = int(os.getenv('SHEETS_METADATA_TTL', '600'))
+
+# Читати з таблиць тільки потрібні колонки (артикул, розмір, кількість), а не весь рядок до останньої з них
+sheets_projected_reads = os.getenv('SHEETS_PROJECTED_READS', '1') == '1'
+
+# Локальні знімки розібраних листів (SQLite): якщо таблиця не змінювалась (modifiedTime з Google Drive),
+# звірка бере дані з диску замість повторного завантаження
+snapshots_enabled = os.getenv('SNAPSHOTS_ENABLED', '1') == '1'
+snapshot_db_path = os.getenv('SNAPSHOT_DB_PATH', 'data/snapshots.sqlite3')
+
+# Фонове оновлення даних категорій (теплий кеш):
+# PREFETCH_CATEGORIES - категорії через кому (порожньо - всі категорії з data)
+# PREFETCH_INTERVAL - за скільки секунд оновлюються всі категорії (0 - вимкнено)
+# WARM_CACHE_MAX_AGE - дані, старші за цей час (секунди), звірка не використовує
+prefetch_categories = [c.strip() for c in os.getenv('PREFETCH_CATEGORIES', '').split(',') if c.strip()]
+prefetch_interval = int(os.getenv('PREFETCH_INTERVAL', '300'))
+warm_cache_max_age = int(os.getenv('WARM_CACHE_MAX_AGE', '600'))
+
+# Метрики етапів звірки: GET /metrics (формат Prometheus) на METRICS_HOST:METRICS_PORT (0 - сервер вимкнено),
+# підсумок для адміністратора - команда /stats
+metrics_host = os.getenv('METRICS_HOST', '127.0.0.1')
+metrics_port = int(os.getenv('METRICS_PORT', '9108'))
+
+# Рівень логування (DEBUG, INFO, WARNING, ...)
+log_level = os.getenv('LOG_LEVEL', 'INFO').upper()
+
+# Діагностика звірки (trace): структуровані події по артикулах в логер "reconciliation.trace"
+# TRACE_ARTS - артикули через кому, які відстежуються в кожній звірці
+# TRACE_SAMPLE_RATE - частка артикулів (0..1), які відстежуються в кожній звірці (0 - вимкнено)
+# Для окремого запиту трейс вмикає адміністратор командою /trace
+trace_arts = [a.strip() for a in os.getenv('TRACE_ARTS', '').split(',') if a.strip()]
+trace_sample_rate = float(os.getenv('TRACE_SAMPLE_RATE', '0'))
+
+# Excel звіт: потоковий запис (write_only книга, спільні стилі) - 1, звичайна книга в пам'яті - 0
+excel_streaming = os.getenv('EXCEL_STREAMING', '1') == '1'
+
+# Стан користувачів і результати звірок, які чекають на "Отримати файл":
+# FSM_STORAGE - сховище FSM стану aiogram: "sqlite" (на диску, переживає перезапуск) або "memory"
+# RESULT_STORE - сховище результатів звірок: "sqlite" або "memory" (в FSM стані лише id результату)
+# STATE_DB_PATH - файл SQLite для обох сховищ, RESULT_TTL - скільки секунд зберігати результат та стан
+fsm_storage_backend = os.getenv('FSM_STORAGE', 'sqlite')
+result_store_backend = os.getenv('RESULT_STORE', 'sqlite')
+state_db_path = os.getenv('STATE_DB_PATH', 'data/state.sqlite3')
+result_ttl = int(os.getenv('RESULT_TTL', '86400'))
+
 data = {
     "jeans": {
         "link": [
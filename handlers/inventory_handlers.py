@@ -1,21 +1,42 @@
+import asyncio
 import os
-import tempfile
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery, FSInputFile, InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.filters import Command, StateFilter
 from aiogram.fsm.context import FSMContext
 from gspread import service_account, service_account_from_dict
-from config import data
-from keyboards.inventory_keyboards import get_inventory_keyboard
+from config import (
+    data,
+    drive_api_url,
+    process_min_arts,
+    sheets_api_url,
+    sheets_backend,
+    sheets_max_concurrency,
+    sheets_max_retries
+)
+from keyboards.inventory_keyboards import get_batch_keyboard, get_inventory_keyboard
 from states.inventory_states import InventoryStates
 from utils.admin_utils import check_admin
 from utils.category_translations import get_category_ua
-from utils.excel_generator import generate_inventory_excel, calculate_statistics
+from utils.excel_generator import generate_inventory_excel
+from utils.reconciliation_service import reconciliation_service
+from utils.async_sheets import AsyncSheetsClient
+from utils.rate_limiter import sheets_read_limiter
+from utils.sheets_endpoint import RateLimitedHTTPClient, create_local_client, uses_google_api
+from utils.category_loader import CategoryLoadError, load_categories, load_categories_sync
+from utils.prefetcher import category_prefetcher
+from utils.trace import create_trace, disable_user_trace, enable_user_trace
+from utils.report_builder import InventoryReport
+from utils.result_store import result_store
+from utils.metrics import stage_seconds, summarize
+from utils.batch_upload import cancel_batch, get_batch, pop_batch, start_batch
+from utils.process_engine import download_csv
 from utils.sheets_utils import (
-    parse_csv_file, 
     compare_inventory_with_sheets, 
     get_category_by_prefix,
-    get_art_sizes_from_sheets
+    get_art_sizes_from_sheets,
+    get_inventory_categories,
+    select_sheet_data_for_inventory
 )
 
 router = Router()
@@ -23,18 +44,173 @@ router = Router()
 from config import google_credentials
 
 # Ініціалізація Google Sheets клієнта
-# Використовуємо credentials зі змінних середовища (dict) або fallback на файл
-if google_credentials:
-    client = service_account_from_dict(google_credentials)
+# Використовуємо credentials зі змінних середовища (dict) або fallback на файл;
+# для локального сервера таблиць (SHEETS_API_URL / DRIVE_API_URL) credentials не потрібні
+if not uses_google_api():
+    client = create_local_client()
+elif google_credentials:
+    client = service_account_from_dict(google_credentials, http_client=RateLimitedHTTPClient)
 else:
     # Fallback: якщо credentials не знайдено в .env, спробуємо файл
     import os
     credentials_path = os.getenv('CREDENTIALS_PATH', 'credentials.json')
     if os.path.exists(credentials_path):
-        client = service_account(filename=credentials_path)
+        client = service_account(filename=credentials_path, http_client=RateLimitedHTTPClient)
     else:
         raise ValueError("Google credentials не знайдено! Перевірте GOOGLE_CREDENTIALS в .env або credentials.json файл.")
 
+# Асинхронний клієнт Sheets API з тими ж credentials (для одночасного завантаження категорій)
+sheets_client = None
+if sheets_backend == 'async':
+    sheets_client = AsyncSheetsClient(
+        client.http_client.auth,
+        max_concurrency=sheets_max_concurrency,
+        max_retries=sheets_max_retries,
+        base_url=sheets_api_url,
+        drive_url=drive_api_url,
+        rate_limiter=sheets_read_limiter
+    )
+
+
+@router.shutdown()
+async def close_sheets_client():
+    """Закриває HTTP сесію асинхронного клієнта при зупинці бота"""
+    if sheets_client is not None:
+        await sheets_client.close()
+
+
+async def load_sheet_data(categories):
+    """
+    Завантажує дані категорій з Google таблиць (LoadedCategories)
+    async-бекенд - всі таблиці одночасно, gspread - послідовно в окремому потоці
+    """
+    if sheets_client is not None:
+        return await load_categories(sheets_client, categories)
+    return await asyncio.to_thread(load_categories_sync, client, categories)
+
+
+async def get_sheet_data(categories):
+    """
+    Дані категорій для звірки: свіжі категорії з теплого кешу, решта завантажується
+    (і теж потрапляє в теплий кеш)
+    CategoryLoadError, якщо якусь категорію не вдалося завантажити (повністю завантажені все одно кешуються)
+    """
+    category_sheet_data = category_prefetcher.get_fresh(categories)
+    missing_categories = [category for category in categories if category not in category_sheet_data]
+    if missing_categories:
+        try:
+            loaded = await load_sheet_data(missing_categories)
+        except CategoryLoadError as e:
+            category_prefetcher.update(e.loaded)
+            raise
+        category_prefetcher.update(loaded, missing_categories)
+        category_sheet_data.update(loaded.data)
+    return category_sheet_data
+
+
+category_prefetcher.loader = load_sheet_data
+
+
+async def reconcile_inventory(user_id, inventory_data):
+    """
+    Звіряє дані файлу з Google таблицями
+    Дані категорій беруться з теплого кешу або завантажуються одночасно,
+    саме порівняння виконується в пулі потоків (або процесів - RECONCILIATION_ENGINE=process,
+    якщо артикулів не менше PROCESS_MIN_ARTS)
+    """
+    categories = get_inventory_categories(inventory_data)
+    with stage_seconds.time(stage="sheets_load"):
+        category_sheet_data = await get_sheet_data(categories)
+    trace = create_trace(user_id)
+
+    with stage_seconds.time(stage="diff"):
+        if trace is None and reconciliation_service.uses_processes and categories.issubset(category_sheet_data):
+            # Звірка в пулі процесів: всі категорії вже завантажені, тому gspread клієнт процесу не потрібен
+            # (з діагностикою звірка виконується в боті, щоб події потрапили в його лог).
+            # В процес передаємо тільки записи таблиць, від яких залежить результат
+            sheet_data = select_sheet_data_for_inventory(inventory_data, category_sheet_data)
+            arts_count = len(inventory_data) + sum(len(all_sheet_arts) for all_sheet_arts in sheet_data.values())
+            if arts_count >= process_min_arts:
+                return await reconciliation_service.run_cpu(
+                    user_id, compare_inventory_with_sheets, None, inventory_data, sheet_data
+                )
+        return await reconciliation_service.run(
+            user_id, compare_inventory_with_sheets, client, inventory_data, category_sheet_data, trace
+        )
+
+
+def detect_categories(inventory_data):
+    """
+    Всі категорії артикулів файлу (від найчастішої до рідкісної)
+    Для артикулів з кількома категоріями (як "Об") враховуємо всі категорії
+    """
+    category_count = {}
+    for data_info in inventory_data.values():
+        original_art = data_info['original_art']
+        categories = get_category_by_prefix(original_art)
+        if categories:
+            # Додаємо всі категорії зі списку (не тільки першу)
+            for category in categories:
+                category_count[category] = category_count.get(category, 0) + 1
+    return sorted(category_count, key=category_count.get, reverse=True)
+
+
+async def save_result(state, user_id, results, inventory_data, category, category_ua, categories_ua):
+    """
+    Зберігає результат звірки в result_store до натискання 'Отримати файл'
+    В FSM стані залишається тільки id результату та категорії
+    """
+    result_id = await asyncio.to_thread(
+        result_store.put, user_id, {'results': results, 'inventory_data': inventory_data}
+    )
+    await state.update_data(
+        result_id=result_id,
+        category=category,
+        category_ua=category_ua,
+        categories_ua=categories_ua
+    )
+
+
+async def answer_load_error(message, state, error):
+    """Звірку не виконано: таблиці частини категорій не вдалося прочитати (CategoryLoadError)"""
+    categories_ua = ", ".join(get_category_ua(category) for category in error.categories)
+    await message.answer(
+        f"❌ Не вдалося завантажити Google таблиці категорій: {categories_ua}\n"
+        f"Звірку не виконано, щоб артикули цих категорій не показались як не знайдені. "
+        f"Спробуйте ще раз за хвилину."
+    )
+    await state.clear()
+    await message.answer(
+        "Оберіть тип перевірки:",
+        reply_markup=get_inventory_keyboard()
+    )
+
+
+async def send_result_message(message, result_message):
+    """Надсилає результат звірки з кнопкою 'Отримати файл'"""
+    # Створюємо інлайн кнопку
+    keyboard = [
+        [InlineKeyboardButton(text="📥 Отримати файл", callback_data="get_excel_file")]
+    ]
+    reply_markup = InlineKeyboardMarkup(inline_keyboard=keyboard)
+    
+    await send_long_message(message, result_message, reply_markup)
+
+
+async def send_long_message(message, text, reply_markup=None):
+    """Надсилає текст частинами до 4000 символів (клавіатура - під останньою частиною)"""
+    # Розбиваємо повідомлення на частини, якщо воно занадто довге
+    max_length = 4000
+    if len(text) > max_length:
+        parts = [text[i:i+max_length] for i in range(0, len(text), max_length)]
+        for i, part in enumerate(parts):
+            if i == len(parts) - 1:
+                await message.answer(part, reply_markup=reply_markup)
+            else:
+                await message.answer(part)
+    else:
+        await message.answer(text, reply_markup=reply_markup)
+
 
 @router.message(Command("start"))
 async def cmd_start(message: Message):
@@ -49,6 +225,41 @@ async def cmd_start(message: Message):
     )
 
 
+@router.message(Command("stats"))
+async def cmd_stats(message: Message):
+    """Підсумок метрик бота: час етапів переобліку, запити до таблиць, кеші, завдання в роботі"""
+    if not check_admin(message.from_user.id):
+        await message.answer("Ви не маєте доступу до цього бота.")
+        return
+
+    await send_long_message(message, f"📈 Метрики бота\n\n{summarize()}")
+
+
+@router.message(Command("trace"))
+async def cmd_trace(message: Message):
+    """
+    Діагностика звірок користувача в лог:
+    /trace - всі артикули, /trace АРТ1 АРТ2 - тільки вказані, /trace off - вимкнути
+    """
+    if not check_admin(message.from_user.id):
+        await message.answer("Ви не маєте доступу до цього бота.")
+        return
+
+    args = (message.text or "").split()[1:]
+    if args and args[0].lower() == "off":
+        if disable_user_trace(message.from_user.id):
+            await message.answer("Діагностику звірок вимкнено.")
+        else:
+            await message.answer("Діагностика звірок не була увімкнена.")
+        return
+
+    enable_user_trace(message.from_user.id, args)
+    if args:
+        await message.answer(f"Діагностику звірок увімкнено для артикулів: {', '.join(args)}")
+    else:
+        await message.answer("Діагностику звірок увімкнено для всіх артикулів.")
+
+
 @router.message(F.text == "Перевірка по артах з файлу")
 async def check_file_arts(message: Message, state: FSMContext):
     """Обробник кнопки 'Перевірка по артах з файлу'"""
@@ -95,6 +306,146 @@ async def check_category(message: Message, state: FSMContext):
     )
 
 
+@router.message(F.text == "Перевірка кількох файлів")
+async def check_batch_files(message: Message, state: FSMContext):
+    """Обробник кнопки 'Перевірка кількох файлів' (пакетний переоблік)"""
+    if not check_admin(message.from_user.id):
+        await message.answer("Ви не маєте доступу до цього бота.")
+        return
+    
+    start_batch(message.from_user.id)
+    await state.set_state(InventoryStates.waiting_batch_files)
+    await message.answer(
+        "Надішліть CSV файли з переобліком (можна кілька одразу, наприклад по стелажах або зонах) "
+        "або zip архів з CSV файлами.\n\n"
+        "Файли обробляються одразу після надходження. Коли всі файли надіслано, "
+        "натисніть «✅ Звірити файли» - буде одна спільна звірка та один файл результатів.",
+        reply_markup=get_batch_keyboard()
+    )
+
+
+@router.message(StateFilter(InventoryStates.waiting_batch_files), F.document)
+async def handle_batch_document(message: Message, state: FSMContext):
+    """Обробник файлу пакетного переобліку: файл одразу завантажується і розбирається у фоні"""
+    if not check_admin(message.from_user.id):
+        await message.answer("Ви не маєте доступу до цього бота.")
+        return
+    
+    # Пакет беремо до першого await: файли, надіслані одночасно, обробляються паралельно
+    # і всі мають потрапити в один пакет (порожній пакет - теж пакет, не починаємо новий)
+    batch = get_batch(message.from_user.id)
+    if batch is None:
+        batch = start_batch(message.from_user.id)
+    document = message.document
+    file_name = document.file_name or document.file_id
+    
+    try:
+        file_info = await message.bot.get_file(document.file_id)
+        file_name = document.file_name or file_info.file_path
+        
+        if file_name.lower().endswith('.zip'):
+            batch.add_zip(message.bot, file_info.file_path, file_name)
+        else:
+            batch.add_csv(message.bot, file_info.file_path, file_name)
+    except Exception as e:
+        # Інші файли пакету залишаються - користувач може надіслати цей файл ще раз
+        await message.answer(f"Помилка при завантаженні файлу {file_name}: {str(e)}")
+        return
+    
+    await message.answer(f"📎 Файл {len(batch)}: {file_name}")
+
+
+@router.message(StateFilter(InventoryStates.waiting_batch_files), F.text == "❌ Скасувати")
+async def cancel_batch_files(message: Message, state: FSMContext):
+    """Скасовує пакетний переоблік"""
+    cancel_batch(message.from_user.id)
+    await state.clear()
+    await message.answer(
+        "Оберіть тип перевірки:",
+        reply_markup=get_inventory_keyboard()
+    )
+
+
+@router.message(StateFilter(InventoryStates.waiting_batch_files), F.text == "✅ Звірити файли")
+async def reconcile_batch_files(message: Message, state: FSMContext):
+    """
+    Звіряє всі файли пакету разом: дані файлів об'єднуються, таблиці категорій
+    завантажуються один раз для всіх файлів, результат - одне повідомлення та один Excel файл
+    """
+    if not check_admin(message.from_user.id):
+        await message.answer("Ви не маєте доступу до цього бота.")
+        return
+    
+    batch = get_batch(message.from_user.id)
+    if not batch:
+        await message.answer("Спочатку надішліть файли з переобліком.")
+        return
+    pop_batch(message.from_user.id)
+    
+    await message.answer(f"Обробляю файли ({len(batch)})...", reply_markup=get_inventory_keyboard())
+    
+    try:
+        with stage_seconds.time(stage="download"):
+            inventory_data, parsed_names, failed_names = await batch.collect()
+        
+        if failed_names:
+            await message.answer(f"⚠️ Не вдалося прочитати файли: {', '.join(failed_names)}")
+        
+        if not inventory_data:
+            await message.answer("Помилка: не вдалося прочитати файли або файли порожні.")
+            await state.clear()
+            await message.answer(
+                "Оберіть тип перевірки:",
+                reply_markup=get_inventory_keyboard()
+            )
+            return
+        
+        # Визначаємо всі категорії з файлів
+        categories_sorted = detect_categories(inventory_data)
+        
+        if not categories_sorted:
+            await message.answer("Не вдалося визначити категорію з артикулів у файлах.")
+            await state.clear()
+            await message.answer(
+                "Оберіть тип перевірки:",
+                reply_markup=get_inventory_keyboard()
+            )
+            return
+        
+        categories_ua = [get_category_ua(cat) for cat in categories_sorted]
+        category = categories_sorted[0]
+        category_ua = categories_ua[0]
+        categories_display = ", ".join(categories_ua)
+        
+        await message.answer(f"Визначено категорії: {categories_display}\nПорівнюю з Google таблицями...")
+        
+        # Одна звірка для об'єднаних даних усіх файлів
+        results = await reconcile_inventory(message.from_user.id, inventory_data)
+        
+        report = InventoryReport(results, inventory_data)
+        
+        # Зберігаємо результати для генерації файлу (в стані лише id результату та категорії)
+        await save_result(state, message.from_user.id, results, inventory_data, category, category_ua, categories_ua)
+        
+        with stage_seconds.time(stage="message"):
+            result_message = f"📁 Файлів: {len(parsed_names)}\n" + report.summary_message(categories_display)
+        await send_result_message(message, result_message)
+        
+        # Пакет звірено: як після перевірки одного файлу, наступний файл - нова перевірка по артах з файлу
+        # (стан не очищаємо, щоб можна було згенерувати файл)
+        await state.set_state(InventoryStates.waiting_file)
+        
+    except CategoryLoadError as e:
+        await answer_load_error(message, state, e)
+    except Exception as e:
+        await message.answer(f"Помилка при обробці файлів: {str(e)}")
+        await state.clear()
+        await message.answer(
+            "Оберіть тип перевірки:",
+            reply_markup=get_inventory_keyboard()
+        )
+
+
 @router.message(StateFilter(InventoryStates.waiting_file), F.document)
 async def handle_document(message: Message, state: FSMContext):
     """Обробник завантаження файлів"""
@@ -111,15 +462,11 @@ async def handle_document(message: Message, state: FSMContext):
     # Завантажуємо файл
     file_info = await message.bot.get_file(document.file_id)
     
-    # Створюємо тимчасовий файл
-    file_path = tempfile.mktemp(suffix='.csv')
-    
     try:
-        await message.bot.download_file(file_info.file_path, file_path)
-        
-        # Парсимо файл
+        # Парсимо файл під час завантаження: частини з Telegram розбираються в потоці, без тимчасового файлу
         await message.answer("Обробляю файл...")
-        inventory_data = parse_csv_file(file_path)
+        with stage_seconds.time(stage="download"):
+            inventory_data = await download_csv(message.bot, file_info.file_path)
         
         if not inventory_data:
             await message.answer("Помилка: не вдалося прочитати файл або файл порожній.")
@@ -132,22 +479,12 @@ async def handle_document(message: Message, state: FSMContext):
         
         # Порівнюємо з таблицями
         await message.answer("Порівнюю з Google таблицями...")
-        results = compare_inventory_with_sheets(client, inventory_data)
+        results = await reconcile_inventory(message.from_user.id, inventory_data)
         
         # Визначаємо всі категорії з файлу (можливо кілька: взуття + зимове взуття тощо)
-        # Для артикулів з кількома категоріями (як "Об") враховуємо всі категорії
-        category_count = {}
-        for data_info in inventory_data.values():
-            original_art = data_info['original_art']
-            categories = get_category_by_prefix(original_art)
-            if categories:
-                # Додаємо всі категорії зі списку (не тільки першу)
-                for category in categories:
-                    category_count[category] = category_count.get(category, 0) + 1
-        
-        if category_count:
-            # Список усіх категорій (від найчастішої до рідкісної)
-            categories_sorted = sorted(category_count, key=category_count.get, reverse=True)
+        categories_sorted = detect_categories(inventory_data)
+        
+        if categories_sorted:
             categories_ua = [get_category_ua(cat) for cat in categories_sorted]
             category = categories_sorted[0]
             category_ua = categories_ua[0]
@@ -159,83 +496,24 @@ async def handle_document(message: Message, state: FSMContext):
             category_ua = get_category_ua(category)
             categories_ua = [category_ua]
         
-        # Зберігаємо результати в стані для генерації файлу (включаючи список категорій)
-        await state.update_data(
-            results=results,
-            inventory_data=inventory_data,
-            category=category,
-            category_ua=category_ua,
-            categories_ua=categories_ua
-        )
+        # Звіт звірки: індекс артикулів файлу будується один раз і спільний
+        # для повідомлення та статистики
+        report = InventoryReport(results, inventory_data)
         
-        # Створюємо мапу для підрахунку статистики
-        art_map = {}
-        for norm_art, data_info in inventory_data.items():
-            original_art = data_info['original_art']
-            art_map[original_art] = {
-                'original_art': original_art,
-                'sizes': data_info['sizes'],
-                'original_sizes': data_info.get('original_sizes', {}),
-                'amount': data_info.get('amount', 0)
-            }
-        
-        # Підраховуємо статистику
-        stats = calculate_statistics(results, inventory_data, art_map)
+        # Зберігаємо результати для генерації файлу (в стані лише id результату та категорії)
+        await save_result(state, message.from_user.id, results, inventory_data, category, category_ua, categories_ua)
         
         # Формуємо результат (показуємо всі категорії з файлу)
         categories_display = ", ".join(categories_ua)
-        message_parts = []
-        message_parts.append(f"📋 Категорії: {categories_display}\n")
-        message_parts.append(f"📊 Всього артикулів у файлі: {len(inventory_data)}\n\n")
-        
-        # Додаємо статистику
-        message_parts.append("📈 СТАТИСТИКА:\n")
-        message_parts.append(f"Розмірів: {stats['total_sizes']}\n")
-        message_parts.append(f"Сошлося: {stats['matched_sizes']}\n")
-        message_parts.append(f"Недостача: {stats['missing_sizes']}\n")
-        message_parts.append(f"Не відскановано: {stats['not_scanned_sizes']}\n\n")
-        
-        if results['missing_sizes']:
-            message_parts.append("❌ НЕДОСТАЧА РОЗМІРІВ:")
-            for art, sizes in results['missing_sizes'].items():
-                message_parts.append(f"\n{art}: {', '.join(sizes)}")
-        
-        if results['extra_sizes']:
-            message_parts.append("\n\n✅ НАДЛИШОК РОЗМІРІВ:")
-            for art, sizes in results['extra_sizes'].items():
-                message_parts.append(f"\n{art}: {', '.join(sizes)}")
-        
-        if results['not_found']:
-            message_parts.append(f"\n\n⚠️ НЕ ЗНАЙДЕНО В ТАБЛИЦЯХ (є в файлі скану) ({len(results['not_found'])}):")
-            message_parts.append(f"{', '.join(results['not_found'][:10])}")
-            if len(results['not_found']) > 10:
-                message_parts.append(f"\n... та ще {len(results['not_found']) - 10} артикулів")
-        
-        if results['matched']:
-            message_parts.append(f"\n\n✓ СПІВПАДАЮТЬ ({len(results['matched'])} артикулів)")
-        
-        result_message = ''.join(message_parts) if message_parts else f"Всі артикули ({categories_display}) співпадають!"
-        
-        # Створюємо інлайн кнопку
-        keyboard = [
-            [InlineKeyboardButton(text="📥 Отримати файл", callback_data="get_excel_file")]
-        ]
-        reply_markup = InlineKeyboardMarkup(inline_keyboard=keyboard)
-        
-        # Розбиваємо повідомлення на частини, якщо воно занадто довге
-        max_length = 4000
-        if len(result_message) > max_length:
-            parts = [result_message[i:i+max_length] for i in range(0, len(result_message), max_length)]
-            for i, part in enumerate(parts):
-                if i == len(parts) - 1:
-                    await message.answer(part, reply_markup=reply_markup)
-                else:
-                    await message.answer(part)
-        else:
-            await message.answer(result_message, reply_markup=reply_markup)
+        with stage_seconds.time(stage="message"):
+            result_message = report.summary_message(categories_display)
+        
+        await send_result_message(message, result_message)
         
         # Не очищаємо стан, щоб можна було згенерувати файл
         
+    except CategoryLoadError as e:
+        await answer_load_error(message, state, e)
     except Exception as e:
         await message.answer(f"Помилка при обробці файлу: {str(e)}")
         await state.clear()
@@ -243,10 +521,6 @@ async def handle_document(message: Message, state: FSMContext):
             "Оберіть тип перевірки:",
             reply_markup=get_inventory_keyboard()
         )
-    finally:
-        # Видаляємо тимчасовий файл
-        if os.path.exists(file_path):
-            os.remove(file_path)
 
 
 @router.message(StateFilter(InventoryStates.waiting_single_art), F.text)
@@ -273,7 +547,26 @@ async def handle_single_art(message: Message, state: FSMContext):
     await message.answer("Перевіряю артикул в таблицях...")
     
     # Отримуємо розміри з таблиць
-    sheet_sizes = get_art_sizes_from_sheets(client, art, categories)
+    # Шукаємо в індексі розмірів теплого кешу; якщо категорії ще не завантажені або застаріли -
+    # завантажуємо їх (індекс будується з того ж завантаження, наступні перевірки без запитів до Google)
+    with stage_seconds.time(stage="single_art"):
+        sheet_sizes = category_prefetcher.get_art_sizes(art, categories)
+        if sheet_sizes is None:
+            try:
+                await get_sheet_data(categories)
+            except CategoryLoadError as e:
+                await answer_load_error(message, state, e)
+                return
+            sheet_sizes = category_prefetcher.get_art_sizes(art, categories)
+        # Теплий кеш вимкнено (WARM_CACHE_MAX_AGE=0) - шукаємо напряму в таблицях
+        if sheet_sizes is None:
+            try:
+                sheet_sizes = await reconciliation_service.run(
+                    message.from_user.id, get_art_sizes_from_sheets, client, art, categories
+                )
+            except CategoryLoadError as e:
+                await answer_load_error(message, state, e)
+                return
     
     # Перекладаємо категорії на українську
     category = categories[0]
@@ -318,12 +611,15 @@ async def get_excel_file(callback: CallbackQuery, state: FSMContext):
     # Отримуємо дані зі стану
     state_data = await state.get_data()
     
-    if not state_data or 'results' not in state_data:
+    # Результати звірки лежать в result_store, в стані - лише їх id
+    result_id = state_data.get('result_id') if state_data else None
+    stored = await asyncio.to_thread(result_store.get, result_id) if result_id else None
+    
+    if not stored:
         await callback.answer("Дані не знайдено. Будь ласка, виконайте перевірку спочатку.", show_alert=True)
         return
     
-    results = state_data['results']
-    inventory_data = state_data['inventory_data']
+    report = InventoryReport(stored['results'], stored['inventory_data'])
     # Підтримка кількох категорій: categories_ua — список, інакше fallback на одну категорію
     categories_ua = state_data.get('categories_ua')
     if not categories_ua:
@@ -336,8 +632,9 @@ async def get_excel_file(callback: CallbackQuery, state: FSMContext):
     try:
         await callback.answer("Генерую файл...")
         
-        # Генеруємо Excel файл (передаємо рядок з усіма категоріями для підпису)
-        excel_path = generate_inventory_excel(results, inventory_data, categories_display)
+        # Генеруємо Excel файл (категорії - в назві файлу та підписі)
+        with stage_seconds.time(stage="excel"):
+            excel_path = await reconciliation_service.run(callback.from_user.id, generate_inventory_excel, report)
         
         # Відправляємо файл з назвою за категоріями
         file = FSInputFile(excel_path, filename=f"переоблік_{filename_safe}.xlsx")
@@ -347,7 +644,8 @@ async def get_excel_file(callback: CallbackQuery, state: FSMContext):
         if os.path.exists(excel_path):
             os.remove(excel_path)
         
-        # Очищаємо стан після відправки файлу
+        # Очищаємо стан та результат після відправки файлу
+        await asyncio.to_thread(result_store.delete, result_id)
         await state.clear()
         
     except Exception as e:
@@ -370,15 +668,11 @@ async def handle_category_file(message: Message, state: FSMContext):
     # Завантажуємо файл
     file_info = await message.bot.get_file(document.file_id)
     
-    # Створюємо тимчасовий файл
-    file_path = tempfile.mktemp(suffix='.csv')
-    
     try:
-        await message.bot.download_file(file_info.file_path, file_path)
-        
-        # Парсимо файл
+        # Парсимо файл під час завантаження: частини з Telegram розбираються в потоці, без тимчасового файлу
         await message.answer("Обробляю файл...")
-        inventory_data = parse_csv_file(file_path)
+        with stage_seconds.time(stage="download"):
+            inventory_data = await download_csv(message.bot, file_info.file_path)
         
         if not inventory_data:
             await message.answer("Помилка: не вдалося прочитати файл або файл порожній.")
@@ -390,17 +684,9 @@ async def handle_category_file(message: Message, state: FSMContext):
             return
         
         # Визначаємо всі категорії з файлу (можливо кілька)
-        # Для артикулів з кількома категоріями (як "Об") враховуємо всі категорії
-        category_count = {}
-        for data_info in inventory_data.values():
-            original_art = data_info['original_art']
-            categories = get_category_by_prefix(original_art)
-            if categories:
-                # Додаємо всі категорії зі списку (не тільки першу)
-                for category in categories:
-                    category_count[category] = category_count.get(category, 0) + 1
-        
-        if not category_count:
+        categories_sorted = detect_categories(inventory_data)
+        
+        if not categories_sorted:
             first_art = list(inventory_data.values())[0]['original_art']
             await message.answer(
                 f"Не вдалося визначити категорію з артикулів у файлі.\n"
@@ -414,8 +700,6 @@ async def handle_category_file(message: Message, state: FSMContext):
             )
             return
         
-        # Список усіх категорій (від найчастішої до рідкісної)
-        categories_sorted = sorted(category_count, key=category_count.get, reverse=True)
         categories_ua = [get_category_ua(cat) for cat in categories_sorted]
         category = categories_sorted[0]
         category_ua = categories_ua[0]
@@ -424,84 +708,25 @@ async def handle_category_file(message: Message, state: FSMContext):
         await message.answer(f"Визначено категорії: {categories_display}\nПорівнюю з Google таблицями...")
         
         # Порівнюємо з таблицями
-        results = compare_inventory_with_sheets(client, inventory_data)
-        
-        # Зберігаємо результати в стані для генерації файлу (включаючи список категорій)
-        await state.update_data(
-            results=results,
-            inventory_data=inventory_data,
-            category=category,
-            category_ua=category_ua,
-            categories_ua=categories_ua
-        )
+        results = await reconcile_inventory(message.from_user.id, inventory_data)
         
-        # Створюємо мапу для підрахунку статистики
-        art_map = {}
-        for norm_art, data_info in inventory_data.items():
-            original_art = data_info['original_art']
-            art_map[original_art] = {
-                'original_art': original_art,
-                'sizes': data_info['sizes'],
-                'original_sizes': data_info.get('original_sizes', {}),
-                'amount': data_info.get('amount', 0)
-            }
-        
-        # Підраховуємо статистику
-        stats = calculate_statistics(results, inventory_data, art_map)
-        
-        # Формуємо результат (показуємо всі категорії)
-        message_parts = []
-        message_parts.append(f"📋 Категорії: {categories_display}\n")
-        message_parts.append(f"📊 Всього артикулів у файлі: {len(inventory_data)}\n\n")
-        
-        # Додаємо статистику
-        message_parts.append("📈 СТАТИСТИКА:\n")
-        message_parts.append(f"Розмірів: {stats['total_sizes']}\n")
-        message_parts.append(f"Сошлося: {stats['matched_sizes']}\n")
-        message_parts.append(f"Недостача: {stats['missing_sizes']}\n")
-        message_parts.append(f"Не відскановано: {stats['not_scanned_sizes']}\n\n")
-        
-        if results['missing_sizes']:
-            message_parts.append("❌ НЕДОСТАЧА РОЗМІРІВ:")
-            for art, sizes in results['missing_sizes'].items():
-                message_parts.append(f"\n{art}: {', '.join(sizes)}")
-        
-        if results['extra_sizes']:
-            message_parts.append("\n\n✅ НАДЛИШОК РОЗМІРІВ:")
-            for art, sizes in results['extra_sizes'].items():
-                message_parts.append(f"\n{art}: {', '.join(sizes)}")
-        
-        if results['not_found']:
-            message_parts.append(f"\n\n⚠️ НЕ ЗНАЙДЕНО В ТАБЛИЦЯХ (є в файлі скану) ({len(results['not_found'])}):")
-            message_parts.append(f"{', '.join(results['not_found'][:10])}")
-            if len(results['not_found']) > 10:
-                message_parts.append(f"\n... та ще {len(results['not_found']) - 10} артикулів")
-        
-        if results['matched']:
-            message_parts.append(f"\n\n✓ СПІВПАДАЮТЬ ({len(results['matched'])} артикулів)")
-        
-        result_message = ''.join(message_parts) if message_parts else f"Всі артикули ({categories_display}) співпадають!"
-        
-        # Створюємо інлайн кнопку
-        keyboard = [
-            [InlineKeyboardButton(text="📥 Отримати файл", callback_data="get_excel_file")]
-        ]
-        reply_markup = InlineKeyboardMarkup(inline_keyboard=keyboard)
-        
-        # Розбиваємо повідомлення на частини, якщо воно занадто довге
-        max_length = 4000
-        if len(result_message) > max_length:
-            parts = [result_message[i:i+max_length] for i in range(0, len(result_message), max_length)]
-            for i, part in enumerate(parts):
-                if i == len(parts) - 1:
-                    await message.answer(part, reply_markup=reply_markup)
-                else:
-                    await message.answer(part)
-        else:
-            await message.answer(result_message, reply_markup=reply_markup)
+        # Звіт звірки: індекс артикулів файлу будується один раз і спільний
+        # для повідомлення та статистики
+        report = InventoryReport(results, inventory_data)
+        
+        # Зберігаємо результати для генерації файлу (в стані лише id результату та категорії)
+        await save_result(state, message.from_user.id, results, inventory_data, category, category_ua, categories_ua)
+        
+        # Формуємо результат (показуємо всі категорії з файлу)
+        with stage_seconds.time(stage="message"):
+            result_message = report.summary_message(categories_display)
+        
+        await send_result_message(message, result_message)
         
         # Не очищаємо стан, щоб можна було згенерувати файл
         
+    except CategoryLoadError as e:
+        await answer_load_error(message, state, e)
     except Exception as e:
         await message.answer(f"Помилка при обробці файлу: {str(e)}")
         await state.clear()
@@ -509,7 +734,3 @@ async def handle_category_file(message: Message, state: FSMContext):
             "Оберіть тип перевірки:",
             reply_markup=get_inventory_keyboard()
         )
-    finally:
-        # Видаляємо тимчасовий файл
-        if os.path.exists(file_path):
-            os.remove(file_path)
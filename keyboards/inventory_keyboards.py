@@ -5,6 +5,15 @@ def get_inventory_keyboard():
     keyboard = [
         [KeyboardButton(text="Перевірка всієї категорії")],
         [KeyboardButton(text="Перевірка по артах з файлу")],
+        [KeyboardButton(text="Перевірка кількох файлів")],
         [KeyboardButton(text="Перевірка одного арту")]
     ]
     return ReplyKeyboardMarkup(keyboard=keyboard, resize_keyboard=True)
+
+
+def get_batch_keyboard():
+    keyboard = [
+        [KeyboardButton(text="✅ Звірити файли")],
+        [KeyboardButton(text="❌ Скасувати")]
+    ]
+    return ReplyKeyboardMarkup(keyboard=keyboard, resize_keyboard=True)
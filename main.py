@@ -1,28 +1,41 @@
 import asyncio
 import logging
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
-from config import token
+from config import log_level, token
+from utils.reconciliation_service import reconciliation_service
+from utils.prefetcher import category_prefetcher
+from utils.fsm_storage import create_fsm_storage
+from utils.metrics import metrics_server
 
 
 logging.basicConfig(
-    level=logging.DEBUG,
+    level=getattr(logging, log_level, logging.INFO),
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
 
 bot = Bot(token=token)
-storage = MemoryStorage()
+storage = create_fsm_storage()
 dp = Dispatcher(bot=bot, storage=storage)
 
 
 async def on_startup():
     """Функція, яка виконується при запуску бота"""
     logging.info("Бот запущено!")
+    # Фонове оновлення даних категорій, щоб звірка не чекала на Google таблиці
+    category_prefetcher.start()
+    # Метрики етапів звірки на /metrics
+    try:
+        await metrics_server.start()
+    except OSError as e:
+        logging.error(f"Не вдалося запустити сервер метрик: {e}")
 
 
 async def on_shutdown():
     """Функція, яка виконується при зупинці бота"""
+    await category_prefetcher.stop()
+    await metrics_server.stop()
+    reconciliation_service.shutdown()
     logging.info("Бот зупинено!")
 
 
@@ -5,3 +5,4 @@ class InventoryStates(StatesGroup):
     waiting_file = State()
     waiting_single_art = State()
     waiting_category = State()
+    waiting_batch_files = State()
@@ -0,0 +1,7 @@
+import os
+
+# Тести не пишуть знімки таблиць в data/ (тест знімків підставляє своє сховище)
+os.environ["SNAPSHOTS_ENABLED"] = "0"
+# Обробники бота без credentials Google: gspread клієнт для локального сервера таблиць (запитів тести не роблять)
+os.environ.setdefault("SHEETS_API_URL", "http://127.0.0.1:9/v4/spreadsheets")
+os.environ.setdefault("DRIVE_API_URL", "http://127.0.0.1:9/drive/v3/files")
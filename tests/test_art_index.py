@@ -0,0 +1,123 @@
+"""
+Перевірка одного артикулу з індексу розмірів теплого кешу дає той самий результат,
+що й пошук по таблицях get_art_sizes_from_sheets
+"""
+import pytest
+from benchmarks import stocktake
+from benchmarks.fake_gspread import FakeGspreadClient
+from config import data
+from utils import category_loader
+from utils.category_loader import CategoryLoadError, load_categories_sync
+from utils.metrics import category_load_errors
+from utils.prefetcher import CategoryPrefetcher
+from utils.sheets_cache import clear_sheets_cache, get_spreadsheet_id
+from utils.sheets_utils import get_art_sizes_from_sheets, get_category_by_prefix, get_category_worksheets
+from utils.snapshot_store import SnapshotStore
+
+# Рядки, на яких індекс найлегше розійтися зі старим пошуком:
+# роздільники пробіл / дефіс, кирилиця, числові розміри, варіант ".130", невідомі розміри, порожні комірки
+EDGE_ROWS = [
+    ("TST-1", "S M"),
+    ("TST 1.130", "L-XL"),
+    ("tst1", "46,48, хл"),
+    ("TST-1.130", "2ХЛ,-2"),
+    ("TST-2", "abc, 99"),
+    ("TST-3", ""),
+    ("TST-3", "  "),
+    ("", "XL"),
+    ("TST-4", "5(2ХL)"),
+    ("TST-5", "XXL, 2xl"),
+]
+
+
+CATALOG = stocktake.make_catalog(600)
+
+
+def make_sheets():
+    sheets = stocktake.make_category_sheets(CATALOG)
+    details = data["costumes"]
+    link, sheet_number = get_category_worksheets("costumes")[0]
+    rows = sheets[(get_spreadsheet_id(link), sheet_number)]
+    for art, size in EDGE_ROWS:
+        row = [""] * len(rows[0])
+        row[details["art"] - 1] = art
+        row[details["size"] - 1] = size
+        row[details["amount"] - 1] = "1"
+        rows.append(row)
+    return sheets
+
+
+def sample_arts(categories):
+    """Артикули асортименту категорій (з варіантами і без), крайові випадки та відсутні артикули"""
+    arts = set()
+    for category, art, _ in CATALOG:
+        if category in categories:
+            arts.update(art + variant for variant in stocktake.VARIANTS)
+    arts.update(art for art, _ in EDGE_ROWS if art)
+    arts.update(["TST 1", "tst-1.130", "TST-404"])
+    return sorted(arts)
+
+
+def warm_prefetcher(client, categories):
+    prefetcher = CategoryPrefetcher(categories, 0, 600)
+    prefetcher.update(load_categories_sync(client, categories))
+    return prefetcher
+
+
+def assert_parity(client, prefetcher, loaded_categories):
+    checked = 0
+    for art in sample_arts(loaded_categories):
+        categories = get_category_by_prefix(art)
+        if not categories or not set(categories) <= set(loaded_categories):
+            continue
+        assert prefetcher.get_art_sizes(art, categories) == get_art_sizes_from_sheets(client, art, categories), art
+        checked += 1
+    assert checked > 100
+
+
+@pytest.fixture
+def client():
+    clear_sheets_cache()
+    yield FakeGspreadClient(make_sheets())
+    clear_sheets_cache()
+
+
+def test_art_sizes_match_sheet_scan(client):
+    categories = [category for category in data if get_category_worksheets(category)]
+    prefetcher = warm_prefetcher(client, categories)
+    assert_parity(client, prefetcher, categories)
+    # Крайові рядки: ключ - повний артикул (варіант .130 окремо), числові розміри переводяться в буквені
+    assert prefetcher.get_art_sizes("TST-1", ["costumes"]) == {"S", "M", "XL"}
+    assert prefetcher.get_art_sizes("TST-1.130", ["costumes"]) == {"L", "XL", "2XL"}
+    assert prefetcher.get_art_sizes("TST-3", ["costumes"]) == set()
+
+
+def test_art_sizes_from_snapshots_match_sheet_scan(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(category_loader, "snapshot_store", SnapshotStore(str(tmp_path / "snapshots.sqlite3")))
+    categories = ["costumes", "costumes_fleece", "jeans", "shoes", "wintershoes", "bags"]
+    warm_prefetcher(client, categories)
+    fetches = client.requests.get("values_batch_get", 0)
+
+    prefetcher = warm_prefetcher(client, categories)
+    assert client.requests.get("values_batch_get", 0) == fetches
+    assert_parity(client, prefetcher, categories)
+
+
+def test_missing_category_is_not_answered_from_index(client):
+    prefetcher = warm_prefetcher(client, ["costumes"])
+    assert prefetcher.get_art_sizes("TST-1", ["costumes", "jeans"]) is None
+
+
+def test_unreadable_sheet_raises_load_error(client):
+    """Лист, який не вдалося прочитати, - CategoryLoadError і лічильник category_load_errors_total, а не print"""
+    link, _ = get_category_worksheets("jeans")[0]
+    del client._sheets[get_spreadsheet_id(link)]
+    errors_before = category_load_errors.values().get((("category", "jeans"),), 0)
+
+    with pytest.raises(CategoryLoadError) as error:
+        get_art_sizes_from_sheets(client, "Дж-1", ["jeans"])
+    assert error.value.categories == ["jeans"]
+    with pytest.raises(CategoryLoadError):
+        load_categories_sync(client, ["jeans", "costumes"])
+
+    assert category_load_errors.values()[(("category", "jeans"),)] == errors_before + 2
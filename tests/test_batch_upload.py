@@ -0,0 +1,151 @@
+"""
+Пакетний переоблік: файли, надіслані одночасно (aiogram обробляє їх паралельними завданнями),
+потрапляють в один пакет
+"""
+import asyncio
+from types import SimpleNamespace
+from config import administrators
+from handlers import inventory_handlers
+from handlers.inventory_handlers import handle_batch_document, reconcile_batch_files
+from states.inventory_states import InventoryStates
+from utils.batch_upload import cancel_batch, get_batch, start_batch
+
+USER_ID = administrators[0]
+CSV_HEADER = "Назва;Артикул;Штрихкод;Інформація;Кількість;Відскановано\n"
+
+
+class FakeBot:
+    """get_file та download_file з затримкою, як запити до Telegram"""
+
+    def __init__(self, files, fail=()):
+        self.files = files
+        self.fail = set(fail)
+
+    async def get_file(self, file_id):
+        await asyncio.sleep(0.01)
+        if file_id in self.fail:
+            raise RuntimeError("Telegram недоступний")
+        return SimpleNamespace(file_path=f"documents/{file_id}")
+
+    async def download_file(self, file_path, destination=None, seek=True):
+        await asyncio.sleep(0.01)
+        destination.write(self.files[file_path.split("/")[-1]].encode("utf-8"))
+        destination.flush()
+
+
+class FakeMessage:
+    def __init__(self, bot, file_id=None, text=None):
+        self.bot = bot
+        self.from_user = SimpleNamespace(id=USER_ID)
+        self.document = SimpleNamespace(file_id=file_id, file_name=f"{file_id}.csv") if file_id else None
+        self.text = text
+        self.answers = []
+
+    async def answer(self, text, **kwargs):
+        self.answers.append(text)
+
+
+def make_files(count):
+    return {
+        f"shelf{i}": CSV_HEADER + f"Джинси;Дж-{i};;32;1;1\n"
+        for i in range(count)
+    }
+
+
+async def send_documents(bot, file_ids):
+    messages = [FakeMessage(bot, file_id) for file_id in file_ids]
+    await asyncio.gather(*(handle_batch_document(message, None) for message in messages))
+    return messages
+
+
+def test_concurrent_documents_go_to_one_batch():
+    async def scenario():
+        files = make_files(5)
+        start_batch(USER_ID)
+        try:
+            await send_documents(FakeBot(files), list(files))
+            batch = get_batch(USER_ID)
+            inventory_data, parsed_names, failed_names = await batch.collect()
+            return batch.file_names, inventory_data, parsed_names, failed_names
+        finally:
+            cancel_batch(USER_ID)
+
+    file_names, inventory_data, parsed_names, failed_names = asyncio.run(scenario())
+    assert sorted(file_names) == sorted(f"shelf{i}.csv" for i in range(5))
+    assert sorted(parsed_names) == sorted(file_names)
+    assert failed_names == []
+    assert len(inventory_data) == 5
+
+
+def test_concurrent_documents_without_started_batch():
+    """Перший файл починає пакет, решта одночасно надісланих додаються до нього"""
+    async def scenario():
+        files = make_files(3)
+        cancel_batch(USER_ID)
+        try:
+            await send_documents(FakeBot(files), list(files))
+            return get_batch(USER_ID).file_names
+        finally:
+            cancel_batch(USER_ID)
+
+    assert len(asyncio.run(scenario())) == 3
+
+
+def test_failed_download_is_reported():
+    async def scenario():
+        files = make_files(3)
+        start_batch(USER_ID)
+        try:
+            messages = await send_documents(FakeBot(files, fail=["shelf1"]), list(files))
+            return get_batch(USER_ID).file_names, messages
+        finally:
+            cancel_batch(USER_ID)
+
+    file_names, messages = asyncio.run(scenario())
+    assert sorted(file_names) == ["shelf0.csv", "shelf2.csv"]
+    assert messages[1].answers == ["Помилка при завантаженні файлу shelf1.csv: Telegram недоступний"]
+
+
+class FakeState:
+    def __init__(self, state):
+        self.state = state
+        self.data = {}
+
+    async def set_state(self, state=None):
+        self.state = state
+
+    async def update_data(self, **kwargs):
+        self.data.update(kwargs)
+
+    async def clear(self):
+        self.state = None
+        self.data = {}
+
+
+def test_reconciled_batch_leaves_batch_state(monkeypatch):
+    """Після результату пакету користувач не залишається в збиранні файлів (наступний файл не починає пакет мовчки)"""
+    async def reconcile_inventory(user_id, inventory_data):
+        return {'missing_sizes': {}, 'extra_sizes': {}, 'not_found': [], 'not_scanned': {}, 'matched': []}
+
+    async def save_result(state, user_id, results, *args):
+        await state.update_data(result_id="test")
+
+    monkeypatch.setattr(inventory_handlers, "reconcile_inventory", reconcile_inventory)
+    monkeypatch.setattr(inventory_handlers, "save_result", save_result)
+
+    async def scenario():
+        files = make_files(2)
+        bot = FakeBot(files)
+        state = FakeState(InventoryStates.waiting_batch_files)
+        start_batch(USER_ID)
+        try:
+            await send_documents(bot, list(files))
+            await reconcile_batch_files(FakeMessage(bot, text="✅ Звірити файли"), state)
+            return state, get_batch(USER_ID)
+        finally:
+            cancel_batch(USER_ID)
+
+    state, batch = asyncio.run(scenario())
+    assert batch is None
+    assert state.state == InventoryStates.waiting_file
+    assert state.data == {"result_id": "test"}
@@ -0,0 +1,108 @@
+"""
+get_category_by_prefix (trie) визначає ті самі категорії, що й перевірка префіксів по черзі
+"""
+import random
+import pytest
+from utils import sheets_utils
+from utils.sheets_utils import CATEGORY_PREFIXES, _compile_prefix_trie, get_category_by_prefix
+
+
+# get_category_by_prefix до trie (utils/sheets_utils.py з коміту 944cb6f) - без змін, тільки перейменовано
+def baseline_category_by_prefix(art):
+    prefixes = {
+        "Дж": ["jeans"],
+        "Фут": ["tshirts_polo"],
+        "Пл": ["shorts_swim"],
+        "П": ["tshirts_polo"],
+        "Кос": ["costumes_fleece", "costumes"], 
+        "Ко": ["sweaters"],
+        "Дш": ["shorts_jeans"],
+        "Шор": ["shorts_textile"],
+        "Шо": ["shorts_swim"],
+        "Ку": ["jackets"],
+        "Ж": ["waistcoats"],
+        "Бр": ["trousers"],
+        "Шт": ["sport_trousers"],
+        "Ру": ["shirts"],
+        "Н": ["socks"],
+        "Тр": ["underwear"],
+        "Об": ["shoes", "wintershoes"],
+        "Ке": ["caps"],
+        "Шап": ["hats"],
+        "Ре": ["belts"],
+        "Сум": ["bags"],
+        "Клч": ["purses"],
+        "Кл": ["costumes_summer"],
+        "Т": ["tapki"],
+        "Оч": ["glasses"],
+    }
+
+    # Приводимо артикул до верхнього регістру для порівняння
+    art_upper = art.upper() if art else ""
+    
+    for prefix, categories in prefixes.items():
+        # Приводимо префікс до верхнього регістру для порівняння
+        prefix_upper = prefix.upper()
+        if art_upper.startswith(prefix_upper):
+            return categories 
+    return None
+
+
+def linear_category_by_prefix(prefixes, art):
+    """Перевірка префіксів prefixes по черзі, перший збіг виграє"""
+    art_upper = art.upper() if art else ""
+    for prefix, categories in prefixes.items():
+        if art_upper.startswith(prefix.upper()):
+            return categories
+    return None
+
+
+def routing_cases(prefixes, seed=0):
+    """Артикули для перевірки: префікси, префікс + символ, регістр, крайні випадки, випадкові"""
+    letters = sorted({char for prefix in prefixes for char in prefix})
+    alphabet = letters + [char.lower() for char in letters] + list("-. 0123456789ABCxyz")
+    cases = [None, "", " ", "-", "123", "Артикул"]
+    for prefix in prefixes:
+        cases += [prefix, prefix.lower(), prefix.upper(), prefix + "-210", prefix.lower() + "-210.130"]
+        cases += [prefix + char for char in alphabet]
+        cases += [prefix[:-1], " " + prefix]
+    rng = random.Random(seed)
+    for _ in range(20000):
+        cases.append(''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 6))))
+    return cases
+
+
+# Таблиці з префіксами, які перекриваються: коротший префікс перед довшим (довший ніколи не виграє),
+# довший перед коротшим, ланцюжки, однакові в різному регістрі, латиниця / кирилиця з однаковим написанням
+OVERLAPPING_PREFIXES = [
+    {"К": ["short"], "Кос": ["long"]},
+    {"Кос": ["long"], "К": ["short"]},
+    {"Ко": ["middle"], "К": ["short"], "Кос": ["long"], "Косм": ["longest"]},
+    {"Косм": ["longest"], "Кос": ["long"], "Ко": ["middle"], "К": ["short"]},
+    {"кос": ["lower"], "КОС": ["upper"], "Ко": ["middle"]},
+    {"Ко": ["cyrillic"], "Ko": ["latin"], "K": ["latin_short"]},
+    {"ab": ["ab"], "a": ["a"], "abc": ["abc"], "b": ["b"], "bc": ["bc"]},
+]
+
+
+@pytest.fixture
+def prefix_table(monkeypatch):
+    """Підміняє таблицю префіксів get_category_by_prefix (та скидає кеш результатів)"""
+    def use(prefixes):
+        monkeypatch.setattr(sheets_utils, "_PREFIX_TRIE", _compile_prefix_trie(prefixes))
+        get_category_by_prefix.cache_clear()
+
+    yield use
+    get_category_by_prefix.cache_clear()
+
+
+def test_configured_prefixes_match_baseline():
+    for art in routing_cases(CATEGORY_PREFIXES):
+        assert get_category_by_prefix(art) == baseline_category_by_prefix(art), repr(art)
+
+
+@pytest.mark.parametrize("prefixes", OVERLAPPING_PREFIXES)
+def test_overlapping_prefixes_match_linear_order(prefix_table, prefixes):
+    prefix_table(prefixes)
+    for art in routing_cases(prefixes):
+        assert get_category_by_prefix(art) == linear_category_by_prefix(prefixes, art), repr(art)
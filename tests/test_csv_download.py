@@ -0,0 +1,99 @@
+"""
+download_csv: CSV з Telegram розбирається під час завантаження, але не в потоці event loop,
+результат - як у parse_csv_file
+"""
+import asyncio
+import os
+import tempfile
+import threading
+import pytest
+from benchmarks.stocktake import make_catalog, make_scanner_csv
+from utils import process_engine
+from utils.process_engine import BackgroundCsvWriter, ProcessCsvInventoryParser, download_csv
+from utils.reconciliation_service import ReconciliationService
+from utils.sheets_utils import CsvInventoryParser, parse_csv_file
+
+
+class FakeBot:
+    """download_file частинами, як aiogram: write + flush на кожну частину в event loop"""
+
+    def __init__(self, raw, chunk_size=4096, fail_after=None):
+        self.raw = raw
+        self.chunk_size = chunk_size
+        self.fail_after = fail_after
+
+    async def download_file(self, file_path, destination=None, seek=True):
+        for number, start in enumerate(range(0, len(self.raw), self.chunk_size)):
+            if number == self.fail_after:
+                raise ConnectionError("з'єднання з Telegram перервано")
+            destination.write(self.raw[start:start + self.chunk_size])
+            destination.flush()
+            await asyncio.sleep(0)
+
+
+class ThreadRecordingParser(CsvInventoryParser):
+    """CsvInventoryParser, який запам'ятовує потоки, в яких розбирались частини"""
+
+    def __init__(self):
+        super().__init__()
+        self.threads = set()
+
+    def write(self, chunk):
+        self.threads.add(threading.get_ident())
+        return super().write(chunk)
+
+
+@pytest.fixture(scope="module")
+def scanner_csv():
+    return make_scanner_csv(make_catalog(5000))
+
+
+def parse_file(raw):
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    with os.fdopen(fd, "wb") as f:
+        f.write(raw)
+    try:
+        return parse_csv_file(path)
+    finally:
+        os.remove(path)
+
+
+def test_download_csv_matches_parse_csv_file(scanner_csv):
+    assert asyncio.run(download_csv(FakeBot(scanner_csv), "documents/file.csv")) == parse_file(scanner_csv)
+
+
+def test_chunks_are_parsed_off_the_event_loop(scanner_csv, monkeypatch):
+    parsers = []
+
+    def create_csv_parser():
+        parsers.append(ThreadRecordingParser())
+        return parsers[-1]
+
+    monkeypatch.setattr(process_engine, "create_csv_parser", create_csv_parser)
+
+    async def scenario():
+        inventory_data = await download_csv(FakeBot(scanner_csv), "documents/file.csv")
+        return inventory_data, threading.get_ident()
+
+    inventory_data, loop_thread = asyncio.run(scenario())
+    assert inventory_data == parse_file(scanner_csv)
+    assert parsers[0].threads and loop_thread not in parsers[0].threads
+
+
+def test_interrupted_download_raises(scanner_csv):
+    with pytest.raises(ConnectionError):
+        asyncio.run(download_csv(FakeBot(scanner_csv, fail_after=3), "documents/file.csv"))
+
+
+def test_process_parser_in_background(scanner_csv):
+    service = ReconciliationService(1, 2)
+
+    async def scenario():
+        writer = BackgroundCsvWriter(ProcessCsvInventoryParser(chunk_rows=500, service=service))
+        await FakeBot(scanner_csv).download_file("documents/file.csv", destination=writer, seek=False)
+        return await writer.aclose()
+
+    try:
+        assert asyncio.run(scenario()) == parse_file(scanner_csv)
+    finally:
+        service.shutdown()
@@ -0,0 +1,184 @@
+"""
+normalize_size (таблиці та lru_cache) дає той самий результат, що й реалізація до оптимізації
+"""
+import itertools
+import re
+from utils.sheets_utils import normalize_size, split_sizes
+
+
+# normalize_size до оптимізації (utils/sheets_utils.py з коміту 944cb6f) - без змін, тільки перейменовано
+def get_size_mapping():
+    """Повертає маппінг числових розмірів на буквені"""
+    return {
+        '46': 'S',
+        '48': 'M',
+        '50': 'L',
+        '52': 'XL',
+        '54': '2XL',
+        '56': '3XL',
+        '58': '4XL',
+        '60': '5XL',
+    }
+
+
+def baseline_normalize_size(size):
+    """Нормалізує розмір, конвертуючи кирилицю в латиницю та числові розміри в буквені"""
+    import logging
+    import re
+    
+    if not size:
+        return ""
+    
+    original_size = size
+    size = size.strip()
+    
+    # Обробка розмірів типу "5(2ХL)" - витягуємо розмір з дужок
+    # Шукаємо патерн: число(розмір), наприклад "5(2ХL)" -> "2ХL"
+    bracket_match = re.search(r'\(([^)]+)\)', size)
+    if bracket_match:
+        size_in_brackets = bracket_match.group(1).strip()
+        # Нормалізуємо розмір з дужок
+        normalized_bracket = baseline_normalize_size(size_in_brackets)
+        if normalized_bracket:
+            logging.debug(f"[normalize_size] '{original_size}' -> витягнуто з дужок '{size_in_brackets}' -> '{normalized_bracket}'")
+            return normalized_bracket
+    
+    # Спочатку перевіряємо маппінг числових розмірів (46, 48, 50, 52, 54, 56, 58, 60)
+    size_mapping = get_size_mapping()
+    if size in size_mapping:
+        return size_mapping[size]
+    
+    # Конвертуємо до верхнього регістру для обробки кирилиці
+    size_upper = size.upper()
+    size_lower = size.lower()
+    
+    # Конвертація кирилиці в латиницю для розмірів (підтримка великих та малих букв)
+    cyrillic_to_latin = {
+        'С': 'S',
+        'М': 'M',
+        'Л': 'L',
+        'ХС': 'XS',
+        'ХЛ': 'XL',
+        '2ХЛ': '2XL',
+        '3ХЛ': '3XL',
+        '4ХЛ': '4XL',
+        '5ХЛ': '5XL',
+        '6ХЛ': '6XL',
+        '7ХЛ': '7XL',
+        '8ХЛ': '8XL',
+    }
+    
+    # Обробка малих букв кирилиці: с, м, л -> S, M, L
+    if size_lower in ['м', 'л', 'с']:
+        if size_lower == 'м':
+            return 'M'
+        elif size_lower == 'л':
+            return 'L'
+        elif size_lower == 'с':
+            return 'S'
+    
+    # Обробка "хл", "2хл", "3хл", "4хл" тощо (малі букви)
+    if 'хл' in size_lower:
+        # Замінюємо "хл" на "XL" з урахуванням числа перед ним
+        # Перевіряємо точне співпадіння або початок рядка
+        if size_lower == '4хл' or size_lower.startswith('4хл'):
+            return '4XL'
+        elif size_lower == '3хл' or size_lower.startswith('3хл'):
+            return '3XL'
+        elif size_lower == '2хл' or size_lower.startswith('2хл'):
+            return '2XL'
+        elif size_lower == '5хл' or size_lower.startswith('5хл'):
+            return '5XL'
+        elif size_lower == '6хл' or size_lower.startswith('6хл'):
+            return '6XL'
+        elif size_lower == '7хл' or size_lower.startswith('7хл'):
+            return '7XL'
+        elif size_lower == '8хл' or size_lower.startswith('8хл'):
+            return '8XL'
+        elif size_lower == 'хл' or size_lower.startswith('хл'):
+            return 'XL'
+    
+    # Обробка "хс" (кирилиця) -> XS
+    if size_lower == 'хс':
+        return 'XS'
+    
+    # Перевіряємо, чи це повний розмір у кирилиці (великі букви)
+    if size_upper in cyrillic_to_latin:
+        return cyrillic_to_latin[size_upper]
+    
+    # Виправлення випадків сканера (латиниця замість кирилиці): xc -> XS, c -> S
+    if size_lower == 'xc':
+        return 'XS'
+    if size_lower == 'c' and len(size) == 1:
+        return 'S'
+    
+    # Якщо розмір вже в латиниці (XS, S, M, L, XL, 2XL, 3XL, 4XL, 5XL, 6XL, 7XL, 8XL), повертаємо як є
+    valid_latin_sizes = {'XS', 'S', 'M', 'L', 'XL', '2XL', '3XL', '4XL', '5XL', '6XL', '7XL', '8XL'}
+    if size_upper in valid_latin_sizes:
+        return size_upper
+    
+    # Замінюємо кириличні символи в рядку (великі букви)
+    result = size_upper
+    for cyr, lat in cyrillic_to_latin.items():
+        result = result.replace(cyr, lat)
+    
+    logging.debug(f"[normalize_size] '{original_size}' -> '{result}'")
+    return result
+
+
+def baseline_split_sizes(size_string):
+    sizes = re.split(r'[,\s\-]+', size_string)
+    return [baseline_normalize_size(size) for size in sizes if size.strip()]
+
+
+# Розміри, як вони зустрічаються в таблицях та у сканера
+SIZES = [
+    # Буквені (латиниця, кирилиця, різний регістр, латиниця замість кирилиці)
+    'XS', 'S', 'M', 'L', 'XL', '2XL', '3XL', '4XL', '5XL', '6XL', '7XL', '8XL',
+    'xs', 's', 'm', 'l', 'xl', '2xl', 'Xl', 'xL',
+    'ХС', 'С', 'М', 'Л', 'ХЛ', '2ХЛ', '3ХЛ', '4ХЛ', '5ХЛ', '6ХЛ', '7ХЛ', '8ХЛ',
+    'хс', 'с', 'м', 'л', 'хл', '2хл', '3хл', '4хл', '5хл', '6хл', '7хл', '8хл', 'Хл', '2Хл',
+    'xc', 'XC', 'c', 'C', 'хлл', '2хл.', 'хл2', '3хлxl', 'ХХЛ', 'XXL', 'XXXL', 'XXS', 'хсм', 'СМЛ',
+    '2ХL', '2XЛ', 'ХL', 'XЛ', 'МL', 'Л-XL',
+    # Числові
+    '28', '29', '30', '31', '32', '33', '34', '35', '36', '38', '39', '40', '41', '42', '43', '44', '45',
+    '46', '48', '50', '52', '54', '56', '58', '60', '62', '047', '4 6',
+    # Дробові та з половинками
+    '42.5', '42,5', '42½', '1/2', '36/38', '44-46', '7.5', 'W32/L34', '32/34',
+    # З дужками
+    '5(2ХL)', '5(2хл)', '3(М)', '(С)', '()', '( )', '2(XL', '1)XL(', '(46)', '5(abc)', '(хл)(м)', 'M(L)',
+    # Порожні та дивні
+    '', ' ', '  ', '\t', '\n', ' M ', '\tхл\n', '-', ',', '—', 'ONE SIZE', 'one size', 'б/р', 'N/A',
+    '0', '00', '?', 'ß', 'ǅ', 'ﬀ', 'İ', 'ẞ', '🙂', 'ⅩL', 'Ｍ',
+]
+
+# Символи для перебору всіх коротких рядків: цифри, латиниця та кирилиця розмірів, дужки, пробіл
+ALPHABET = ['2', '4', '6', 'x', 'X', 's', 'S', 'c', 'l', 'L', 'M', 'х', 'Х', 'с', 'С', 'л', 'Л', 'м', 'М', '(', ')', ' ']
+
+SIZE_CELLS = [
+    'S, M, L', 'S M L', 'S-M-L', '46,48, хл', '2ХЛ,-2', 'хс,  с ,м', '5(2ХL), 3(М)', 'L-XL', ' ,, - ',
+    '28 29 30', '42.5, 43', 'ONE SIZE', '',
+]
+
+
+def test_normalize_size_matches_baseline():
+    for size in SIZES:
+        # Двічі - другий виклик бере результат з lru_cache
+        assert normalize_size(size) == baseline_normalize_size(size), repr(size)
+        assert normalize_size(size) == baseline_normalize_size(size), repr(size)
+
+
+def test_normalize_size_matches_baseline_for_short_strings():
+    for length in range(1, 4):
+        for chars in itertools.product(ALPHABET, repeat=length):
+            size = ''.join(chars)
+            assert normalize_size(size) == baseline_normalize_size(size), repr(size)
+
+
+def test_normalize_size_none():
+    assert normalize_size(None) == baseline_normalize_size(None) == ""
+
+
+def test_split_sizes_matches_baseline():
+    for cell in SIZE_CELLS + SIZES:
+        assert split_sizes(cell) == baseline_split_sizes(cell), repr(cell)
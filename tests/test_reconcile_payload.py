@@ -0,0 +1,48 @@
+"""
+Звірка з частиною даних таблиць, яку reconcile_inventory передає в пул процесів
+(select_sheet_data_for_inventory), дає той самий результат, що й з усіма даними
+"""
+import copy
+import random
+import pytest
+from benchmarks.suite import Stocktake, stage_csv_parse, stage_sheets_load
+from utils.sheets_utils import compare_inventory_with_sheets, select_sheet_data_for_inventory
+
+
+@pytest.fixture(scope="module")
+def stocktake():
+    stocktake = Stocktake(3000, 0)
+    stage_csv_parse(stocktake)
+    stage_sheets_load(stocktake)
+    yield stocktake
+    stocktake.close()
+
+
+def without_stock(category_sheet_data, rate, seed=0):
+    """Копія даних таблиць, де частина артикулів без кількості та розмірів (такі не потрапляють в not_scanned)"""
+    rng = random.Random(seed)
+    category_sheet_data = copy.deepcopy(category_sheet_data)
+    for all_sheet_arts in category_sheet_data.values():
+        for sheet_art_data in all_sheet_arts.values():
+            if rng.random() < rate:
+                sheet_art_data['amount'] = 0
+                sheet_art_data['sizes'] = rng.choice([{}, {'': 0}])
+    return category_sheet_data
+
+
+@pytest.mark.parametrize("scanned_rate", [1.0, 0.5, 0.05])
+def test_selected_sheet_data_gives_same_results(stocktake, scanned_rate):
+    rng = random.Random(1)
+    inventory_data = {
+        normalized_art: data_info
+        for normalized_art, data_info in stocktake.inventory_data.items()
+        if rng.random() < scanned_rate
+    }
+    category_sheet_data = without_stock(stocktake.category_sheet_data, 0.3)
+
+    selected = select_sheet_data_for_inventory(inventory_data, category_sheet_data)
+
+    assert compare_inventory_with_sheets(None, inventory_data, selected) == compare_inventory_with_sheets(
+        None, inventory_data, category_sheet_data
+    )
+    assert sum(map(len, selected.values())) < sum(map(len, category_sheet_data.values()))
@@ -0,0 +1,69 @@
+from utils.sheets_cache import get_spreadsheet_id
+from utils.sheets_planner import iter_planned_sheets
+from utils.sheets_utils import ALLSIZE_VALUES, get_category_worksheets, normalize_art, split_sizes
+
+
+def index_sheet_sizes(all_data, columns):
+    """
+    Індекс розмірів артикулів одного листа для перевірки одного артикулу - за тими ж правилами,
+    що й get_art_sizes_from_sheets: ключ - normalize_art повного артикулу рядка (.130 не відкидається),
+    розміри - split_sizes комірки розміру (роздільники кома, пробіл, дефіс), тільки з ALLSIZE_VALUES
+    columns - позиції (з 1) колонок артикулу та розміру в рядках
+    Повертає {ключ: [розміри]} тільки для артикулів, у яких знайдено хоча б один розмір
+    """
+    art_position, size_position = columns[0] - 1, columns[1] - 1
+    sheet_sizes = {}
+    for row in all_data:
+        row_length = len(row)
+        row_size = row[size_position] if row_length > size_position else ""
+        if not row_size.strip():
+            continue
+        valid_sizes = [size for size in split_sizes(row_size) if size in ALLSIZE_VALUES]
+        if not valid_sizes:
+            continue
+        key = normalize_art(row[art_position] if row_length > art_position else "")
+        sheet_sizes.setdefault(key, set()).update(valid_sizes)
+    # Списки, а не set - індекс зберігається в знімках (JSON)
+    return {key: sorted(sizes) for key, sizes in sheet_sizes.items()}
+
+
+def index_planned_sheets(categories, fetched):
+    """
+    index_sheet_sizes для кожного прочитаного листа кожної категорії
+    Повертає {(категорія, spreadsheet_id, індекс_листа): {ключ: [розміри]}}
+    """
+    return {
+        key: index_sheet_sizes(all_data, positions)
+        for key, _, all_data, positions in iter_planned_sheets(categories, fetched)
+    }
+
+
+def merge_art_sizes(categories, sheet_sizes):
+    """
+    Об'єднує індекси листів по категоріях
+    Повертає {категорія: {ключ: set розмірів}} для категорій, індекси всіх листів яких є в sheet_sizes
+    """
+    art_sizes = {}
+    for category in categories:
+        category_sizes = {}
+        for link, sheet_number in get_category_worksheets(category):
+            sizes_by_art = sheet_sizes.get((category, get_spreadsheet_id(link), sheet_number))
+            if sizes_by_art is None:
+                break
+            for key, sizes in sizes_by_art.items():
+                category_sizes.setdefault(key, set()).update(sizes)
+        else:
+            art_sizes[category] = category_sizes
+    return art_sizes
+
+
+def find_art_sizes(art, category_art_sizes):
+    """
+    Розміри артикулу в індексах категорій (результат як у get_art_sizes_from_sheets)
+    category_art_sizes - список індексів категорій {ключ: set розмірів}
+    """
+    key = normalize_art(art)
+    all_sizes = set()
+    for art_sizes in category_art_sizes:
+        all_sizes.update(art_sizes.get(key, ()))
+    return all_sizes
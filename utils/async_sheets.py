@@ -0,0 +1,177 @@
+import asyncio
+import logging
+from urllib.parse import quote
+import aiohttp
+from google.auth.transport.requests import Request
+from utils.metrics import sheets_api_requests
+from utils.rate_limiter import RETRY_STATUSES, backoff_delay
+from utils.sheets_cache import get_spreadsheet_id, sheet_titles_cache
+
+SHEETS_API_BASE_URL = "https://sheets.googleapis.com/v4/spreadsheets"
+DRIVE_FILES_API_URL = "https://www.googleapis.com/drive/v3/files"
+
+
+class SheetsAPIError(Exception):
+    """Помилка відповіді Google Sheets API"""
+
+    def __init__(self, status, message):
+        super().__init__(f"Sheets API {status}: {message}")
+        self.status = status
+
+
+class AsyncSheetsClient:
+    """
+    Асинхронний клієнт Google Sheets API v4 (тільки читання значень) на aiohttp.
+    Використовує ті ж credentials, що й gspread клієнт.
+
+    max_concurrency - скільки запитів до API може виконуватися одночасно
+    max_retries - скільки разів повторюємо запит при 429/5xx (експоненційна затримка)
+    rate_limiter - спільний TokenBucket квоти читань Sheets API (None - без обмеження)
+    """
+
+    def __init__(self, credentials, max_concurrency=8, max_retries=5, base_url=SHEETS_API_BASE_URL,
+                 drive_url=DRIVE_FILES_API_URL, timeout=60, rate_limiter=None):
+        self.credentials = credentials
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.base_url = base_url.rstrip('/')
+        self.drive_url = drive_url.rstrip('/')
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self._session = None
+        self._session_loop = None
+        self._semaphore = None
+        self._token_lock = None
+        # {spreadsheet_id: Task} - запити метаданих, які вже виконуються
+        self._titles_pending = {}
+
+    def _ensure_loop_state(self):
+        """Створює сесію та примітиви синхронізації для поточного event loop"""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
+            self._session_loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._token_lock = asyncio.Lock()
+
+    async def _get_token(self):
+        """Повертає дійсний access token (оновлення credentials виконуємо в окремому потоці)"""
+        async with self._token_lock:
+            if not self.credentials.valid:
+                await asyncio.to_thread(self.credentials.refresh, Request())
+            return self.credentials.token
+
+    async def _get_json(self, url, params=None, limited=True):
+        """
+        GET запит з повторами при перевищенні квоти та тимчасових помилках
+        limited=False - запит не до Sheets API (Drive), квоту читань таблиць не витрачає
+        """
+        self._ensure_loop_state()
+        rate_limiter = self.rate_limiter if limited else None
+
+        attempt = 0
+        while True:
+            if rate_limiter is not None:
+                # Чекаємо квоту до семафора, щоб черга на квоту не займала місця одночасних запитів
+                await rate_limiter.acquire_async()
+            token = await self._get_token()
+            headers = {"Authorization": f"Bearer {token}"}
+            retry_after = None
+            status = None
+
+            async with self._semaphore:
+                try:
+                    async with self._session.get(url, params=params, headers=headers) as response:
+                        sheets_api_requests.inc(client="async", status=response.status)
+                        if response.status == 200:
+                            return await response.json()
+
+                        body = await response.text()
+                        if response.status == 401 and attempt == 0:
+                            # Токен прострочений - примусово оновлюємо та повторюємо
+                            self.credentials.token = None
+                            self.credentials.expiry = None
+                        elif response.status not in RETRY_STATUSES:
+                            raise SheetsAPIError(response.status, body[:200])
+                        status = response.status
+                        retry_after = response.headers.get("Retry-After")
+                        error = SheetsAPIError(response.status, body[:200])
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    sheets_api_requests.inc(client="async", status="error")
+                    error = e
+
+            attempt += 1
+            if attempt > self.max_retries:
+                raise error
+
+            delay = backoff_delay(attempt, retry_after)
+            if status == 429 and rate_limiter is not None:
+                rate_limiter.throttle(delay)
+            logging.warning(f"[async_sheets] {error}; повтор {attempt}/{self.max_retries} через {delay:.1f} с")
+            await asyncio.sleep(delay)
+
+    async def _fetch_sheet_titles(self, spreadsheet_id):
+        metadata = await self._get_json(
+            f"{self.base_url}/{spreadsheet_id}",
+            params={"fields": "sheets.properties(index,title)"}
+        )
+        sheets = sorted(metadata.get("sheets", []), key=lambda s: s["properties"].get("index", 0))
+        titles = [s["properties"]["title"] for s in sheets]
+        sheet_titles_cache.set(spreadsheet_id, titles)
+        return titles
+
+    async def get_sheet_titles(self, spreadsheet_id):
+        """
+        Повертає назви листів таблиці в порядку їх індексів
+        Метадані кешуються (sheet_titles_cache), одночасні запити однієї таблиці об'єднуються в один
+        """
+        titles = sheet_titles_cache.get(spreadsheet_id)
+        if titles is not None:
+            return titles
+
+        task = self._titles_pending.get(spreadsheet_id)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_sheet_titles(spreadsheet_id))
+            self._titles_pending[spreadsheet_id] = task
+            task.add_done_callback(lambda _: self._titles_pending.pop(spreadsheet_id, None))
+        return await asyncio.shield(task)
+
+    async def get_worksheet_values(self, link, sheet_number):
+        """
+        Аналог client.open_by_url(link).get_worksheet(sheet_number).get_all_values()
+        Повертає список рядків (рядки можуть бути коротшими, якщо в кінці порожні комірки)
+        """
+        spreadsheet_id = get_spreadsheet_id(link)
+        titles = await self.get_sheet_titles(spreadsheet_id)
+        if sheet_number >= len(titles):
+            raise SheetsAPIError(404, f"лист {sheet_number} не знайдено в таблиці {spreadsheet_id}")
+
+        sheet_range = "'{}'".format(titles[sheet_number].replace("'", "''"))
+        result = await self._get_json(f"{self.base_url}/{spreadsheet_id}/values/{quote(sheet_range, safe='')}")
+        return result.get("values", [])
+
+    async def batch_get_values(self, spreadsheet_id, ranges, major_dimension="ROWS"):
+        """
+        Читає кілька діапазонів таблиці одним запитом values:batchGet
+        Повертає список значень для кожного діапазону (в тому ж порядку)
+        major_dimension="COLUMNS" - значення повертаються по стовпцях
+        """
+        params = [("ranges", sheet_range) for sheet_range in ranges]
+        params.append(("majorDimension", major_dimension))
+        result = await self._get_json(f"{self.base_url}/{spreadsheet_id}/values:batchGet", params=params)
+        return [value_range.get("values", []) for value_range in result.get("valueRanges", [])]
+
+    async def get_modified_time(self, spreadsheet_id):
+        """Час останньої зміни таблиці з Google Drive (дешевий запит для перевірки версії)"""
+        result = await self._get_json(
+            f"{self.drive_url}/{spreadsheet_id}",
+            params={"fields": "modifiedTime", "supportsAllDrives": "true"},
+            limited=False
+        )
+        return result.get("modifiedTime")
+
+    async def close(self):
+        """Закриває HTTP сесію"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
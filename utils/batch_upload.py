@@ -0,0 +1,123 @@
+import asyncio
+import io
+import logging
+import zipfile
+from utils.metrics import metrics
+from utils.process_engine import create_csv_parser, download_csv
+from utils.sheets_utils import merge_inventory_data, parse_csv_stream
+
+# {user_id: BatchUpload} - пакетний переоблік, який збирає користувач
+_user_batches = {}
+
+
+def _parse_zip(raw):
+    """
+    Відкриває zip архів з CSV (вкладені папки теж)
+    Повертає (назви CSV файлів, функція розбору одного файлу) - файли розбираються окремими потоками
+    """
+    archive = zipfile.ZipFile(io.BytesIO(raw))
+    names = [
+        info.filename for info in archive.infolist()
+        if not info.is_dir() and info.filename.lower().endswith('.csv')
+        and not info.filename.startswith('__MACOSX/')
+    ]
+
+    def parse_member(name):
+        with archive.open(name) as f:
+            return parse_csv_stream(f, create_csv_parser())
+
+    return names, parse_member
+
+
+class BatchUpload:
+    """
+    Файли пакетного переобліку одного користувача (кілька CSV або zip з CSV).
+    Кожен файл завантажується і розбирається одразу після надходження, окремим завданням,
+    тому файли розбираються паралельно, поки користувач надсилає наступні.
+    """
+
+    def __init__(self):
+        # [(назва файлу, asyncio.Task -> список (назва, inventory_data))]
+        self._files = []
+
+    def __len__(self):
+        return len(self._files)
+
+    @property
+    def file_names(self):
+        return [name for name, _ in self._files]
+
+    def add_csv(self, bot, file_path, name):
+        """Завантажує CSV з Telegram, розбираючи його під час завантаження (поза event loop)"""
+        async def load():
+            return [(name, await download_csv(bot, file_path))]
+
+        self._add(name, load())
+
+    def add_zip(self, bot, file_path, name):
+        """Завантажує zip і розбирає CSV з нього одночасно в потоках"""
+        async def load():
+            raw = (await bot.download_file(file_path)).getvalue()
+            names, parse_member = await asyncio.to_thread(_parse_zip, raw)
+            inventories = await asyncio.gather(*(asyncio.to_thread(parse_member, member) for member in names))
+            return [(f"{name}/{member}", inventory_data) for member, inventory_data in zip(names, inventories)]
+
+        self._add(name, load())
+
+    def _add(self, name, coro):
+        self._files.append((name, asyncio.create_task(coro)))
+
+    async def collect(self):
+        """
+        Чекає розбору всіх файлів
+        Повертає (об'єднаний inventory_data, назви розібраних файлів, назви файлів, які не вдалося прочитати)
+        """
+        outcomes = await asyncio.gather(*(task for _, task in self._files), return_exceptions=True)
+        inventories = []
+        parsed_names = []
+        failed_names = []
+        for (name, _), outcome in zip(self._files, outcomes):
+            if isinstance(outcome, BaseException):
+                logging.warning(f"[batch_upload] Не вдалося прочитати {name}: {outcome}")
+                failed_names.append(name)
+                continue
+            if not outcome:
+                # zip без CSV
+                failed_names.append(name)
+            for file_name, inventory_data in outcome:
+                if inventory_data:
+                    inventories.append(inventory_data)
+                    parsed_names.append(file_name)
+                else:
+                    failed_names.append(file_name)
+        return merge_inventory_data(inventories), parsed_names, failed_names
+
+    def cancel(self):
+        for _, task in self._files:
+            task.cancel()
+
+
+def start_batch(user_id):
+    """Починає новий пакет користувача (попередній незавершений скасовується)"""
+    cancel_batch(user_id)
+    batch = BatchUpload()
+    _user_batches[user_id] = batch
+    return batch
+
+
+def get_batch(user_id):
+    return _user_batches.get(user_id)
+
+
+def pop_batch(user_id):
+    return _user_batches.pop(user_id, None)
+
+
+def cancel_batch(user_id):
+    batch = _user_batches.pop(user_id, None)
+    if batch is not None:
+        batch.cancel()
+
+
+# Скільки пакетів зараз збирається (для /metrics та /stats)
+metrics.gauge("batch_uploads_in_flight", "Пакети файлів, які збирають користувачі", lambda: len(_user_batches))
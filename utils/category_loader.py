@@ -0,0 +1,294 @@
+import asyncio
+import logging
+from typing import NamedTuple
+from config import sheets_projected_reads
+from utils.art_index import index_planned_sheets, merge_art_sizes
+from utils.metrics import cache_requests, category_load_errors, rows_parsed, sheets_fetch_seconds
+from utils.sheets_cache import get_sheet_titles, get_spreadsheet_id, invalidate_spreadsheet, open_spreadsheet
+from utils.sheets_planner import (
+    assemble_rows,
+    build_ranges,
+    get_category_columns,
+    get_major_dimension,
+    merge_category_sheets,
+    plan_category_reads
+)
+from utils.process_engine import parse_fetched_sheets
+from utils.sheets_utils import get_category_worksheets
+from utils.single_flight import AsyncSingleFlight, SingleFlight
+from utils.snapshot_store import snapshot_store
+
+# Одночасні завантаження тих самих листів однієї таблиці (кілька адміністраторів звіряють одну категорію)
+# виконуються один раз - перевірка версії, batchGet та розбір спільні
+workbook_flight = AsyncSingleFlight("workbook")
+workbook_sync_flight = SingleFlight("workbook_sync")
+
+
+def _workbook_sheet_keys(categories):
+    """{spreadsheet_id: [(категорія, spreadsheet_id, індекс_листа)]} - які розібрані листи потрібні з кожної таблиці"""
+    keys = {}
+    for category in categories:
+        for link, sheet_number in get_category_worksheets(category):
+            spreadsheet_id = get_spreadsheet_id(link)
+            keys.setdefault(spreadsheet_id, []).append((category, spreadsheet_id, sheet_number))
+    return keys
+
+
+def _workbook_groups(categories):
+    """
+    Плани читання таблиць з ключем об'єднання одночасних завантажень
+    Ключ - таблиця та всі розібрані листи, які з неї потрібні (вони ж визначають колонки batchGet)
+    Повертає [(ключ, категорії з листами в цій таблиці, WorkbookRead)]
+    """
+    sheet_keys = _workbook_sheet_keys(categories)
+    groups = []
+    for workbook_read in plan_category_reads(categories):
+        keys = tuple(sorted(set(sheet_keys[workbook_read.spreadsheet_id])))
+        workbook_categories = sorted({category for category, _, _ in keys})
+        groups.append(((workbook_read.spreadsheet_id, keys), workbook_categories, workbook_read))
+    return groups
+
+
+class LoadedCategories(NamedTuple):
+    """Результат завантаження категорій"""
+    data: dict       # {категорія: результат як у load_all_arts_from_category}
+    art_sizes: dict  # {категорія: {ключ артикулу: set розмірів}} - для перевірки одного артикулу (utils.art_index)
+
+
+class CategoryLoadError(Exception):
+    """
+    Не вдалося прочитати листи категорій (після всіх повторів при 429/5xx)
+    Звіряти такі категорії не можна - всі їх артикули виглядали б як "не знайдені"
+    categories - категорії з помилкою читання, loaded - LoadedCategories категорій, які завантажились повністю
+    """
+
+    def __init__(self, categories, loaded):
+        super().__init__(f"Не вдалося завантажити таблиці категорій: {', '.join(categories)}")
+        self.categories = categories
+        self.loaded = loaded
+
+    def __reduce__(self):
+        return self.__class__, (self.categories, self.loaded)
+
+
+def load_error(categories, loaded=None):
+    """
+    CategoryLoadError для категорій, таблиці яких не вдалося прочитати
+    (кожна категорія рахується в category_load_errors_total - видно в /stats та /metrics)
+    """
+    for category in categories:
+        category_load_errors.inc(category=category)
+    return CategoryLoadError(categories, loaded if loaded is not None else LoadedCategories({}, {}))
+
+
+def _merge_loaded(categories, sheet_data, sheet_sizes):
+    """LoadedCategories; CategoryLoadError, якщо хоча б один лист якоїсь категорії не прочитано"""
+    category_sheet_data, failed_categories = merge_category_sheets(categories, sheet_data)
+    loaded = LoadedCategories(category_sheet_data, merge_art_sizes(category_sheet_data, sheet_sizes))
+    if failed_categories:
+        raise load_error(failed_categories, loaded)
+    return loaded
+
+
+def _columns_key(category):
+    """Колонки категорії як частина ключа знімка (зміна config.data робить старі знімки непридатними)"""
+    return ",".join(str(column) for column in get_category_columns(category))
+
+
+def _sizes_columns_key(category):
+    """Ключ знімка індексу розмірів листа (utils.art_index) - поруч з розібраним листом"""
+    return _columns_key(category) + ":sizes"
+
+
+def _split_by_snapshots(categories, plan, versions):
+    """
+    Бере з локального сховища листи таблиць, які не змінювались
+    Повертає (розібрані листи з диску, їх індекси розмірів, таблиці, які потрібно завантажити)
+    """
+    if snapshot_store is None:
+        return {}, {}, plan
+
+    sheet_keys = _workbook_sheet_keys(categories)
+    sheet_data = {}
+    sheet_sizes = {}
+    to_fetch = []
+    for workbook_read in plan:
+        version = versions.get(workbook_read.spreadsheet_id)
+        cached = {}
+        cached_sizes = {}
+        if version:
+            for key in sheet_keys[workbook_read.spreadsheet_id]:
+                category, spreadsheet_id, sheet_number = key
+                sheet_arts_data = snapshot_store.get(category, spreadsheet_id, sheet_number, _columns_key(category), version)
+                sizes_by_art = snapshot_store.get(
+                    category, spreadsheet_id, sheet_number, _sizes_columns_key(category), version
+                )
+                if sheet_arts_data is None or sizes_by_art is None:
+                    break
+                cached[key] = sheet_arts_data
+                cached_sizes[key] = sizes_by_art
+            else:
+                cache_requests.inc(cache="snapshots", result="hit")
+                sheet_data.update(cached)
+                sheet_sizes.update(cached_sizes)
+                continue
+        cache_requests.inc(cache="snapshots", result="miss")
+        to_fetch.append(workbook_read)
+    return sheet_data, sheet_sizes, to_fetch
+
+
+def _save_snapshots(sheet_data, sheet_sizes, versions):
+    """Зберігає щойно розібрані листи та їх індекси розмірів разом з версією їх таблиці"""
+    if snapshot_store is None:
+        return
+    for (category, spreadsheet_id, sheet_number), sheet_arts_data in sheet_data.items():
+        version = versions.get(spreadsheet_id)
+        if version:
+            snapshot_store.put(category, spreadsheet_id, sheet_number, _columns_key(category), version, sheet_arts_data)
+            snapshot_store.put(
+                category, spreadsheet_id, sheet_number, _sizes_columns_key(category), version,
+                sheet_sizes[(category, spreadsheet_id, sheet_number)]
+            )
+
+
+def _parse_and_save(categories, fetched, versions):
+    """Розбирає прочитані листи та будує їх індекси розмірів; повертає (розібрані листи, індекси)"""
+    rows_parsed.inc(sum(len(rows) for _, rows in fetched.values()), source="sheet")
+    sheet_data = parse_fetched_sheets(categories, fetched)
+    sheet_sizes = index_planned_sheets(categories, fetched)
+    _save_snapshots(sheet_data, sheet_sizes, versions)
+    return sheet_data, sheet_sizes
+
+
+async def _get_modified_time(sheets_client, workbook_read):
+    """Версія таблиці; None, якщо перевірити не вдалося (тоді знімки не використовуються)"""
+    try:
+        return await sheets_client.get_modified_time(workbook_read.spreadsheet_id)
+    except Exception as e:
+        logging.warning(f"Не вдалося перевірити версію таблиці {workbook_read.link}: {e}")
+        return None
+
+
+async def _fetch_workbook(sheets_client, workbook_read):
+    """
+    Читає всі потрібні листи однієї таблиці одним batchGet запитом
+    Повертає результат assemble_rows; при помилці - порожній dict
+    (листи таблиці залишаються непрочитаними, і завантаження завершується CategoryLoadError)
+    """
+    try:
+        titles = await sheets_client.get_sheet_titles(workbook_read.spreadsheet_id)
+        ranges = build_ranges(workbook_read, titles, sheets_projected_reads)
+        if not ranges:
+            return {}
+        with sheets_fetch_seconds.time():
+            values = await sheets_client.batch_get_values(
+                workbook_read.spreadsheet_id,
+                [range_read.a1 for range_read in ranges],
+                get_major_dimension(sheets_projected_reads)
+            )
+        return assemble_rows(workbook_read.spreadsheet_id, ranges, values, sheets_projected_reads)
+    except Exception as e:
+        logging.error(f"Помилка при читанні таблиці {workbook_read.link}: {e}")
+        invalidate_spreadsheet(workbook_read.link)
+        return {}
+
+
+async def _load_workbook(sheets_client, categories, workbook_read):
+    """
+    Розібрані листи однієї таблиці: з локального знімка, якщо таблиця не змінювалась, інакше batchGet і розбір
+    Повертає ({(категорія, spreadsheet_id, індекс_листа): дані}, {той самий ключ: індекс розмірів})
+    """
+    versions = {}
+    if snapshot_store is not None:
+        versions[workbook_read.spreadsheet_id] = await _get_modified_time(sheets_client, workbook_read)
+    sheet_data, sheet_sizes, to_fetch = await asyncio.to_thread(
+        _split_by_snapshots, categories, [workbook_read], versions
+    )
+
+    if to_fetch:
+        fetched = await _fetch_workbook(sheets_client, workbook_read)
+        # Розбір рядків та запис знімків - CPU/диск, виконуємо поза event loop
+        if fetched:
+            fetched_data, fetched_sizes = await asyncio.to_thread(_parse_and_save, categories, fetched, versions)
+            sheet_data.update(fetched_data)
+            sheet_sizes.update(fetched_sizes)
+    return sheet_data, sheet_sizes
+
+
+async def load_categories(sheets_client, categories):
+    """
+    Асинхронно завантажує листи всіх потрібних категорій:
+    незмінені таблиці беруться з локальних знімків, решта - один batchGet на таблицю,
+    всі таблиці одночасно (кількість одночасних запитів обмежує sheets_client)
+    Таблицю, яку вже завантажує інша звірка, не запитуємо вдруге - чекаємо той самий результат
+    Повертає LoadedCategories;
+    якщо лист якоїсь категорії не вдалося прочитати - CategoryLoadError (частковий результат не повертається)
+    """
+    categories = list(categories)
+
+    # Запускаємо всі таблиці разом, щоб час дорівнював найповільнішій таблиці, а не сумі
+    sheet_data = {}
+    sheet_sizes = {}
+    for workbook_sheet_data, workbook_sheet_sizes in await asyncio.gather(*(
+        workbook_flight.do(key, _load_workbook, sheets_client, workbook_categories, workbook_read)
+        for key, workbook_categories, workbook_read in _workbook_groups(categories)
+    )):
+        sheet_data.update(workbook_sheet_data)
+        sheet_sizes.update(workbook_sheet_sizes)
+
+    return await asyncio.to_thread(_merge_loaded, categories, sheet_data, sheet_sizes)
+
+
+def _load_workbook_sync(client, categories, workbook_read):
+    """_load_workbook через gspread (блокуючі виклики)"""
+    versions = {}
+    if snapshot_store is not None:
+        try:
+            versions[workbook_read.spreadsheet_id] = open_spreadsheet(client, workbook_read.link).get_lastUpdateTime()
+        except Exception as e:
+            logging.warning(f"Не вдалося перевірити версію таблиці {workbook_read.link}: {e}")
+    sheet_data, sheet_sizes, to_fetch = _split_by_snapshots(categories, [workbook_read], versions)
+    if not to_fetch:
+        return sheet_data, sheet_sizes
+
+    try:
+        titles = get_sheet_titles(client, workbook_read.link)
+        ranges = build_ranges(workbook_read, titles, sheets_projected_reads)
+        if not ranges:
+            return sheet_data, sheet_sizes
+        with sheets_fetch_seconds.time():
+            response = open_spreadsheet(client, workbook_read.link).values_batch_get(
+                [range_read.a1 for range_read in ranges],
+                params={"majorDimension": get_major_dimension(sheets_projected_reads)}
+            )
+        values = [value_range.get("values", []) for value_range in response.get("valueRanges", [])]
+        fetched = assemble_rows(workbook_read.spreadsheet_id, ranges, values, sheets_projected_reads)
+    except Exception as e:
+        logging.error(f"Помилка при читанні таблиці {workbook_read.link}: {e}")
+        invalidate_spreadsheet(workbook_read.link)
+        return sheet_data, sheet_sizes
+
+    if fetched:
+        fetched_data, fetched_sizes = _parse_and_save(categories, fetched, versions)
+        sheet_data.update(fetched_data)
+        sheet_sizes.update(fetched_sizes)
+    return sheet_data, sheet_sizes
+
+
+def load_categories_sync(client, categories):
+    """
+    Те саме через gspread (блокуючі виклики, для пулу потоків):
+    один values_batch_get на таблицю замість get_all_values на кожен лист
+    """
+    categories = list(categories)
+
+    sheet_data = {}
+    sheet_sizes = {}
+    for key, workbook_categories, workbook_read in _workbook_groups(categories):
+        workbook_sheet_data, workbook_sheet_sizes = workbook_sync_flight.do(
+            key, _load_workbook_sync, client, workbook_categories, workbook_read
+        )
+        sheet_data.update(workbook_sheet_data)
+        sheet_sizes.update(workbook_sheet_sizes)
+
+    return _merge_loaded(categories, sheet_data, sheet_sizes)
@@ -0,0 +1,102 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.fsm.storage.memory import MemoryStorage
+from config import fsm_storage_backend, result_ttl, state_db_path
+
+
+class SqliteStorage(BaseStorage):
+    """
+    FSM сховище aiogram в SQLite на диску: стан і дані користувачів переживають перезапуски бота.
+    Дані стану мають бути JSON (великі результати звірок лежать в result_store, тут лише їх id).
+    Записи, які не змінювались довше за ttl, видаляються.
+    """
+
+    def __init__(self, path, ttl):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30)
+        if not self._initialized:
+            with self._lock:
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS fsm ("
+                    " storage_key TEXT PRIMARY KEY,"
+                    " state TEXT,"
+                    " data TEXT NOT NULL,"
+                    " updated_at REAL NOT NULL)"
+                )
+                connection.commit()
+                self._initialized = True
+        return connection
+
+    @staticmethod
+    def _key(key):
+        return ":".join(str(part) for part in (
+            key.bot_id, key.chat_id, key.user_id, key.thread_id, key.business_connection_id, key.destiny
+        ))
+
+    def _read(self, key):
+        connection = self._connect()
+        try:
+            row = connection.execute(
+                "SELECT state, data FROM fsm WHERE storage_key = ? AND updated_at >= ?",
+                (self._key(key), time.time() - self.ttl)
+            ).fetchone()
+        finally:
+            connection.close()
+        return row
+
+    def _write(self, key, column, value):
+        now = time.time()
+        connection = self._connect()
+        try:
+            with self._lock:
+                connection.execute("DELETE FROM fsm WHERE updated_at < ?", (now - self.ttl,))
+                connection.execute(
+                    "INSERT OR IGNORE INTO fsm (storage_key, state, data, updated_at) VALUES (?, NULL, '{}', ?)",
+                    (self._key(key), now)
+                )
+                connection.execute(
+                    f"UPDATE fsm SET {column} = ?, updated_at = ? WHERE storage_key = ?",
+                    (value, now, self._key(key))
+                )
+                connection.commit()
+        finally:
+            connection.close()
+
+    async def set_state(self, key, state=None):
+        state = state.state if isinstance(state, State) else state
+        await asyncio.to_thread(self._write, key, "state", state)
+
+    async def get_state(self, key):
+        row = await asyncio.to_thread(self._read, key)
+        return row[0] if row else None
+
+    async def set_data(self, key, data):
+        await asyncio.to_thread(self._write, key, "data", json.dumps(dict(data), ensure_ascii=False))
+
+    async def get_data(self, key):
+        row = await asyncio.to_thread(self._read, key)
+        return json.loads(row[1]) if row else {}
+
+    async def close(self):
+        pass
+
+
+def create_fsm_storage():
+    """FSM сховище за налаштуванням FSM_STORAGE: sqlite (на диску) або memory"""
+    if fsm_storage_backend != 'sqlite':
+        return MemoryStorage()
+    directory = os.path.dirname(state_db_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    return SqliteStorage(state_db_path, result_ttl)
@@ -0,0 +1,259 @@
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from aiohttp import web
+from config import metrics_host, metrics_port
+
+# Межі кошиків гістограм часу (секунди)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(label_key, extra=()):
+    pairs = list(label_key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    """Лічильник, який тільки зростає (окреме значення для кожного набору міток)"""
+
+    kind = "counter"
+
+    def __init__(self, name, description):
+        self.name = name
+        self.description = description
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def values(self):
+        with self._lock:
+            return dict(self._values)
+
+    def render(self):
+        return [f"{self.name}{_format_labels(key)} {value}" for key, value in self.values().items()]
+
+
+class Gauge:
+    """
+    Поточне значення: встановлюється set/inc/dec або читається функцією при кожному зборі
+    (наприклад, кількість завдань в роботі)
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name, description, function=None):
+        self.name = name
+        self.description = description
+        self.function = function
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def values(self):
+        if self.function is not None:
+            try:
+                return {(): self.function()}
+            except Exception as e:
+                logging.warning(f"[metrics] Не вдалося прочитати {self.name}: {e}")
+                return {}
+        with self._lock:
+            return dict(self._values)
+
+    def render(self):
+        return [f"{self.name}{_format_labels(key)} {value}" for key, value in self.values().items()]
+
+
+class Histogram:
+    """Розподіл значень (час етапів) по кошиках, сума та кількість спостережень"""
+
+    kind = "histogram"
+
+    def __init__(self, name, description, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # {мітки: [кількість в кожному кошику + понад останню межу, сума, кількість]}
+        self._values = {}
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            item = self._values.get(key)
+            if item is None:
+                item = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            item[0][index] += 1
+            item[1] += value
+            item[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Вимірює час блоку with (спостереження записується і при винятку)"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def values(self):
+        """{мітки: (кількість по кошиках, сума, кількість)}"""
+        with self._lock:
+            return {key: (list(counts), total, count) for key, (counts, total, count) in self._values.items()}
+
+    def quantile(self, counts, q):
+        """Оцінка квантиля за кошиками (верхня межа кошика, в який він потрапляє)"""
+        target = q * sum(counts)
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket_count
+            if cumulative >= target:
+                return bound
+        return float("inf")
+
+    def render(self):
+        lines = []
+        for key, (counts, total, count) in self.values().items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Всі метрики бота; render() - текстовий формат Prometheus для /metrics"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, description, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, description, **kwargs)
+            return metric
+
+    def counter(self, name, description):
+        return self._get_or_create(Counter, name, description)
+
+    def gauge(self, name, description, function=None):
+        return self._get_or_create(Gauge, name, description, function=function)
+
+    def histogram(self, name, description, buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, description, buckets=buckets)
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._metrics.values()))
+
+    def render(self):
+        lines = []
+        for metric in self:
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+# Метрики звірки (спільні для модулів, які їх оновлюють)
+stage_seconds = metrics.histogram(
+    "stocktake_stage_seconds",
+    "Тривалість етапів переобліку (download, sheets_load, diff, message, excel, single_art)"
+)
+sheets_fetch_seconds = metrics.histogram(
+    "sheets_fetch_seconds", "Тривалість читання однієї таблиці (batchGet всіх потрібних листів)"
+)
+sheets_api_requests = metrics.counter(
+    "sheets_api_requests_total", "Запити до Sheets / Drive API за клієнтом та HTTP статусом"
+)
+cache_requests = metrics.counter(
+    "cache_requests_total", "Звернення до кешів (метадані таблиць, знімки, теплий кеш) - hit / miss"
+)
+rows_parsed = metrics.counter("rows_parsed_total", "Розібрані рядки: csv - записи файлу сканера, sheet - рядки листів")
+category_load_errors = metrics.counter(
+    "category_load_errors_total", "Категорії, таблиці яких не вдалося прочитати (після повторів) - CategoryLoadError"
+)
+
+
+def summarize(registry=None):
+    """Короткий текстовий підсумок метрик для адміністратора (/stats)"""
+    registry = registry or metrics
+    lines = []
+    for metric in registry:
+        values = metric.values()
+        if not values:
+            continue
+        lines.append(f"{metric.name}:")
+        for key, value in sorted(values.items()):
+            label = ", ".join(f"{name}={label_value}" for name, label_value in key) or "всього"
+            if metric.kind == "histogram":
+                counts, total, count = value
+                p50 = metric.quantile(counts, 0.5)
+                p95 = metric.quantile(counts, 0.95)
+                lines.append(
+                    f"  {label}: {count} шт, сер. {total / count:.2f} с, p50 ≤ {p50:g} с, p95 ≤ {p95:g} с"
+                )
+            else:
+                lines.append(f"  {label}: {value:g}")
+    return "\n".join(lines) if lines else "Метрик ще немає."
+
+
+class MetricsServer:
+    """Локальний HTTP сервер з GET /metrics (текстовий формат Prometheus), запускається разом з polling"""
+
+    def __init__(self, host, port, registry=None):
+        self.host = host
+        self.port = port
+        self.registry = registry or metrics
+        self._runner = None
+
+    async def _handle_metrics(self, request):
+        return web.Response(text=self.registry.render(), content_type="text/plain", charset="utf-8")
+
+    async def start(self):
+        if not self.port or self._runner is not None:
+            return
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle_metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logging.info(f"[metrics] /metrics на http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+metrics_server = MetricsServer(metrics_host, metrics_port)
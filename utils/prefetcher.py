@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import time
+from config import data, prefetch_categories, prefetch_interval, warm_cache_max_age
+from utils.art_index import find_art_sizes
+from utils.category_loader import CategoryLoadError
+from utils.metrics import cache_requests
+from utils.sheets_cache import get_spreadsheet_id
+from utils.sheets_utils import get_category_worksheets
+
+
+def group_categories_by_workbook(categories):
+    """
+    Групує категорії, які читаються з однієї таблиці (shoes/wintershoes/tapki тощо),
+    щоб оновлювати їх разом одним batchGet
+    """
+    groups = []
+    for category in categories:
+        spreadsheet_ids = {get_spreadsheet_id(link) for link, _ in get_category_worksheets(category)}
+        merged = {'categories': [category], 'spreadsheet_ids': spreadsheet_ids}
+        for group in [group for group in groups if group['spreadsheet_ids'] & spreadsheet_ids]:
+            merged['categories'] = group['categories'] + merged['categories']
+            merged['spreadsheet_ids'] |= group['spreadsheet_ids']
+            groups.remove(group)
+        groups.append(merged)
+    return [group['categories'] for group in groups]
+
+
+class CategoryPrefetcher:
+    """
+    Фонове завдання, яке періодично оновлює розібрані дані категорій (теплий кеш в пам'яті).
+    Звірка бере з нього категорії, дані яких не старші за max_age секунд.
+
+    loader - async функція (categories) -> LoadedCategories, встановлюється обробниками
+    Групи категорій оновлюються по черзі з паузою interval / кількість_груп,
+    щоб запити рівномірно розподілялися в межах квоти Sheets API.
+    """
+
+    def __init__(self, categories, interval, max_age):
+        self.categories = categories
+        self.interval = interval
+        self.max_age = max_age
+        self.loader = None
+        self._task = None
+        # {категорія: (час_завантаження, дані, індекс розмірів)} - дані та індекс з одного завантаження
+        self._warm = {}
+
+    def update(self, loaded, categories=None):
+        """
+        Кладе свіжо завантажені категорії (LoadedCategories) в теплий кеш
+        categories - які категорії запитувались: категорія, якої немає в loaded
+        (помилка читання хоча б одного листа), не замінює попередні дані і не кешується порожньою
+        """
+        loaded_at = time.monotonic()
+        for category in (loaded.data if categories is None else categories):
+            all_arts_data = loaded.data.get(category)
+            if all_arts_data is None:
+                logging.warning(f"[prefetcher] {category}: дані не завантажено, залишаю попередні")
+                continue
+            self._warm[category] = (loaded_at, all_arts_data, loaded.art_sizes[category])
+
+    def _get_fresh_items(self, categories, cache):
+        now = time.monotonic()
+        fresh = {}
+        for category in categories:
+            item = self._warm.get(category)
+            if item is not None and now - item[0] <= self.max_age:
+                fresh[category] = item
+                cache_requests.inc(cache=cache, result="hit")
+            else:
+                cache_requests.inc(cache=cache, result="miss")
+        return fresh
+
+    def get_fresh(self, categories):
+        """Повертає {категорія: дані} для категорій, дані яких достатньо свіжі"""
+        return {category: item[1] for category, item in self._get_fresh_items(categories, "warm").items()}
+
+    def get_art_sizes(self, art, categories):
+        """
+        Розміри артикулу з індексу теплого кешу (результат як у get_art_sizes_from_sheets)
+        None - якщо хоча б одна категорія відсутня або застаріла
+        """
+        fresh = self._get_fresh_items(categories, "art_index")
+        if len(fresh) < len(categories):
+            return None
+        return find_art_sizes(art, [item[2] for item in fresh.values()])
+
+    def invalidate(self, categories=None):
+        """Скидає теплий кеш (всіх або вказаних категорій)"""
+        if categories is None:
+            self._warm.clear()
+            return
+        for category in categories:
+            self._warm.pop(category, None)
+
+    async def _run(self):
+        groups = group_categories_by_workbook(self.categories)
+        delay = self.interval / max(1, len(groups))
+        logging.info(f"[prefetcher] Оновлюю {len(self.categories)} категорій кожні {self.interval} с")
+        while True:
+            for group in groups:
+                try:
+                    started = time.monotonic()
+                    self.update(await self.loader(group), group)
+                    logging.debug(f"[prefetcher] {', '.join(group)}: {time.monotonic() - started:.2f} с")
+                except asyncio.CancelledError:
+                    raise
+                except CategoryLoadError as e:
+                    # Повністю завантажені категорії групи оновлюємо, решта залишається з попередніми даними
+                    self.update(e.loaded, group)
+                    logging.error(f"[prefetcher] {e}")
+                except Exception as e:
+                    logging.error(f"[prefetcher] Помилка оновлення {', '.join(group)}: {e}")
+                await asyncio.sleep(delay)
+
+    def start(self):
+        """Запускає фонове оновлення (повторний виклик нічого не робить)"""
+        if self.loader is None or not self.categories or self.interval <= 0:
+            return
+        if self._task is not None and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Зупиняє фонове оновлення"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+category_prefetcher = CategoryPrefetcher(
+    [category for category in (prefetch_categories or data) if category in data],
+    prefetch_interval,
+    warm_cache_max_age
+)
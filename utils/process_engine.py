@@ -0,0 +1,156 @@
+import asyncio
+import queue
+from config import process_chunk_rows
+from utils.reconciliation_service import reconciliation_service
+from utils.sheets_planner import iter_planned_sheets, merge_arts_data, parse_planned_sheets
+from utils.sheets_utils import CsvInventoryParser, merge_inventory_data, parse_category_rows, parse_csv_records
+
+
+class ProcessCsvInventoryParser(CsvInventoryParser):
+    """
+    CsvInventoryParser, який розбирає файл в пулі процесів: завершені записи збираються
+    в частини по chunk_rows і відправляються процесам одразу, поки файл ще завантажується.
+    Процесу передаються лише рядки частини та роздільник, назад - inventory_data частини;
+    частини об'єднуються в порядку файлу (результат як у CsvInventoryParser)
+    """
+
+    def __init__(self, chunk_rows=None, service=None):
+        super().__init__()
+        self.chunk_rows = max(1, chunk_rows or process_chunk_rows)
+        self._service = service or reconciliation_service
+        self._pending = []  # записи, ще не відправлені процесу
+        self._futures = []  # concurrent.futures.Future частин в порядку файлу
+
+    def _parse_records(self, records):
+        if not records:
+            return
+        if not self._header_skipped:
+            records = records[1:]  # Пропускаємо заголовок
+            self._header_skipped = True
+        self._pending.extend(records)
+        if len(self._pending) >= self.chunk_rows:
+            self._submit_pending()
+
+    def _submit_pending(self):
+        if self._pending:
+            self._futures.append(self._service.submit_cpu(parse_csv_records, self._pending, self._delimiter))
+            self._pending = []
+
+    def _finish(self):
+        super()._finish()
+        if self.error is None:
+            try:
+                self._submit_pending()
+            except Exception as e:
+                self.error = e
+        if self.error is not None:
+            for future in self._futures:
+                future.cancel()
+
+    def close(self):
+        self._finish()
+        if self.error is None:
+            try:
+                self.inventory_data = merge_inventory_data(future.result() for future in self._futures)
+            except Exception as e:
+                self.error = e
+        return self._result()
+
+    async def aclose(self):
+        self._finish()
+        if self.error is None:
+            try:
+                parts = await asyncio.gather(*(asyncio.wrap_future(future) for future in self._futures))
+                self.inventory_data = merge_inventory_data(parts)
+            except Exception as e:
+                self.error = e
+        return self._result()
+
+
+def create_csv_parser():
+    """Парсер CSV переобліку для налаштованого рушія (RECONCILIATION_ENGINE)"""
+    if reconciliation_service.uses_processes:
+        return ProcessCsvInventoryParser()
+    return CsvInventoryParser()
+
+
+class BackgroundCsvWriter:
+    """
+    destination для bot.download_file: write() лише ставить частину файлу в чергу,
+    парсер (CsvInventoryParser або ProcessCsvInventoryParser) читає чергу в окремому потоці -
+    файл розбирається під час завантаження, але не в event loop бота
+    """
+
+    def __init__(self, parser):
+        self.parser = parser
+        self._chunks = queue.SimpleQueue()
+        self._task = None
+
+    def _start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(asyncio.to_thread(self._consume))
+
+    def _consume(self):
+        for chunk in iter(self._chunks.get, None):
+            self.parser.write(chunk)
+        return self.parser.close()
+
+    def write(self, chunk):
+        self._start()
+        self._chunks.put(bytes(chunk))
+        return len(chunk)
+
+    def flush(self):
+        pass
+
+    def abort(self):
+        """Завантаження перервалось: потік розбору завершується, результат не чекаємо"""
+        self._chunks.put(None)
+
+    async def aclose(self):
+        """Чекає розбору всіх частин; результат як у CsvInventoryParser.close"""
+        self._start()
+        self._chunks.put(None)
+        return await self._task
+
+
+async def download_csv(bot, file_path):
+    """
+    Завантажує CSV переобліку з Telegram і розбирає його під час завантаження (parse_csv_file без
+    тимчасового файлу). Розбір - в потоці (та пулі процесів, якщо RECONCILIATION_ENGINE=process)
+    """
+    writer = BackgroundCsvWriter(create_csv_parser())
+    try:
+        await bot.download_file(file_path, destination=writer, seek=False)
+    except BaseException:
+        writer.abort()
+        raise
+    return await writer.aclose()
+
+
+def parse_fetched_sheets(categories, fetched, chunk_rows=None, service=None):
+    """
+    parse_planned_sheets для налаштованого рушія: з пулом процесів кожен лист ділиться
+    на частини по chunk_rows рядків, всі частини всіх листів розбираються паралельно
+    і об'єднуються в порядку рядків (результат як у parse_planned_sheets)
+    """
+    service = service or reconciliation_service
+    if not service.uses_processes:
+        return parse_planned_sheets(categories, fetched)
+
+    chunk_rows = max(1, chunk_rows or process_chunk_rows)
+    sheet_futures = []
+    for key, category, all_data, positions in iter_planned_sheets(categories, fetched):
+        futures = [
+            service.submit_cpu(parse_category_rows, category, all_data[start:start + chunk_rows], None, positions)
+            for start in range(0, len(all_data), chunk_rows)
+        ]
+        sheet_futures.append((key, futures))
+
+    sheet_data = {}
+    for key, futures in sheet_futures:
+        sheet_arts_data = {}
+        for future in futures:
+            merge_arts_data(sheet_arts_data, future.result())
+        sheet_data[key] = sheet_arts_data
+    return sheet_data
@@ -0,0 +1,80 @@
+import asyncio
+import random
+import threading
+import time
+from config import sheets_read_burst, sheets_reads_per_minute
+from utils.metrics import metrics
+
+# Статуси, при яких запит повторюємо з затримкою (квота та тимчасові помилки Google)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+rate_limit_wait_seconds = metrics.histogram(
+    "sheets_rate_limit_wait_seconds", "Скільки запит до Sheets API чекав на квоту в обмежувачі"
+)
+
+
+def backoff_delay(attempt, retry_after=None):
+    """
+    Затримка перед повтором attempt (з 1): експоненційна (1, 2, 4 ... 64 с) з випадковою добавкою,
+    щоб запити, які отримали 429 одночасно, не повторювалися теж одночасно; не менше Retry-After
+    """
+    delay = min(2 ** (attempt - 1), 64) + random.uniform(0, 1)
+    if retry_after and str(retry_after).isdigit():
+        delay = max(delay, int(retry_after))
+    return delay
+
+
+class TokenBucket:
+    """
+    Спільний обмежувач запитів (token bucket): rate запитів за секунду, до burst підряд.
+    Кожен виклик отримує свій час в черзі при зверненні (хто раніше прийшов - раніше виконується),
+    тому запити потоків gspread та event loop чекають по черзі, а не падають з 429.
+    Працює з потоків (acquire) і з event loop (acquire_async); стан під threading.Lock.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.interval = 1 / rate if rate > 0 else 0
+        self.burst = max(1, burst)
+        self._lock = threading.Lock()
+        # Теоретичний час наступного запиту (GCRA): запит дозволено, якщо зараз >= _tat - допуск burst
+        self._tat = 0.0
+
+    def _reserve(self):
+        """Резервує місце в черзі; повертає скільки секунд чекати"""
+        if not self.interval:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            tolerance = (self.burst - 1) * self.interval
+            granted_at = max(now, self._tat - tolerance)
+            self._tat = max(self._tat, granted_at) + self.interval
+        return granted_at - now
+
+    def acquire(self):
+        """Чекає своєї черги (блокуючий виклик для пулу потоків)"""
+        wait = self._reserve()
+        rate_limit_wait_seconds.observe(wait)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """Те саме для event loop"""
+        wait = self._reserve()
+        rate_limit_wait_seconds.observe(wait)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def throttle(self, seconds):
+        """
+        Google відповів 429 - зупиняє видачу для всіх на seconds,
+        щоб інші запити не вичерпували квоту, поки повторюється цей
+        """
+        if not self.interval:
+            return
+        with self._lock:
+            tolerance = (self.burst - 1) * self.interval
+            self._tat = max(self._tat, time.monotonic() + seconds + tolerance)
+
+
+# Один обмежувач читань Sheets API на процес бота (квота Google - на проєкт / сервісний акаунт)
+sheets_read_limiter = TokenBucket(sheets_reads_per_minute / 60, sheets_read_burst)
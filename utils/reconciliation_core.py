@@ -0,0 +1,82 @@
+from utils.reconciliation_results import SizeDiff
+from utils.sheets_utils import normalize_size
+
+def normalize_size_quantities(sizes):
+    """{сирий_розмір: кількість} -> {нормалізований_розмір: кількість} (для діагностики)"""
+    normalized_sizes = {}
+    for size_key, quantity in sizes.items():
+        if size_key == '':
+            continue
+        normalized_key = normalize_size(str(size_key).strip())
+        if normalized_key:
+            normalized_sizes[normalized_key] = normalized_sizes.get(normalized_key, 0) + quantity
+    return normalized_sizes
+
+
+class SizeComparator:
+    """
+    Порівняння розмірів файлу з таблицями, один екземпляр на звірку.
+
+    Кожне сире написання розміру нормалізується один раз на звірку (різні написання одного
+    розміру, наприклад "46" та "S", зливаються). Словники, всі ключі яких вже нормалізовані
+    (звичайний випадок - parse_csv_file та розбір таблиць нормалізують розміри), не копіюються.
+    Артикули з однаковими розмірами у файлі та таблиці відкидаються одним порівнянням словників,
+    для решти недостача та надлишок обчислюються одним проходом по розмірах таблиці
+    та одним по розмірах файлу замість трьох циклів на кожен артикул.
+    Порядок розмірів - порядок першої появи (як у словниках розмірів).
+    """
+
+    def __init__(self):
+        # {сирий_розмір: нормалізований розмір або '' для порожнього}
+        self._normalized = {}
+        # Сирі розміри, які вже нормалізовані (збігаються з результатом normalize_size)
+        self._canonical = set()
+
+    def _normalize_sizes(self, sizes):
+        """{сирий_розмір: кількість} -> {нормалізований_розмір: кількість} (порожні розміри відкидаються)"""
+        if self._canonical.issuperset(sizes):
+            return sizes
+
+        normalized_sizes = {}
+        for size_key, quantity in sizes.items():
+            normalized = self._normalized.get(size_key)
+            if normalized is None:
+                normalized = normalize_size(str(size_key).strip()) if size_key != '' else ''
+                self._normalized[size_key] = normalized
+                if normalized and normalized == size_key:
+                    self._canonical.add(size_key)
+            if normalized:
+                normalized_sizes[normalized] = normalized_sizes.get(normalized, 0) + quantity
+        return normalized_sizes
+
+    def compare(self, art, file_sizes, sheet_sizes):
+        """
+        Порівнює розміри одного артикулу: file_sizes та sheet_sizes - {сирий_розмір: кількість}
+        Повертає (недостача, надлишок) - списки SizeDiff:
+        недостача - в порядку розмірів таблиці, надлишок - в порядку розмірів файлу
+        """
+        # Однакові словники розмірів - артикул співпадає без нормалізації
+        # (нульова кількість у файлі завжди надлишок, тому такі артикули порівнюються повністю)
+        if file_sizes == sheet_sizes and 0 not in file_sizes.values():
+            return (), ()
+
+        file_sizes = self._normalize_sizes(file_sizes)
+        sheet_sizes = self._normalize_sizes(sheet_sizes)
+        if file_sizes == sheet_sizes and 0 not in file_sizes.values():
+            return (), ()
+
+        file_get = file_sizes.get
+        sheet_get = sheet_sizes.get
+        # Недостача: в таблиці більше, ніж в файлі
+        missing_sizes = [
+            SizeDiff(art, size, sheet_quantity, file_quantity)
+            for size, sheet_quantity in sheet_sizes.items()
+            if (file_quantity := file_get(size, 0)) < sheet_quantity
+        ]
+        # Надлишок: розмір відсутній в таблиці (або з нульовою кількістю) чи в файлі більше, ніж в таблиці
+        extra_sizes = [
+            SizeDiff(art, size, sheet_quantity, file_quantity)
+            for size, file_quantity in file_sizes.items()
+            if (sheet_quantity := sheet_get(size, 0)) == 0 or file_quantity > sheet_quantity
+        ]
+        return missing_sizes, extra_sizes
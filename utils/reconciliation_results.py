@@ -0,0 +1,51 @@
+from typing import NamedTuple
+
+
+class SizeDiff(NamedTuple):
+    """
+    Розбіжність одного розміру артикулу (елемент results['missing_sizes'] / results['extra_sizes'])
+    Для товарів без розмірів size - порожній рядок, кількості - загальна кількість (amount)
+    """
+    art: str       # оригінальний артикул з файлу
+    size: str      # нормалізований розмір
+    expected: int  # кількість в таблицях
+    scanned: int   # кількість у файлі скану
+
+    @property
+    def delta(self):
+        """Відскановано мінус очікувалось: < 0 - недостача, > 0 - надлишок"""
+        return self.scanned - self.expected
+
+
+def format_size_diff(size_diff, size_label=None):
+    """
+    Текст розбіжності для повідомлення та Excel:
+    "M", "M (потрібно ще 2)", "M (3 шт)", "M (більше на 2)", "Недостача 3 шт", "Надлишок 1 шт"
+    size_label - як показувати розмір (наприклад, оригінальний розмір з файлу), за замовчуванням size
+    """
+    delta = size_diff.delta
+    if not size_diff.size:
+        return f"Недостача {-delta} шт" if delta < 0 else f"Надлишок {delta} шт"
+
+    label = size_diff.size if size_label is None else size_label
+    if delta < 0:
+        return label if delta == -1 else f"{label} (потрібно ще {-delta})"
+    if size_diff.expected == 0:
+        # Розміру немає в таблиці
+        return label if size_diff.scanned == 1 else f"{label} ({size_diff.scanned} шт)"
+    return label if delta == 1 else f"{label} (більше на {delta})"
+
+
+def format_size_diffs(size_diffs, original_sizes=None):
+    """
+    Список розбіжностей артикулу одним рядком через кому
+    original_sizes - {нормалізований_розмір: оригінальний_розмір} з файлу (для Excel)
+    """
+    if original_sizes:
+        return ', '.join(format_size_diff(d, original_sizes.get(d.size, d.size)) for d in size_diffs)
+    return ', '.join(format_size_diff(d) for d in size_diffs)
+
+
+def count_shortage(size_diffs):
+    """Скільки одиниць не вистачає за списком розбіжностей"""
+    return sum(-d.delta for d in size_diffs if d.delta < 0)
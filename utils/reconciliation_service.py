@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from config import reconciliation_engine, reconciliation_processes, reconciliation_workers
+from utils.metrics import metrics
+
+
+class ReconciliationService:
+    """
+    Виконує блокуючі операції (gspread, openpyxl, парсинг CSV) в пулі потоків,
+    щоб event loop бота залишався вільним для /start та callback-ів.
+
+    Завдання одного користувача виконуються по черзі (черга на користувача),
+    завдання різних користувачів — паралельно, але не більше max_workers одночасно.
+
+    Якщо задано process_workers, CPU-важка робота (run_cpu, submit_cpu) виконується
+    в пулі процесів: кілька ядер і без конкуренції за GIL з event loop.
+    Аргументи та результати таких завдань передаються через pickle.
+    """
+
+    def __init__(self, max_workers, process_workers=0):
+        self.max_workers = max(1, max_workers)
+        # 0 - пул процесів вимкнено, run_cpu виконується в пулі потоків
+        self.process_workers = max(0, process_workers)
+        self._executor = None
+        self._process_executor = None
+        # {user_id: asyncio.Lock} - черга завдань користувача
+        self._user_locks = {}
+        # {user_id: кількість завдань в черзі або в роботі}
+        self._user_pending = {}
+
+    def _get_executor(self):
+        """Створює пул потоків при першому використанні (і після shutdown)"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="reconciliation"
+            )
+        return self._executor
+
+    def _get_process_executor(self):
+        """
+        Створює пул процесів при першому використанні (і після shutdown)
+        spawn - процеси не успадковують потоки та event loop бота
+        """
+        if self._process_executor is None:
+            self._process_executor = ProcessPoolExecutor(
+                max_workers=self.process_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._process_executor
+
+    @property
+    def uses_processes(self):
+        """Чи виконується CPU-важка робота в пулі процесів"""
+        return self.process_workers > 0
+
+    @property
+    def in_flight(self):
+        """Кількість завдань, які очікують або виконуються"""
+        return sum(self._user_pending.values())
+
+    def pending_for_user(self, user_id):
+        """Кількість завдань користувача в черзі (включаючи поточне)"""
+        return self._user_pending.get(user_id, 0)
+
+    async def run(self, user_id, func, *args, **kwargs):
+        """
+        Виконує func(*args, **kwargs) в пулі потоків.
+        Якщо в користувача вже є завдання в роботі — чекає своєї черги.
+        """
+        return await self._run_queued(user_id, self._get_executor, partial(func, *args, **kwargs))
+
+    async def run_cpu(self, user_id, func, *args, **kwargs):
+        """
+        Як run, але в пулі процесів, якщо він увімкнений
+        func - функція рівня модуля, аргументи та результат серіалізуються pickle
+        """
+        get_executor = self._get_process_executor if self.uses_processes else self._get_executor
+        return await self._run_queued(user_id, get_executor, partial(func, *args, **kwargs))
+
+    def submit_cpu(self, func, *args):
+        """
+        Відправляє частину роботи func(*args) в пул процесів без черги користувача
+        (частини одного файлу чи листа розбираються паралельно)
+        Повертає concurrent.futures.Future
+        """
+        return self._get_process_executor().submit(func, *args)
+
+    async def _run_queued(self, user_id, get_executor, call):
+        lock = self._user_locks.get(user_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._user_locks[user_id] = lock
+        self._user_pending[user_id] = self._user_pending.get(user_id, 0) + 1
+
+        try:
+            async with lock:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(get_executor(), call)
+        finally:
+            self._user_pending[user_id] -= 1
+            if self._user_pending[user_id] <= 0:
+                # Черга користувача порожня - звільняємо lock
+                del self._user_pending[user_id]
+                self._user_locks.pop(user_id, None)
+
+    def shutdown(self):
+        """Зупиняє пули потоків та процесів (нові буде створено при наступному виклику run)"""
+        if self._executor is not None:
+            logging.info("Зупиняю пул потоків звірки...")
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self._process_executor is not None:
+            logging.info("Зупиняю пул процесів звірки...")
+            self._process_executor.shutdown(wait=False, cancel_futures=True)
+            self._process_executor = None
+
+
+reconciliation_service = ReconciliationService(
+    reconciliation_workers,
+    reconciliation_processes if reconciliation_engine == 'process' else 0
+)
+
+# Скільки завдань чекає або виконується (для /metrics та /stats)
+metrics.gauge(
+    "reconciliation_jobs_in_flight",
+    "Завдання звірки та генерації файлів, які очікують в черзі або виконуються",
+    lambda: reconciliation_service.in_flight
+)
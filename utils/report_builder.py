@@ -0,0 +1,298 @@
+from utils.reconciliation_results import count_shortage, format_size_diffs
+
+
+def build_art_map(inventory_data):
+    """
+    Індекс файлу скану за оригінальним артикулом (ключі results - це original_art):
+    {original_art: {'original_art', 'sizes', 'original_sizes', 'amount'}}
+    """
+    art_map = {}
+    for norm_art, data_info in inventory_data.items():
+        original_art = data_info['original_art']
+        # sizes тепер це dict {нормалізований_розмір: кількість}
+        # original_sizes це dict {нормалізований_розмір: оригінальний_розмір}
+        art_map[original_art] = {
+            'original_art': original_art,
+            'sizes': data_info['sizes'],  # {нормалізований_розмір: кількість}
+            'original_sizes': data_info.get('original_sizes', {}),  # {нормалізований_розмір: оригінальний_розмір}
+            'amount': data_info.get('amount', 0)  # Загальна кількість для товарів без розмірів
+        }
+    return art_map
+
+
+def calculate_statistics(results, inventory_data, art_map):
+    """
+    Підраховує статистику для повідомлення та Excel файлу
+    Повертає словник з статистикою: total_sizes, matched_sizes, missing_sizes, not_scanned_sizes
+    """
+    # Загальна кількість розмірів (не артикулів, а саме розмірів)
+    # Для товарів з розмірами - рахуємо розміри, для товарів без розмірів - рахуємо amount
+    total_sizes = 0
+    for norm_art, data_info in inventory_data.items():
+        if data_info.get('sizes'):
+            # Товар з розмірами
+            for size, qty in data_info['sizes'].items():
+                if size:  # Пропускаємо порожній розмір
+                    total_sizes += qty
+        else:
+            # Товар без розмірів - рахуємо amount
+            total_sizes += data_info.get('amount', 0)
+    
+    # Кількість співпадінь (сума кількостей розмірів для артикулів, які співпали)
+    matched_sizes = 0
+    for original_art in results.get('matched', []):
+        if original_art in art_map:
+            data = art_map[original_art]
+            if data.get('sizes'):
+                # Товар з розмірами
+                for size, qty in data['sizes'].items():
+                    if size:  # Пропускаємо порожній розмір
+                        matched_sizes += qty
+            else:
+                # Товар без розмірів - рахуємо amount
+                matched_sizes += data.get('amount', 0)
+    
+    # Кількість недостач (сума нестач по розмірах; для товарів без розмірів - по amount)
+    missing_sizes = 0
+    for original_art, missing_list in results.get('missing_sizes', {}).items():
+        missing_sizes += count_shortage(missing_list)
+    
+    # Кількість не відсканованих (сума кількостей розмірів для артикулів, які не були відскановані)
+    not_scanned_sizes = 0
+    for art, sizes in results.get('not_scanned', {}).items():
+        # sizes - це dict {розмір: кількість} або для товарів без розмірів {'': кількість}
+        if sizes:
+            # Перевіряємо, чи це товар без розмірів (порожній ключ)
+            if '' in sizes:
+                not_scanned_sizes += sizes['']
+            else:
+                # Товар з розмірами
+                for size, qty in sizes.items():
+                    if size:  # Пропускаємо порожній розмір
+                        not_scanned_sizes += qty
+    
+    return {
+        'total_sizes': total_sizes,
+        'matched_sizes': matched_sizes,
+        'missing_sizes': missing_sizes,
+        'not_scanned_sizes': not_scanned_sizes
+    }
+
+
+def get_original_size(art_data, normalized_size):
+    """Повертає оригінальний розмір з CSV, якщо він є, інакше нормалізований"""
+    if normalized_size and 'original_sizes' in art_data:
+        return art_data['original_sizes'].get(normalized_size, normalized_size)
+    return normalized_size
+
+
+def format_sizes_for_display(data):
+    """Форматує розміри для відображення. Для товарів без розмірів показує кількість"""
+    # Якщо немає розмірів, але є amount - це товар без розмірів
+    if not data.get('sizes') and 'amount' in data and data['amount'] > 0:
+        return f"{data['amount']} шт"
+    
+    # Якщо є розміри
+    if data.get('sizes'):
+        sizes_list = []
+        for normalized_size, qty in sorted(data['sizes'].items()):
+            if normalized_size:  # Пропускаємо порожній розмір
+                # Використовуємо оригінальний розмір з CSV замість нормалізованого
+                original_size = get_original_size(data, normalized_size)
+                sizes_list.append(f"{original_size} ({qty})" if qty > 1 else original_size)
+        if sizes_list:
+            return ', '.join(sizes_list)
+    
+    return 'Без розмірів'
+
+
+def build_report_rows(results, inventory_data, art_map):
+    """
+    Рядки Excel звіту в порядку виводу: надлишок, співпадіння, не відскановано, недостача, не знайдено
+    Кожен рядок - dict з ключами art, sizes, missing, extra, type
+    """
+    file_rows = []
+    
+    # 1. Рядки з надлишком (зелені) - на початку
+    for original_art, sizes in results.get('extra_sizes', {}).items():
+        if original_art in art_map:
+            data = art_map[original_art]
+            # Використовуємо format_sizes_for_display для nosize (показує "N шт") та size-товарів
+            sizes_str = format_sizes_for_display(data)
+            # sizes - список SizeDiff; показуємо оригінальні розміри з файлу
+            extra_str = format_size_diffs(sizes, data.get('original_sizes'))
+            file_rows.append({
+                'art': data['original_art'],
+                'sizes': sizes_str,
+                'missing': '',
+                'extra': extra_str,
+                'type': 'extra'  # Зелений
+            })
+    
+    # 2. Рядки зі співпадінням (білі) - посередині
+    for original_art in results.get('matched', []):
+        if original_art in art_map:
+            data = art_map[original_art]
+            sizes_str = format_sizes_for_display(data)
+            file_rows.append({
+                'art': data['original_art'],
+                'sizes': sizes_str,
+                'missing': '',
+                'extra': '',
+                'type': 'matched'  # Білий
+            })
+    
+    # 3. Рядки не відскановано (жовті) - після співпадінь
+    for art, sizes in results.get('not_scanned', {}).items():
+        # sizes - це dict {розмір: кількість} або для товарів без розмірів {'': кількість}
+        if sizes:
+            # Перевіряємо, чи це товар без розмірів (порожній ключ)
+            if '' in sizes:
+                sizes_str = f"{sizes['']} шт"
+            else:
+                sizes_list = []
+                for size, qty in sorted(sizes.items()):
+                    if size:  # Пропускаємо порожній розмір
+                        sizes_list.append(f"{size} ({qty})" if qty > 1 else size)
+                sizes_str = ', '.join(sizes_list) if sizes_list else 'Без розмірів'
+        else:
+            sizes_str = 'Без розмірів'
+        
+        file_rows.append({
+            'art': art,
+            'sizes': sizes_str,
+            'missing': 'Не відскановано',
+            'extra': '',
+            'type': 'not_scanned'  # Жовтий
+        })
+    
+    # 4. Рядки з недостачею (червоні) - в кінці
+    for original_art, sizes in results.get('missing_sizes', {}).items():
+        if original_art in art_map:
+            data = art_map[original_art]
+            sizes_str = format_sizes_for_display(data)
+            # sizes - список SizeDiff; показуємо оригінальні розміри з файлу
+            missing_str = format_size_diffs(sizes, data.get('original_sizes'))
+            file_rows.append({
+                'art': data['original_art'],
+                'sizes': sizes_str,
+                'missing': missing_str,
+                'extra': '',
+                'type': 'missing'  # Червоний
+            })
+    
+    # 5. Рядки не знайдені (червоні) - в кінці
+    for art in results.get('not_found', []):
+        # Розміри з файлу за індексом оригінальних артикулів
+        data = art_map.get(art)
+        sizes_str = format_sizes_for_display(data) if data is not None else ''
+        
+        file_rows.append({
+            'art': art,
+            'sizes': sizes_str,
+            'missing': 'Не знайдено в таблицях',
+            'extra': '',
+            'type': 'not_found'  # Червоний
+        })
+    
+    # Перевіряємо, чи всі артикули з файлу додані до Excel
+    # Збираємо всі артикули, які вже додані
+    added_arts = set()
+    for row in file_rows:
+        added_arts.add(row['art'])
+    
+    # Додаємо артикули, які не потрапили в жодну категорію (на всяк випадок)
+    for norm_art, data_info in inventory_data.items():
+        original_art = data_info['original_art']
+        if original_art not in added_arts:
+            # Якщо артикул не доданий, додаємо його як співпадіння (білий)
+            sizes_str = format_sizes_for_display(art_map[original_art])
+            file_rows.append({
+                'art': original_art,
+                'sizes': sizes_str,
+                'missing': '',
+                'extra': '',
+                'type': 'matched'  # Білий - все нормально
+            })
+    
+    # Фільтруємо заголовки ("Артикул" тощо) з file_rows
+    header_arts = {'артикул', 'арт', 'код'}
+    return [
+        r for r in file_rows
+        if str(r.get('art', '')).strip().lower() not in header_arts
+    ]
+
+
+def format_statistics_row(stats):
+    """Рядок статистики під таблицею"""
+    return [
+        f"Розмірів {stats['total_sizes']}",
+        f"Сошлося {stats['matched_sizes']}",
+        f"Недостача {stats['missing_sizes']}",
+        f"Не відскановано {stats['not_scanned_sizes']}",
+    ]
+
+
+class InventoryReport:
+    """
+    Звіт однієї звірки: results, inventory_data та індекс оригінальних артикулів (build_art_map),
+    побудований один раз. Статистика, рядки Excel та текст повідомлення рахуються ліниво
+    з цього індексу і спільні для повідомлення в Telegram та Excel файлу.
+    """
+
+    def __init__(self, results, inventory_data):
+        self.results = results
+        self.inventory_data = inventory_data
+        self.art_map = build_art_map(inventory_data)
+        self._stats = None
+        self._rows = None
+
+    @property
+    def stats(self):
+        """Статистика звірки (calculate_statistics)"""
+        if self._stats is None:
+            self._stats = calculate_statistics(self.results, self.inventory_data, self.art_map)
+        return self._stats
+
+    @property
+    def rows(self):
+        """Рядки Excel звіту (build_report_rows)"""
+        if self._rows is None:
+            self._rows = build_report_rows(self.results, self.inventory_data, self.art_map)
+        return self._rows
+
+    def summary_message(self, categories_display):
+        """Текст результату звірки для Telegram"""
+        results = self.results
+        stats = self.stats
+        message_parts = []
+        message_parts.append(f"📋 Категорії: {categories_display}\n")
+        message_parts.append(f"📊 Всього артикулів у файлі: {len(self.inventory_data)}\n\n")
+        
+        # Додаємо статистику
+        message_parts.append("📈 СТАТИСТИКА:\n")
+        message_parts.append(f"Розмірів: {stats['total_sizes']}\n")
+        message_parts.append(f"Сошлося: {stats['matched_sizes']}\n")
+        message_parts.append(f"Недостача: {stats['missing_sizes']}\n")
+        message_parts.append(f"Не відскановано: {stats['not_scanned_sizes']}\n\n")
+        
+        if results['missing_sizes']:
+            message_parts.append("❌ НЕДОСТАЧА РОЗМІРІВ:")
+            for art, sizes in results['missing_sizes'].items():
+                message_parts.append(f"\n{art}: {format_size_diffs(sizes)}")
+        
+        if results['extra_sizes']:
+            message_parts.append("\n\n✅ НАДЛИШОК РОЗМІРІВ:")
+            for art, sizes in results['extra_sizes'].items():
+                message_parts.append(f"\n{art}: {format_size_diffs(sizes)}")
+        
+        if results['not_found']:
+            message_parts.append(f"\n\n⚠️ НЕ ЗНАЙДЕНО В ТАБЛИЦЯХ (є в файлі скану) ({len(results['not_found'])}):")
+            message_parts.append(f"{', '.join(results['not_found'][:10])}")
+            if len(results['not_found']) > 10:
+                message_parts.append(f"\n... та ще {len(results['not_found']) - 10} артикулів")
+        
+        if results['matched']:
+            message_parts.append(f"\n\n✓ СПІВПАДАЮТЬ ({len(results['matched'])} артикулів)")
+        
+        return ''.join(message_parts) if message_parts else f"Всі артикули ({categories_display}) співпадають!"
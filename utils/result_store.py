@@ -0,0 +1,125 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from config import result_store_backend, result_ttl, state_db_path
+
+
+class ResultStore:
+    """
+    Результати звірок, які чекають на "📥 Отримати файл" (SQLite на диску).
+    В FSM стані тримається лише id результату, тому великі results / inventory_data
+    не лежать в пам'яті бота і переживають перезапуски. Результати старші за ttl видаляються;
+    у користувача зберігається тільки останній результат.
+    """
+
+    def __init__(self, path, ttl):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self):
+        # Окреме з'єднання на кожну операцію - сховище використовується з різних потоків
+        connection = sqlite3.connect(self.path, timeout=30)
+        if not self._initialized:
+            with self._lock:
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS results ("
+                    " result_id TEXT PRIMARY KEY,"
+                    " user_id INTEGER NOT NULL,"
+                    " payload BLOB NOT NULL,"
+                    " expires_at REAL NOT NULL)"
+                )
+                connection.execute("CREATE INDEX IF NOT EXISTS results_user ON results (user_id)")
+                connection.commit()
+                self._initialized = True
+        return connection
+
+    def put(self, user_id, payload):
+        """Зберігає результат користувача (попередній видаляється), повертає id результату"""
+        result_id = uuid.uuid4().hex
+        blob = zlib.compress(pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL))
+        now = time.time()
+        connection = self._connect()
+        try:
+            with self._lock:
+                connection.execute("DELETE FROM results WHERE user_id = ? OR expires_at < ?", (user_id, now))
+                connection.execute(
+                    "INSERT INTO results (result_id, user_id, payload, expires_at) VALUES (?, ?, ?, ?)",
+                    (result_id, user_id, blob, now + self.ttl)
+                )
+                connection.commit()
+        finally:
+            connection.close()
+        return result_id
+
+    def get(self, result_id):
+        """Повертає збережений результат або None (не знайдено або застарів)"""
+        connection = self._connect()
+        try:
+            row = connection.execute(
+                "SELECT payload FROM results WHERE result_id = ? AND expires_at >= ?",
+                (result_id, time.time())
+            ).fetchone()
+        finally:
+            connection.close()
+
+        if row is None:
+            return None
+        return pickle.loads(zlib.decompress(row[0]))
+
+    def delete(self, result_id):
+        connection = self._connect()
+        try:
+            with self._lock:
+                connection.execute("DELETE FROM results WHERE result_id = ?", (result_id,))
+                connection.commit()
+        finally:
+            connection.close()
+
+
+class MemoryResultStore:
+    """ResultStore в пам'яті процесу (RESULT_STORE=memory): той самий TTL, але без диску"""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # {result_id: (user_id, payload, expires_at)}
+        self._results = {}
+
+    def put(self, user_id, payload):
+        result_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._results = {
+                key: value for key, value in self._results.items()
+                if value[0] != user_id and value[2] >= now
+            }
+            self._results[result_id] = (user_id, payload, now + self.ttl)
+        return result_id
+
+    def get(self, result_id):
+        entry = self._results.get(result_id)
+        if entry is None or entry[2] < time.time():
+            return None
+        return entry[1]
+
+    def delete(self, result_id):
+        with self._lock:
+            self._results.pop(result_id, None)
+
+
+def _create_result_store():
+    if result_store_backend == 'memory':
+        return MemoryResultStore(result_ttl)
+    directory = os.path.dirname(state_db_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    return ResultStore(state_db_path, result_ttl)
+
+
+result_store = _create_result_store()
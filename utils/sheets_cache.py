@@ -0,0 +1,149 @@
+import threading
+import time
+from gspread import Client, Spreadsheet
+from gspread.utils import extract_id_from_url
+from config import sheets_metadata_ttl
+from utils.metrics import cache_requests
+from utils.single_flight import SingleFlight
+
+
+class TTLCache:
+    """
+    Простий потокобезпечний кеш з часом життя записів (ttl в секундах).
+    Використовується з пулу потоків звірки, тому всі операції під lock.
+    name - назва кешу в метриці cache_requests_total (hit / miss)
+    """
+
+    def __init__(self, ttl, name=None):
+        self.ttl = ttl
+        self.name = name
+        self._items = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Повертає значення або None, якщо запису немає чи він застарів"""
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and item[1] < time.monotonic():
+                del self._items[key]
+                item = None
+        if self.name:
+            cache_requests.inc(cache=self.name, result="miss" if item is None else "hit")
+        return None if item is None else item[0]
+
+    def set(self, key, value):
+        with self._lock:
+            self._items[key] = (value, time.monotonic() + self.ttl)
+
+    def invalidate(self, predicate):
+        """Видаляє всі записи, для ключів яких predicate(key) повертає True"""
+        with self._lock:
+            for key in [key for key in self._items if predicate(key)]:
+                del self._items[key]
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+def get_spreadsheet_id(link):
+    """ID таблиці з посилання (без ?gid=... та #gid=...), щоб різні посилання на одну книгу мали один ключ"""
+    return extract_id_from_url(link)
+
+
+# {spreadsheet_id: Spreadsheet} та {(spreadsheet_id, індекс_листа): Worksheet} для gspread
+spreadsheet_cache = TTLCache(sheets_metadata_ttl, "spreadsheets")
+worksheet_cache = TTLCache(sheets_metadata_ttl, "worksheets")
+# {spreadsheet_id: [назви листів за індексом]} для batchGet запитів
+sheet_titles_cache = TTLCache(sheets_metadata_ttl, "sheet_titles")
+
+# Одночасні запити однієї таблиці / одного листа з різних потоків виконуються один раз
+spreadsheet_flight = SingleFlight("spreadsheet")
+worksheet_values_flight = SingleFlight("worksheet_values")
+
+
+class MetadataSpreadsheet(Spreadsheet):
+    """
+    Spreadsheet, який запитує метадані (список листів) один раз - при відкритті.
+    get_worksheet, worksheets та інші виклики fetch_sheet_metadata() без параметрів беруть їх з пам'яті,
+    а не запитують заново; таблиця кешується на sheets_metadata_ttl, тому метадані - один запит на TTL
+    """
+
+    _metadata = None
+
+    def fetch_sheet_metadata(self, params=None):
+        if params is not None:
+            return super().fetch_sheet_metadata(params)
+        if self._metadata is None:
+            self._metadata = super().fetch_sheet_metadata()
+        return self._metadata
+
+
+def _open_spreadsheet(client, spreadsheet_id):
+    if isinstance(client, Client):
+        spreadsheet = MetadataSpreadsheet(client.http_client, {"id": spreadsheet_id})
+    else:
+        # Інші клієнти з тим самим інтерфейсом (заміна gspread в бенчмарках)
+        spreadsheet = client.open_by_key(spreadsheet_id)
+    spreadsheet_cache.set(spreadsheet_id, spreadsheet)
+    return spreadsheet
+
+
+def open_spreadsheet(client, link):
+    """Відкриває таблицю через gspread або повертає вже відкриту (метадані не запитуються повторно)"""
+    spreadsheet_id = get_spreadsheet_id(link)
+    spreadsheet = spreadsheet_cache.get(spreadsheet_id)
+    if spreadsheet is None:
+        spreadsheet = spreadsheet_flight.do(spreadsheet_id, _open_spreadsheet, client, spreadsheet_id)
+    return spreadsheet
+
+
+def get_worksheet(client, link, sheet_number):
+    """Аналог client.open_by_url(link).get_worksheet(sheet_number) з кешуванням"""
+    key = (get_spreadsheet_id(link), sheet_number)
+    worksheet = worksheet_cache.get(key)
+    if worksheet is None:
+        worksheet = open_spreadsheet(client, link).get_worksheet(sheet_number)
+        worksheet_cache.set(key, worksheet)
+    return worksheet
+
+
+def _read_worksheet_values(client, link, sheet_number):
+    return get_worksheet(client, link, sheet_number).get_all_values()
+
+
+def get_worksheet_values(client, link, sheet_number):
+    """
+    Всі рядки листа (get_worksheet(...).get_all_values())
+    Одночасні читання одного листа об'єднуються в один запит; рядки спільні для всіх, хто чекав, - не змінювати
+    """
+    key = (get_spreadsheet_id(link), sheet_number)
+    return worksheet_values_flight.do(key, _read_worksheet_values, client, link, sheet_number)
+
+
+def get_sheet_titles(client, link):
+    """Назви листів таблиці в порядку індексів (через gspread, з кешуванням)"""
+    spreadsheet_id = get_spreadsheet_id(link)
+    titles = sheet_titles_cache.get(spreadsheet_id)
+    if titles is None:
+        titles = [worksheet.title for worksheet in open_spreadsheet(client, link).worksheets()]
+        sheet_titles_cache.set(spreadsheet_id, titles)
+    return titles
+
+
+def invalidate_spreadsheet(link):
+    """
+    Скидає кеш однієї таблиці (наприклад, після помилки читання -
+    лист могли перейменувати або видалити)
+    """
+    spreadsheet_id = get_spreadsheet_id(link)
+    spreadsheet_cache.invalidate(lambda key: key == spreadsheet_id)
+    worksheet_cache.invalidate(lambda key: key[0] == spreadsheet_id)
+    sheet_titles_cache.invalidate(lambda key: key == spreadsheet_id)
+
+
+def clear_sheets_cache():
+    """Повністю очищає кеш відкритих таблиць"""
+    spreadsheet_cache.clear()
+    worksheet_cache.clear()
+    sheet_titles_cache.clear()
@@ -0,0 +1,94 @@
+import logging
+import time
+from google.auth.credentials import AnonymousCredentials
+from gspread import Client
+from gspread.exceptions import APIError
+from gspread.http_client import HTTPClient
+from requests.exceptions import ConnectionError as RequestsConnectionError, Timeout
+from config import drive_api_url, sheets_api_url, sheets_max_retries
+from utils.async_sheets import DRIVE_FILES_API_URL, SHEETS_API_BASE_URL
+from utils.metrics import sheets_api_requests
+from utils.rate_limiter import RETRY_STATUSES, backoff_delay, sheets_read_limiter
+
+
+def uses_google_api():
+    """True, якщо запити йдуть до Google, False - до іншого сервера (SHEETS_API_URL / DRIVE_API_URL)"""
+    return sheets_api_url == SHEETS_API_BASE_URL and drive_api_url == DRIVE_FILES_API_URL
+
+
+def redirect_url(url):
+    """Адреса Google Sheets / Drive API -> та сама адреса на сервері з конфігурації"""
+    if url.startswith(SHEETS_API_BASE_URL):
+        return sheets_api_url + url[len(SHEETS_API_BASE_URL):]
+    if url.startswith(DRIVE_FILES_API_URL):
+        return drive_api_url + url[len(DRIVE_FILES_API_URL):]
+    return url
+
+
+class MeteredHTTPClient(HTTPClient):
+    """HTTP клієнт gspread, який рахує запити в sheets_api_requests_total (за HTTP статусом)"""
+
+    def request(self, method, endpoint, *args, **kwargs):
+        try:
+            response = super().request(method, endpoint, *args, **kwargs)
+        except APIError as e:
+            sheets_api_requests.inc(client="gspread", status=e.response.status_code)
+            raise
+        except Exception:
+            sheets_api_requests.inc(client="gspread", status="error")
+            raise
+        sheets_api_requests.inc(client="gspread", status=response.status_code)
+        return response
+
+
+class RateLimitedHTTPClient(MeteredHTTPClient):
+    """
+    HTTP клієнт gspread: запити до Sheets API чекають черги в спільному обмежувачі квоти
+    (sheets_read_limiter, той самий, що в AsyncSheetsClient), 429/5xx та обриви з'єднання
+    повторюються з експоненційною затримкою замість помилки
+    """
+
+    rate_limiter = sheets_read_limiter
+    max_retries = sheets_max_retries
+
+    def request(self, method, endpoint, *args, **kwargs):
+        # Drive API має окрему квоту
+        limited = endpoint.startswith(sheets_api_url) or endpoint.startswith(SHEETS_API_BASE_URL)
+        attempt = 0
+        while True:
+            if limited:
+                self.rate_limiter.acquire()
+            retry_after = None
+            status = None
+            try:
+                return super().request(method, endpoint, *args, **kwargs)
+            except APIError as e:
+                status = e.response.status_code
+                if status not in RETRY_STATUSES:
+                    raise
+                retry_after = e.response.headers.get("Retry-After")
+                error = e
+            except (RequestsConnectionError, Timeout) as e:
+                error = e
+
+            attempt += 1
+            if attempt > self.max_retries:
+                raise error
+
+            delay = backoff_delay(attempt, retry_after)
+            if status == 429 and limited:
+                self.rate_limiter.throttle(delay)
+            logging.warning(f"[gspread] {error}; повтор {attempt}/{self.max_retries} через {delay:.1f} с")
+            time.sleep(delay)
+
+
+class RedirectHTTPClient(RateLimitedHTTPClient):
+    """HTTP клієнт gspread, який надсилає запити на SHEETS_API_URL / DRIVE_API_URL замість Google"""
+
+    def request(self, method, endpoint, *args, **kwargs):
+        return super().request(method, redirect_url(endpoint), *args, **kwargs)
+
+
+def create_local_client():
+    """gspread клієнт для локального сервера таблиць: без credentials Google, запити на адреси з конфігурації"""
+    return Client(AnonymousCredentials(), http_client=RedirectHTTPClient)
@@ -0,0 +1,187 @@
+from itertools import zip_longest
+from typing import NamedTuple
+from config import data
+from utils.sheets_cache import get_spreadsheet_id
+from utils.sheets_utils import get_category_worksheets, parse_category_rows
+
+
+class WorkbookRead(NamedTuple):
+    """Всі листи однієї таблиці (книги), які потрібно прочитати одним values:batchGet запитом"""
+    spreadsheet_id: str
+    link: str
+    sheets: dict  # {індекс_листа: set номерів потрібних колонок (з 1)}
+
+
+class RangeRead(NamedTuple):
+    """Один діапазон batchGet запиту"""
+    sheet_number: int
+    columns: tuple  # номери колонок листа (з 1), які повертає діапазон
+    a1: str
+
+
+def column_letter(column):
+    """Номер колонки (з 1) -> буквене позначення A1 (1 -> A, 27 -> AA)"""
+    letters = ""
+    while column > 0:
+        column, remainder = divmod(column - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+def get_category_columns(category):
+    """Колонки (з 1), які потрібні для розбору листа категорії: артикул, розмір, кількість"""
+    details = data[category]
+    return details["art"], details["size"], details["amount"]
+
+
+def plan_category_reads(categories):
+    """
+    Групує потрібні листи всіх категорій по таблицях
+    Один лист читається один раз, навіть якщо він потрібен кільком категоріям
+    Повертає список WorkbookRead (по одному на таблицю)
+    """
+    workbooks = {}
+    for category in categories:
+        columns = get_category_columns(category)
+        for link, sheet_number in get_category_worksheets(category):
+            spreadsheet_id = get_spreadsheet_id(link)
+            if spreadsheet_id not in workbooks:
+                workbooks[spreadsheet_id] = WorkbookRead(spreadsheet_id, link, {})
+            workbooks[spreadsheet_id].sheets.setdefault(sheet_number, set()).update(columns)
+    return list(workbooks.values())
+
+
+def build_ranges(workbook_read, titles, projected=True):
+    """
+    Діапазони A1 для batchGet
+    projected=True - кожна потрібна колонка окремим діапазоном ('Лист'!L:L), решта колонок не завантажується
+    projected=False - один діапазон на лист від A до останньої потрібної колонки ('Лист'!A:P)
+    Листи, яких немає в таблиці, пропускаються
+    """
+    ranges = []
+    for sheet_number, columns in sorted(workbook_read.sheets.items()):
+        if sheet_number >= len(titles):
+            print(f"Лист {sheet_number} не знайдено в таблиці {workbook_read.link}")
+            continue
+        title = titles[sheet_number].replace("'", "''")
+        if projected:
+            for column in sorted(columns):
+                letter = column_letter(column)
+                ranges.append(RangeRead(sheet_number, (column,), f"'{title}'!{letter}:{letter}"))
+        else:
+            last_column = max(columns)
+            ranges.append(RangeRead(
+                sheet_number, tuple(range(1, last_column + 1)), f"'{title}'!A:{column_letter(last_column)}"
+            ))
+    return ranges
+
+
+def get_major_dimension(projected):
+    """Колонки зручніше отримувати по стовпцях (один масив замість масиву на кожен рядок)"""
+    return "COLUMNS" if projected else "ROWS"
+
+
+def assemble_rows(spreadsheet_id, ranges, values, projected=True):
+    """
+    Збирає відповідь batchGet назад у рядки листів
+    values - список значень для кожного діапазону (у тому ж порядку, що й ranges)
+    Повертає {(spreadsheet_id, індекс_листа): (колонки, рядки)}, де колонки - номери колонок листа
+    у позиціях рядка (для projected рядки містять тільки завантажені колонки)
+    """
+    if not projected:
+        return {
+            (spreadsheet_id, range_read.sheet_number): (range_read.columns, rows)
+            for range_read, rows in zip(ranges, values)
+        }
+
+    # {індекс_листа: ([колонки], [значення колонок])}
+    sheets = {}
+    for range_read, column_values in zip(ranges, values):
+        columns, column_lists = sheets.setdefault(range_read.sheet_number, ([], []))
+        columns.append(range_read.columns[0])
+        # Для majorDimension=COLUMNS відповідь - [[значення колонки]] або [] для порожньої колонки
+        column_lists.append(column_values[0] if column_values else [])
+
+    return {
+        (spreadsheet_id, sheet_number): (tuple(columns), list(zip_longest(*column_lists, fillvalue="")))
+        for sheet_number, (columns, column_lists) in sheets.items()
+    }
+
+
+def iter_planned_sheets(categories, fetched):
+    """
+    Прочитані листи, які потрібно розібрати, для кожної категорії
+    fetched - результат assemble_rows для всіх таблиць; відсутні листи (помилка читання) пропускаються
+    Генерує ((категорія, spreadsheet_id, індекс_листа), категорія, рядки, позиції колонок для parse_category_rows)
+    """
+    seen = set()
+    for category in categories:
+        for link, sheet_number in get_category_worksheets(category):
+            key = (category, get_spreadsheet_id(link), sheet_number)
+            sheet = fetched.get(key[1:])
+            if sheet is None or key in seen:
+                continue
+            seen.add(key)
+            columns, all_data = sheet
+            # Позиції потрібних колонок категорії в зібраних рядках
+            positions = tuple(columns.index(column) + 1 for column in get_category_columns(category))
+            yield key, category, all_data, positions
+
+
+def parse_planned_sheets(categories, fetched):
+    """
+    Розбирає кожен прочитаний лист окремо для кожної категорії
+    Повертає {(категорія, spreadsheet_id, індекс_листа): {нормалізований_артикул: дані}}
+    """
+    return {
+        key: parse_category_rows(category, all_data, None, positions)
+        for key, category, all_data, positions in iter_planned_sheets(categories, fetched)
+    }
+
+
+def merge_arts_data(all_arts_data, sheet_arts_data):
+    """Додає артикули одного листа до даних категорії (так само, як послідовний parse_category_rows)"""
+    for normalized_art, art_data in sheet_arts_data.items():
+        target = all_arts_data.get(normalized_art)
+        if target is None:
+            all_arts_data[normalized_art] = {
+                'sizes': dict(art_data['sizes']),
+                'amount': art_data['amount'],
+                'original_art': art_data['original_art']
+            }
+            continue
+        target['amount'] += art_data['amount']
+        for size, quantity in art_data['sizes'].items():
+            target['sizes'][size] = target['sizes'].get(size, 0) + quantity
+    return all_arts_data
+
+
+def merge_category_sheets(categories, sheet_data):
+    """
+    Об'єднує розібрані листи в дані категорій (в порядку листів з config.data)
+    Категорія, для якої не вдалося прочитати хоча б один лист, не об'єднується -
+    інакше її артикули з цього листа виглядали б як "не знайдені"
+    Повертає ({категорія: результат як у load_all_arts_from_category}, [категорії з помилкою читання])
+    """
+    category_sheet_data = {}
+    failed_categories = []
+    for category in categories:
+        all_arts_data = {}
+        for link, sheet_number in get_category_worksheets(category):
+            sheet_arts_data = sheet_data.get((category, get_spreadsheet_id(link), sheet_number))
+            if sheet_arts_data is None:
+                failed_categories.append(category)
+                break
+            merge_arts_data(all_arts_data, sheet_arts_data)
+        else:
+            category_sheet_data[category] = all_arts_data
+    return category_sheet_data, failed_categories
+
+
+def parse_planned_reads(categories, fetched):
+    """
+    Розбирає прочитані листи по категоріях
+    Повертає {категорія: результат як у load_all_arts_from_category} (категорії з усіма прочитаними листами)
+    """
+    category_sheet_data, _ = merge_category_sheets(categories, parse_planned_sheets(categories, fetched))
+    return category_sheet_data
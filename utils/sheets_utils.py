@@ -1,46 +1,86 @@
 import re
 import csv
+import codecs
+import io
+import logging
+from functools import lru_cache, partial
 from config import data
+from utils.metrics import rows_parsed
+from utils.reconciliation_results import SizeDiff, format_size_diff
+from utils.sheets_cache import get_spreadsheet_id, get_worksheet_values, invalidate_spreadsheet
+from utils.single_flight import SingleFlight
+
+
+# Префікси артикулів -> категорії. Префікси перевіряються по черзі, перший збіг виграє
+# (тому довші префікси стоять перед коротшими: "Кос" перед "Ко", "Клч" перед "Кл")
+CATEGORY_PREFIXES = {
+    "Дж": ["jeans"],
+    "Фут": ["tshirts_polo"],
+    "Пл": ["shorts_swim"],
+    "П": ["tshirts_polo"],
+    "Кос": ["costumes_fleece", "costumes"],
+    "Ко": ["sweaters"],
+    "Дш": ["shorts_jeans"],
+    "Шор": ["shorts_textile"],
+    "Шо": ["shorts_swim"],
+    "Ку": ["jackets"],
+    "Ж": ["waistcoats"],
+    "Бр": ["trousers"],
+    "Шт": ["sport_trousers"],
+    "Ру": ["shirts"],
+    "Н": ["socks"],
+    "Тр": ["underwear"],
+    "Об": ["shoes", "wintershoes"],
+    "Ке": ["caps"],
+    "Шап": ["hats"],
+    "Ре": ["belts"],
+    "Сум": ["bags"],
+    "Клч": ["purses"],
+    "Кл": ["costumes_summer"],
+    "Т": ["tapki"],
+    "Оч": ["glasses"],
+}
+
+
+def _compile_prefix_trie(prefixes):
+    """
+    Trie префіксів (у верхньому регістрі): вузол - dict {символ: вузол},
+    у вузлі, де закінчується префікс, ключ None - (порядковий номер префікса, категорії)
+    """
+    root = {}
+    for order, (prefix, categories) in enumerate(prefixes.items()):
+        node = root
+        for char in prefix.upper():
+            node = node.setdefault(char, {})
+        # Однаковий префікс в різному регістрі: як і при перевірці по черзі, виграє перший
+        node.setdefault(None, (order, categories))
+    return root
 
 
-def get_category_by_prefix(art):
-    prefixes = {
-        "Дж": ["jeans"],
-        "Фут": ["tshirts_polo"],
-        "Пл": ["shorts_swim"],
-        "П": ["tshirts_polo"],
-        "Кос": ["costumes_fleece", "costumes"], 
-        "Ко": ["sweaters"],
-        "Дш": ["shorts_jeans"],
-        "Шор": ["shorts_textile"],
-        "Шо": ["shorts_swim"],
-        "Ку": ["jackets"],
-        "Ж": ["waistcoats"],
-        "Бр": ["trousers"],
-        "Шт": ["sport_trousers"],
-        "Ру": ["shirts"],
-        "Н": ["socks"],
-        "Тр": ["underwear"],
-        "Об": ["shoes", "wintershoes"],
-        "Ке": ["caps"],
-        "Шап": ["hats"],
-        "Ре": ["belts"],
-        "Сум": ["bags"],
-        "Клч": ["purses"],
-        "Кл": ["costumes_summer"],
-        "Т": ["tapki"],
-        "Оч": ["glasses"],
-    }
+_PREFIX_TRIE = _compile_prefix_trie(CATEGORY_PREFIXES)
 
+
+@lru_cache(maxsize=65536)
+def get_category_by_prefix(art):
+    """
+    Категорії артикулу за префіксом (None, якщо префікс невідомий)
+    Серед префіксів, з яких починається артикул, виграє перший в CATEGORY_PREFIXES - як при
+    перевірці по черзі, але за один прохід по trie. Результат кешується для кожного артикулу;
+    повернений список спільний - не змінювати
+    """
     # Приводимо артикул до верхнього регістру для порівняння
     art_upper = art.upper() if art else ""
     
-    for prefix, categories in prefixes.items():
-        # Приводимо префікс до верхнього регістру для порівняння
-        prefix_upper = prefix.upper()
-        if art_upper.startswith(prefix_upper):
-            return categories 
-    return None
+    node = _PREFIX_TRIE
+    best = None
+    for char in art_upper:
+        node = node.get(char)
+        if node is None:
+            break
+        match = node.get(None)
+        if match is not None and (best is None or match[0] < best[0]):
+            best = match
+    return best[1] if best is not None else None
 
 
 def has_sizes(category):
@@ -87,109 +127,109 @@ def map_numeric_to_letter_size(size):
     return size_mapping.get(size, size)  # Повертаємо оригінальний розмір, якщо маппінгу немає
 
 
-def normalize_size(size):
-    """Нормалізує розмір, конвертуючи кирилицю в латиницю та числові розміри в буквені"""
-    import logging
-    import re
-    
-    if not size:
-        return ""
-    
-    original_size = size
+# Скомпільовані таблиці для normalize_size (будуються один раз при імпорті)
+_SIZE_MAPPING = get_size_mapping()
+_BRACKET_RE = re.compile(r'\(([^)]+)\)')
+
+# Повні розміри у кирилиці (великі букви)
+_CYRILLIC_TO_LATIN = {
+    'С': 'S',
+    'М': 'M',
+    'Л': 'L',
+    'ХС': 'XS',
+    'ХЛ': 'XL',
+    '2ХЛ': '2XL',
+    '3ХЛ': '3XL',
+    '4ХЛ': '4XL',
+    '5ХЛ': '5XL',
+    '6ХЛ': '6XL',
+    '7ХЛ': '7XL',
+    '8ХЛ': '8XL',
+}
+
+# Заміна кириличних символів в рядку. Послідовна заміна по _CYRILLIC_TO_LATIN зводиться до С, М, Л:
+# після заміни С та Л жоден з довших ключів (ХС, ХЛ, 2ХЛ, ...) вже не може зустрітися
+_CYRILLIC_CHARS = str.maketrans({'С': 'S', 'М': 'M', 'Л': 'L'})
+
+# Малі букви кирилиці: с, м, л -> S, M, L
+_CYRILLIC_LOWER_SINGLE = {'м': 'M', 'л': 'L', 'с': 'S'}
+
+# "хл", "2хл", "3хл" ... на початку рядка (малі букви)
+_XL_PREFIXES = (
+    ('4хл', '4XL'),
+    ('3хл', '3XL'),
+    ('2хл', '2XL'),
+    ('5хл', '5XL'),
+    ('6хл', '6XL'),
+    ('7хл', '7XL'),
+    ('8хл', '8XL'),
+    ('хл', 'XL'),
+)
+
+_VALID_LATIN_SIZES = frozenset({'XS', 'S', 'M', 'L', 'XL', '2XL', '3XL', '4XL', '5XL', '6XL', '7XL', '8XL'})
+
+
+@lru_cache(maxsize=4096)
+def _normalize_size_cached(size):
     size = size.strip()
-    
+
     # Обробка розмірів типу "5(2ХL)" - витягуємо розмір з дужок
-    # Шукаємо патерн: число(розмір), наприклад "5(2ХL)" -> "2ХL"
-    bracket_match = re.search(r'\(([^)]+)\)', size)
+    bracket_match = _BRACKET_RE.search(size)
     if bracket_match:
-        size_in_brackets = bracket_match.group(1).strip()
-        # Нормалізуємо розмір з дужок
-        normalized_bracket = normalize_size(size_in_brackets)
+        normalized_bracket = normalize_size(bracket_match.group(1).strip())
         if normalized_bracket:
-            logging.debug(f"[normalize_size] '{original_size}' -> витягнуто з дужок '{size_in_brackets}' -> '{normalized_bracket}'")
             return normalized_bracket
-    
-    # Спочатку перевіряємо маппінг числових розмірів (46, 48, 50, 52, 54, 56, 58, 60)
-    size_mapping = get_size_mapping()
-    if size in size_mapping:
-        return size_mapping[size]
-    
-    # Конвертуємо до верхнього регістру для обробки кирилиці
+
+    # Маппінг числових розмірів (46, 48, 50, 52, 54, 56, 58, 60)
+    mapped = _SIZE_MAPPING.get(size)
+    if mapped is not None:
+        return mapped
+
     size_upper = size.upper()
     size_lower = size.lower()
-    
-    # Конвертація кирилиці в латиницю для розмірів (підтримка великих та малих букв)
-    cyrillic_to_latin = {
-        'С': 'S',
-        'М': 'M',
-        'Л': 'L',
-        'ХС': 'XS',
-        'ХЛ': 'XL',
-        '2ХЛ': '2XL',
-        '3ХЛ': '3XL',
-        '4ХЛ': '4XL',
-        '5ХЛ': '5XL',
-        '6ХЛ': '6XL',
-        '7ХЛ': '7XL',
-        '8ХЛ': '8XL',
-    }
-    
-    # Обробка малих букв кирилиці: с, м, л -> S, M, L
-    if size_lower in ['м', 'л', 'с']:
-        if size_lower == 'м':
-            return 'M'
-        elif size_lower == 'л':
-            return 'L'
-        elif size_lower == 'с':
-            return 'S'
-    
-    # Обробка "хл", "2хл", "3хл", "4хл" тощо (малі букви)
+
+    # Малі букви кирилиці: с, м, л
+    single = _CYRILLIC_LOWER_SINGLE.get(size_lower)
+    if single is not None:
+        return single
+
+    # "хл", "2хл", "3хл", "4хл" тощо (малі букви)
     if 'хл' in size_lower:
-        # Замінюємо "хл" на "XL" з урахуванням числа перед ним
-        # Перевіряємо точне співпадіння або початок рядка
-        if size_lower == '4хл' or size_lower.startswith('4хл'):
-            return '4XL'
-        elif size_lower == '3хл' or size_lower.startswith('3хл'):
-            return '3XL'
-        elif size_lower == '2хл' or size_lower.startswith('2хл'):
-            return '2XL'
-        elif size_lower == '5хл' or size_lower.startswith('5хл'):
-            return '5XL'
-        elif size_lower == '6хл' or size_lower.startswith('6хл'):
-            return '6XL'
-        elif size_lower == '7хл' or size_lower.startswith('7хл'):
-            return '7XL'
-        elif size_lower == '8хл' or size_lower.startswith('8хл'):
-            return '8XL'
-        elif size_lower == 'хл' or size_lower.startswith('хл'):
-            return 'XL'
-    
-    # Обробка "хс" (кирилиця) -> XS
+        for prefix, latin in _XL_PREFIXES:
+            if size_lower.startswith(prefix):
+                return latin
+
+    # "хс" (кирилиця) -> XS
     if size_lower == 'хс':
         return 'XS'
-    
-    # Перевіряємо, чи це повний розмір у кирилиці (великі букви)
-    if size_upper in cyrillic_to_latin:
-        return cyrillic_to_latin[size_upper]
-    
+
+    # Повний розмір у кирилиці (великі букви)
+    cyrillic = _CYRILLIC_TO_LATIN.get(size_upper)
+    if cyrillic is not None:
+        return cyrillic
+
     # Виправлення випадків сканера (латиниця замість кирилиці): xc -> XS, c -> S
     if size_lower == 'xc':
         return 'XS'
     if size_lower == 'c' and len(size) == 1:
         return 'S'
-    
-    # Якщо розмір вже в латиниці (XS, S, M, L, XL, 2XL, 3XL, 4XL, 5XL, 6XL, 7XL, 8XL), повертаємо як є
-    valid_latin_sizes = {'XS', 'S', 'M', 'L', 'XL', '2XL', '3XL', '4XL', '5XL', '6XL', '7XL', '8XL'}
-    if size_upper in valid_latin_sizes:
+
+    # Розмір вже в латиниці
+    if size_upper in _VALID_LATIN_SIZES:
         return size_upper
-    
+
     # Замінюємо кириличні символи в рядку (великі букви)
-    result = size_upper
-    for cyr, lat in cyrillic_to_latin.items():
-        result = result.replace(cyr, lat)
-    
-    logging.debug(f"[normalize_size] '{original_size}' -> '{result}'")
-    return result
+    return size_upper.translate(_CYRILLIC_CHARS)
+
+
+def normalize_size(size):
+    """
+    Нормалізує розмір, конвертуючи кирилицю в латиницю та числові розміри в буквені
+    Результати кешуються: різних сирих розмірів небагато, а викликів - на кожен розмір кожного рядка
+    """
+    if not size:
+        return ""
+    return _normalize_size_cached(size)
 
 def split_sizes(size_string):
     sizes = re.split(r'[,\s\-]+', size_string)
@@ -214,22 +254,22 @@ def adjust_size(original_size, filter_value):
         try:
             adjustment = int(filter_value)
         except ValueError:
-            print(f"Invalid filter_value: {filter_value}")
+            logging.warning(f"[adjust_size] Invalid filter_value: {filter_value}")
             return original_size
 
-        print(f"Adjustment: {adjustment}")
+        logging.debug(f"[adjust_size] Adjustment: {adjustment}")
 
         if original_size in {"28", "29", "30", "31", "32", "33", "34", "35", "36", "38", "39", "40", "41", "42", "43", "44", "45", "46"}:
             size_order = ["28", "29", "30", "31", "32", "33", "34", "35", "36", "38", "39", "40", "41", "42", "43", "44", "45", "46"]
             current_index = size_order.index(original_size)
             new_index = max(0, min(current_index + adjustment, len(size_order) - 1))
-            print(f"Original size: {original_size}, Current index: {current_index}, New index: {new_index}, New size: {size_order[new_index]}")
+            logging.debug(f"[adjust_size] Original size: {original_size}, Current index: {current_index}, New index: {new_index}, New size: {size_order[new_index]}")
             return size_order[new_index]
         elif original_size in {"XS", "S", "M", "L", "XL", "2XL", "3XL", "4XL", "5XL", "6XL", "7XL", "8XL"}:
             size_order = ["XS", "S", "M", "L", "XL", "2XL", "3XL", "4XL", "5XL", "6XL", "7XL", "8XL"]
             current_index = size_order.index(original_size)
             new_index = max(0, min(current_index + adjustment, len(size_order) - 1))
-            print(f"Original size: {original_size}, Current index: {current_index}, New index: {new_index}, New size: {size_order[new_index]}")
+            logging.debug(f"[adjust_size] Original size: {original_size}, Current index: {current_index}, New index: {new_index}, New size: {size_order[new_index]}")
             return size_order[new_index]
         
     return original_size
@@ -259,8 +299,7 @@ def find_item_by_size_in_category(client, size, categories):
 
             if isinstance(sheet_numbers, list):
                 for sheet_number in sheet_numbers:
-                    sheet = client.open_by_url(link).get_worksheet(sheet_number)
-                    all_data = sheet.get_all_values()
+                    all_data = get_worksheet_values(client, link, sheet_number)
 
                     art_column = [row[details["art"] - 1] for row in all_data]
                     price_column = [row[details["price"] - 1] for row in all_data]
@@ -302,8 +341,7 @@ def find_item_by_size_in_category(client, size, categories):
                                 'photo': photo_column[i]
                             })
             else:
-                sheet = client.open_by_url(link).get_worksheet(sheet_numbers)
-                all_data = sheet.get_all_values()
+                all_data = get_worksheet_values(client, link, sheet_numbers)
                 art_column = [row[details["art"] - 1] for row in all_data]
                 price_column = [row[details["price"] - 1] for row in all_data]
                 size_column = [
@@ -369,8 +407,7 @@ def find_item_by_size_in_category_drop(client, size, categories):
 
             if isinstance(sheet_numbers, list):
                 for sheet_number in sheet_numbers:
-                    sheet = client.open_by_url(link).get_worksheet(sheet_number)
-                    all_data = sheet.get_all_values()
+                    all_data = get_worksheet_values(client, link, sheet_number)
 
                     art_column = [row[details["art"] - 1] for row in all_data]
                     price_column = [
@@ -415,8 +452,7 @@ def find_item_by_size_in_category_drop(client, size, categories):
                                 'photo': photo_column[i]
                             })
             else:
-                sheet = client.open_by_url(link).get_worksheet(sheet_numbers)
-                all_data = sheet.get_all_values()
+                all_data = get_worksheet_values(client, link, sheet_numbers)
                 art_column = [row[details["art"] - 1] for row in all_data]
                 price_column = [
                         row[details["dropprice"] - 1] if row[details["dropprice"] - 1].strip() else "0"
@@ -462,12 +498,16 @@ def find_item_by_size_in_category_drop(client, size, categories):
     return result
 
 
+_ART_SEPARATORS_RE = re.compile(r'[\s\-]+')
+_ART_SIZE_SUFFIX_RE = re.compile(r'\.\d+$')
+
+
 def normalize_art(art):
     """Нормалізує артикул, видаляючи пробіли, дефіси та інші символи для порівняння"""
     if not art:
         return ""
     # Видаляємо всі пробіли, дефіси та приводимо до верхнього регістру
-    normalized = re.sub(r'[\s\-]+', '', art.upper())
+    normalized = _ART_SEPARATORS_RE.sub('', art.upper())
     return normalized
 
 
@@ -491,113 +531,283 @@ def extract_base_art(art):
     art = art.strip()
     
     # Видаляємо тільки .число в кінці (.130, .38). НЕ -200 — це частина артикулу Ре-200
-    base_art = re.sub(r'\.\d+$', '', art)
+    base_art = _ART_SIZE_SUFFIX_RE.sub('', art)
     
     return base_art.strip()
 
 
+def _add_csv_row(inventory_data, row):
+    """Додає рядок CSV переобліку до inventory_data"""
+    if len(row) < 2:
+        return
+    
+    # Артикул з другого стовпця (індекс 1)
+    art = row[1].strip() if len(row) > 1 else ""
+    # Розмір з четвертого стовпця (індекс 3) - "Інформація"
+    size_info = row[3].strip() if len(row) > 3 else ""
+    # Кількість: F (індекс 5) "Відскановано", fallback на E (індекс 4) для 5-колонкового CSV
+    if len(row) > 5 and row[5].strip():
+        amount = row[5].strip()
+    elif len(row) > 4 and row[4].strip():
+        amount = row[4].strip()
+    else:
+        amount = "1"
+    
+    if not art or _is_header_row(art):
+        return
+    
+    # Визначаємо категорію для перевірки, чи має товар розміри
+    categories = get_category_by_prefix(art)
+    category_has_sizes = True
+    if categories:
+        category_has_sizes = has_sizes(categories[0])
+    
+    # Завжди витягуємо базовий артикул для пошуку (Ре-210.130 -> Ре-210)
+    # Частина після крапки (.130) — це варіант/розмір, не використовуємо при пошуку
+    base_art = extract_base_art(art)
+    
+    # Нормалізуємо артикул для порівняння
+    normalized_art = normalize_art(base_art)
+    
+    if normalized_art not in inventory_data:
+        inventory_data[normalized_art] = {
+            'sizes': {},  # {нормалізований_розмір: кількість} - для порівняння
+            'original_sizes': {},  # {нормалізований_розмір: оригінальний_розмір} - для виведення
+            'amount': 0,
+            'original_art': base_art  # Зберігаємо базовий або повний артикул
+        }
+    
+    # Додаємо розмір з колонки "Інформація" з кількістю
+    if size_info and size_info.strip() and category_has_sizes:
+        # Товар з розмірами
+        original_size = size_info.strip()  # Зберігаємо оригінальний розмір з CSV
+        normalized_size = normalize_size(size_info)
+        # Отримуємо кількість для цього розміру
+        try:
+            size_amount = int(amount) if amount else 1
+        except ValueError:
+            size_amount = 1
+        
+        # Додаємо або оновлюємо кількість для розміру
+        if normalized_size in inventory_data[normalized_art]['sizes']:
+            inventory_data[normalized_art]['sizes'][normalized_size] += size_amount
+        else:
+            inventory_data[normalized_art]['sizes'][normalized_size] = size_amount
+        
+        # Зберігаємо оригінальний розмір (якщо для цього нормалізованого розміру ще немає)
+        if normalized_size not in inventory_data[normalized_art]['original_sizes']:
+            inventory_data[normalized_art]['original_sizes'][normalized_size] = original_size
+    else:
+        # Для товарів без розмірів - зберігаємо тільки загальну кількість в amount
+        # sizes залишаємо порожнім для таких товарів
+        pass
+    
+    # Додаємо загальну кількість
+    try:
+        inventory_data[normalized_art]['amount'] += int(amount) if amount else 1
+    except ValueError:
+        inventory_data[normalized_art]['amount'] += 1
+
+
+def _ends_in_quotes(line, delimiter, in_quotes):
+    """
+    Чи закінчується рядок всередині поля в лапках (запис CSV продовжується на наступному рядку)
+    Правила як у csv.reader за замовчуванням: лапки відкривають поле лише на його початку, "" - екранована лапка
+    """
+    field_start = not in_quotes
+    i = 0
+    length = len(line)
+    while i < length:
+        char = line[i]
+        if in_quotes:
+            if char == '"':
+                if i + 1 < length and line[i + 1] == '"':
+                    i += 1
+                else:
+                    in_quotes = False
+        elif char == '"' and field_start:
+            in_quotes = True
+        field_start = char == delimiter
+        i += 1
+    return in_quotes
+
+
+class CsvInventoryParser:
+    """
+    Потоковий парсер CSV з переобліком: байти подаються частинами через write(),
+    завершені записи розбираються одразу, результат - close().
+    Має write/flush, тому може бути destination для bot.download_file - файл розбирається
+    під час завантаження, без тимчасового файлу на диску.
+    Роздільник (; або ,) визначається за першим рядком, щойно він отриманий; перший запис - заголовок.
+    """
+
+    def __init__(self, encoding='utf-8'):
+        # Універсальні переноси рядків (\r\n, \r -> \n), як при відкритті файлу в текстовому режимі
+        self._decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder(encoding)(), translate=True)
+        self._tail = ''  # незавершений рядок з попередньої частини
+        self._record = []  # рядки запису з полем в лапках, яке ще не закрите
+        self._in_quotes = False
+        self._delimiter = None
+        self._header_skipped = False
+        self.inventory_data = {}
+        self.error = None
+
+    def write(self, chunk):
+        if self.error is None:
+            try:
+                self._feed(self._decoder.decode(chunk))
+            except Exception as e:
+                self.error = e
+        return len(chunk)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        """
+        Розбирає залишок даних і повертає словник як parse_csv_file
+        (порожній, якщо файл не вдалося прочитати)
+        """
+        self._finish()
+        return self._result()
+
+    async def aclose(self):
+        """close() для event loop (парсер з пулом процесів чекає на процеси не блокуючи loop)"""
+        return self.close()
+
+    def _finish(self):
+        """Розбирає залишок даних після останньої частини"""
+        if self.error is not None:
+            return
+        try:
+            text = self._tail + self._decoder.decode(b'', final=True)
+            self._tail = ''
+            records = []
+            if text:
+                self._add_line(text, records)
+            if self._record:
+                # Незакрите поле в лапках до кінця файлу
+                records.append(''.join(self._record))
+                self._record = []
+            rows_parsed.inc(len(records), source="csv")
+            self._parse_records(records)
+        except Exception as e:
+            self.error = e
+
+    def _result(self):
+        if self.error is not None:
+            print(f"Помилка при парсингу CSV: {self.error}")
+            return {}
+        return self.inventory_data
+
+    def _feed(self, text):
+        if not text:
+            return
+        lines = (self._tail + text).split('\n')
+        self._tail = lines.pop()
+        records = []
+        for line in lines:
+            self._add_line(line + '\n', records)
+        rows_parsed.inc(len(records), source="csv")
+        self._parse_records(records)
+
+    def _add_line(self, line, records):
+        if self._delimiter is None:
+            # Визначаємо роздільник (може бути ; або ,)
+            self._delimiter = ';' if ';' in line else ','
+        if self._in_quotes or '"' in line:
+            self._in_quotes = _ends_in_quotes(line, self._delimiter, self._in_quotes)
+            self._record.append(line)
+            if self._in_quotes:
+                return
+            line = ''.join(self._record)
+            self._record = []
+        records.append(line)
+
+    def _parse_records(self, records):
+        if not records:
+            return
+        reader = csv.reader(records, delimiter=self._delimiter)
+        if not self._header_skipped:
+            next(reader, None)  # Пропускаємо заголовок
+            self._header_skipped = True
+        inventory_data = self.inventory_data
+        for row in reader:
+            _add_csv_row(inventory_data, row)
+
+
+def parse_csv_records(records, delimiter):
+    """
+    Розбирає записи CSV переобліку без заголовка (частина файлу для пулу процесів)
+    Повертає inventory_data цієї частини; частини об'єднуються merge_inventory_data
+    """
+    inventory_data = {}
+    for row in csv.reader(records, delimiter=delimiter):
+        _add_csv_row(inventory_data, row)
+    return inventory_data
+
+
 def parse_csv_file(file_path):
     """
     Парсить CSV файл з переобліком
     Повертає словник: {артикул: {розміри: set, кількість: int}}
     """
-    inventory_data = {}
-    
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            # Визначаємо роздільник (може бути ; або ,)
-            first_line = f.readline()
-            f.seek(0)
-            
-            delimiter = ';' if ';' in first_line else ','
-            
-            reader = csv.reader(f, delimiter=delimiter)
-            next(reader)  # Пропускаємо заголовок
-            
-            for row in reader:
-                if len(row) < 2:
-                    continue
-                
-                # Артикул з другого стовпця (індекс 1)
-                art = row[1].strip() if len(row) > 1 else ""
-                # Розмір з четвертого стовпця (індекс 3) - "Інформація"
-                size_info = row[3].strip() if len(row) > 3 else ""
-                # Кількість: F (індекс 5) "Відскановано", fallback на E (індекс 4) для 5-колонкового CSV
-                if len(row) > 5 and row[5].strip():
-                    amount = row[5].strip()
-                elif len(row) > 4 and row[4].strip():
-                    amount = row[4].strip()
-                else:
-                    amount = "1"
-                
-                if not art or _is_header_row(art):
-                    continue
-                
-                # Визначаємо категорію для перевірки, чи має товар розміри
-                categories = get_category_by_prefix(art)
-                category_has_sizes = True
-                if categories:
-                    category_has_sizes = has_sizes(categories[0])
-                
-                # Завжди витягуємо базовий артикул для пошуку (Ре-210.130 -> Ре-210)
-                # Частина після крапки (.130) — це варіант/розмір, не використовуємо при пошуку
-                base_art = extract_base_art(art)
-                
-                # Нормалізуємо артикул для порівняння
-                normalized_art = normalize_art(base_art)
-                
-                if normalized_art not in inventory_data:
-                    inventory_data[normalized_art] = {
-                        'sizes': {},  # {нормалізований_розмір: кількість} - для порівняння
-                        'original_sizes': {},  # {нормалізований_розмір: оригінальний_розмір} - для виведення
-                        'amount': 0,
-                        'original_art': base_art  # Зберігаємо базовий або повний артикул
-                    }
-                
-                # Додаємо розмір з колонки "Інформація" з кількістю
-                if size_info and size_info.strip() and category_has_sizes:
-                    # Товар з розмірами
-                    original_size = size_info.strip()  # Зберігаємо оригінальний розмір з CSV
-                    normalized_size = normalize_size(size_info)
-                    # Отримуємо кількість для цього розміру
-                    try:
-                        size_amount = int(amount) if amount else 1
-                    except ValueError:
-                        size_amount = 1
-                    
-                    # Додаємо або оновлюємо кількість для розміру
-                    if normalized_size in inventory_data[normalized_art]['sizes']:
-                        inventory_data[normalized_art]['sizes'][normalized_size] += size_amount
-                    else:
-                        inventory_data[normalized_art]['sizes'][normalized_size] = size_amount
-                    
-                    # Зберігаємо оригінальний розмір (якщо для цього нормалізованого розміру ще немає)
-                    if normalized_size not in inventory_data[normalized_art]['original_sizes']:
-                        inventory_data[normalized_art]['original_sizes'][normalized_size] = original_size
-                else:
-                    # Для товарів без розмірів - зберігаємо тільки загальну кількість в amount
-                    # sizes залишаємо порожнім для таких товарів
-                    pass
-                
-                # Додаємо загальну кількість
-                try:
-                    inventory_data[normalized_art]['amount'] += int(amount) if amount else 1
-                except ValueError:
-                    inventory_data[normalized_art]['amount'] += 1
-                    
+        with open(file_path, 'rb') as f:
+            return parse_csv_stream(f)
     except Exception as e:
         print(f"Помилка при парсингу CSV: {e}")
         return {}
-    
-    return inventory_data
+
+
+def parse_csv_stream(stream, parser=None):
+    """
+    Парсить CSV з переобліком з бінарного потоку (файл, член zip архіву) частинами по 64 КБ
+    parser - CsvInventoryParser або його підклас (за замовчуванням новий CsvInventoryParser)
+    """
+    if parser is None:
+        parser = CsvInventoryParser()
+    for chunk in iter(partial(stream.read, 65536), b''):
+        parser.write(chunk)
+    return parser.close()
+
+
+def merge_inventory_data(inventories):
+    """
+    Об'єднує результати parse_csv_file кількох файлів (пакетний переоблік) так,
+    ніби файли були одним файлом: кількості розмірів та amount сумуються,
+    оригінальний артикул та оригінальні розміри - з першого файлу, де вони зустрілись
+    """
+    merged = {}
+    for inventory_data in inventories:
+        for normalized_art, data_info in inventory_data.items():
+            merged_info = merged.get(normalized_art)
+            if merged_info is None:
+                merged[normalized_art] = {
+                    'sizes': dict(data_info['sizes']),
+                    'original_sizes': dict(data_info['original_sizes']),
+                    'amount': data_info['amount'],
+                    'original_art': data_info['original_art']
+                }
+                continue
+            
+            sizes = merged_info['sizes']
+            for size, quantity in data_info['sizes'].items():
+                sizes[size] = sizes.get(size, 0) + quantity
+            for size, original_size in data_info['original_sizes'].items():
+                merged_info['original_sizes'].setdefault(size, original_size)
+            merged_info['amount'] += data_info['amount']
+    return merged
 
 
 def get_art_sizes_from_sheets(client, art, categories):
     """
     Отримує розміри артикулу з Google таблиць
     Повертає set розмірів для даного артикулу
+    CategoryLoadError, якщо лист якоїсь категорії не вдалося прочитати (неповна відповідь не повертається)
     """
     all_sizes = set()
+    failed_categories = []
     normalized_art = normalize_art(art)
     
     allsize_values = {
@@ -619,8 +829,7 @@ def get_art_sizes_from_sheets(client, art, categories):
             if isinstance(sheet_numbers, list):
                 for sheet_number in sheet_numbers:
                     try:
-                        sheet = client.open_by_url(link).get_worksheet(sheet_number)
-                        all_data = sheet.get_all_values()
+                        all_data = get_worksheet_values(client, link, sheet_number)
                         
                         art_column = [row[details["art"] - 1] for row in all_data]
                         size_column = [
@@ -637,12 +846,14 @@ def get_art_sizes_from_sheets(client, art, categories):
                                 
                                 all_sizes.update(valid_sizes)
                     except Exception as e:
-                        print(f"Помилка при читанні таблиці {link}, sheet {sheet_number}: {e}")
+                        logging.error(f"Помилка при читанні таблиці {link}, sheet {sheet_number}: {e}")
+                        invalidate_spreadsheet(link)
+                        if category not in failed_categories:
+                            failed_categories.append(category)
                         continue
             else:
                 try:
-                    sheet = client.open_by_url(link).get_worksheet(sheet_numbers)
-                    all_data = sheet.get_all_values()
+                    all_data = get_worksheet_values(client, link, sheet_numbers)
                     
                     art_column = [row[details["art"] - 1] for row in all_data]
                     size_column = [
@@ -659,259 +870,235 @@ def get_art_sizes_from_sheets(client, art, categories):
                             
                             all_sizes.update(valid_sizes)
                 except Exception as e:
-                    print(f"Помилка при читанні таблиці {link}, sheet {sheet_numbers}: {e}")
+                    logging.error(f"Помилка при читанні таблиці {link}, sheet {sheet_numbers}: {e}")
+                    invalidate_spreadsheet(link)
+                    if category not in failed_categories:
+                        failed_categories.append(category)
                     continue
     
+    if failed_categories:
+        from utils.category_loader import load_error
+        raise load_error(failed_categories)
     return all_sizes
 
 
+ALLSIZE_VALUES = {
+    "28", "29", "30", "31", "32", "33", "34", "35", "36", "38", "40", "42", "44",
+    "XS", "S", "M", "L", "XL", "2XL", "3XL", "4XL", "5XL", "6XL", "7XL", "8XL",
+    "39", "40", "41", "42", "43", "44", "45", "46",
+    # Числові розміри (також додаємо їх буквені еквіваленти)
+    "48", "50", "52", "54", "56", "58", "60"
+}
+
+
+def get_category_worksheets(category):
+    """
+    Повертає список (посилання, індекс_листа) для категорії з config.data
+    "sheet" може бути числом або списком індексів листів
+    """
+    if category not in data:
+        return []
+
+    details = data[category]
+    sheet_numbers = details["sheet"]
+    if not isinstance(sheet_numbers, list):
+        sheet_numbers = [sheet_numbers]
+
+    return [(link, sheet_number) for link in details["link"] for sheet_number in sheet_numbers]
+
+
+def get_inventory_categories(inventory_data):
+    """Повертає множину категорій, які потрібно завантажити для звірки файлу"""
+    categories = set()
+    for data_info in inventory_data.values():
+        art_categories = get_category_by_prefix(data_info['original_art'])
+        if art_categories:
+            categories.update(art_categories)
+    return categories
+
+
+# Типи частин комірки розмірів для _classify_size_token
+_TOKEN_SKIP = 0
+_TOKEN_QUANTITY = 1
+_TOKEN_SIZE = 2
+
+
+@lru_cache(maxsize=4096)
+def _classify_size_token(token):
+    """
+    Класифікує одну частину комірки розмірів (між комами)
+    Повертає (_TOKEN_SKIP, None) - порожня частина або фільтр "/2",
+    (_TOKEN_QUANTITY, кількість) - "-2", кількість для попереднього розміру,
+    (_TOKEN_SIZE, нормалізований_розмір або None, якщо розмір невалідний)
+    """
+    if not token.strip():
+        return _TOKEN_SKIP, None
+
+    size_item = normalize_size(token).strip()
+    if not size_item:
+        return _TOKEN_SKIP, None
+    if size_item.startswith('-') and size_item[1:].isdigit():
+        return _TOKEN_QUANTITY, int(size_item[1:])
+    # Фільтри (починаються з / і містять тільки цифри)
+    if size_item.startswith('/') and size_item[1:].isdigit():
+        return _TOKEN_SKIP, None
+
+    # Нормалізуємо ще раз (числові -> буквені); також перевіряємо ненормалізований розмір
+    normalized_size = normalize_size(size_item)
+    if normalized_size in ALLSIZE_VALUES or size_item in ALLSIZE_VALUES:
+        return _TOKEN_SIZE, normalized_size
+    return _TOKEN_SIZE, None
+
+
+def iter_size_quantities(size_cell):
+    """
+    Розбирає комірку розмірів за один прохід
+    Формат: "M,-2, L," де -2 - це кількість для попереднього розміру M, розмір без кількості - 1 шт.
+    Генерує (розмір, кількість) в тому порядку, в якому розміри завершуються
+    """
+    current_size = None
+    for token in size_cell.split(','):
+        kind, value = _classify_size_token(token)
+        if kind == _TOKEN_SKIP:
+            continue
+        if kind == _TOKEN_QUANTITY:
+            if current_size is not None:
+                yield current_size, value
+            current_size = None
+            continue
+        # Попередній розмір без кількості - 1 шт.
+        if current_size is not None:
+            yield current_size, 1
+        current_size = value
+
+    if current_size is not None:
+        yield current_size, 1
+
+
+def iter_category_rows(category, all_data, columns=None):
+    """
+    Потоковий розбір рядків одного листа категорії (результат get_all_values), без проміжних списків колонок
+    columns - номери колонок (з 1) артикулу, розміру та кількості в рядках;
+    за замовчуванням беруться з config.data (для проєкції колонок вони інші)
+    Генерує (нормалізований_артикул, базовий_артикул, розмір, кількість):
+    для категорій без розмірів розмір None, кількість - з колонки amount;
+    для рядка без жодного валідного розміру - (..., None, 0), щоб артикул все одно був відомий
+    """
+    details = data[category]
+    # Перевіряємо, чи категорія має розміри
+    category_has_sizes = has_sizes(category)
+    if columns is None:
+        columns = (details["art"], details["size"], details["amount"])
+    art_index, size_index, amount_index = (column - 1 for column in columns)
+
+    for row in all_data:
+        row_length = len(row)
+        row_art = row[art_index] if row_length > art_index else ""
+        if not row_art or _is_header_row(row_art):
+            continue
+
+        base_art = extract_base_art(row_art)
+        normalized_art = normalize_art(base_art)
+
+        # Для товарів без розмірів читаємо amount (колонка amount, не size)
+        # Обробляємо формат "2, (,1,-склад)" — сумуємо всі числа
+        if not category_has_sizes:
+            row_amount = row[amount_index] if row_length > amount_index else ""
+            yield normalized_art, base_art, None, parse_amount_from_cell(row_amount)
+            continue
+
+        has_quantities = False
+        row_size = row[size_index] if row_length > size_index else ""
+        # Порожня комірка або "-" - товар існує, але без розмірів (наприклад, шапки)
+        if row_size != "-" and row_size.strip():
+            for size, quantity in iter_size_quantities(row_size):
+                has_quantities = True
+                yield normalized_art, base_art, size, quantity
+        if not has_quantities:
+            yield normalized_art, base_art, None, 0
+
+
+def parse_category_rows(category, all_data, all_arts_data=None, columns=None):
+    """
+    Розбирає рядки одного листа категорії (результат get_all_values)
+    columns - як у iter_category_rows
+    Додає артикули до all_arts_data (сумує розміри та кількість, якщо артикул вже є)
+    Повертає all_arts_data
+    """
+    if all_arts_data is None:
+        all_arts_data = {}
+
+    for normalized_art, base_art, size, quantity in iter_category_rows(category, all_data, columns):
+        # Структура: {'sizes': {розмір: кількість}, 'amount': кількість, 'original_art': оригінальний_артикул}
+        art_data = all_arts_data.get(normalized_art)
+        if art_data is None:
+            art_data = all_arts_data[normalized_art] = {
+                'sizes': {},
+                'amount': 0,
+                'original_art': base_art  # Базовий артикул для відображення
+            }
+        if size is None:
+            art_data['amount'] += quantity
+        else:
+            sizes_dict = art_data['sizes']
+            sizes_dict[size] = sizes_dict.get(size, 0) + quantity
+
+    return all_arts_data
+
+
+# Читання та розбір одного листа для категорії: одночасні звірки однієї категорії розбирають лист один раз
+category_sheet_flight = SingleFlight("category_sheet")
+
+
+def _load_category_sheet(client, category, link, sheet_number):
+    all_data = get_worksheet_values(client, link, sheet_number)
+    rows_parsed.inc(len(all_data), source="sheet")
+    return parse_category_rows(category, all_data)
+
+
 def load_all_arts_from_category(client, category):
     """
     Зчитує всі артикули та їх розміри з таблиць категорії одним запитом
     Повертає словник: {нормалізований_артикул: {'sizes': {розмір: кількість}, 'amount': кількість, 'original_art': артикул}}
     Для товарів без розмірів (шапки, сумки, ремні, кошельки) зберігаємо тільки amount
+    CategoryLoadError, якщо хоча б один лист категорії не вдалося прочитати
     """
+    from utils.sheets_planner import merge_arts_data
     all_arts_data = {}
-    
-    if category not in data:
-        return all_arts_data
-    
-    # Перевіряємо, чи категорія має розміри
-    category_has_sizes = has_sizes(category)
-    
-    allsize_values = {
-        "28", "29", "30", "31", "32", "33", "34", "35", "36", "38", "40", "42", "44",
-        "XS", "S", "M", "L", "XL", "2XL", "3XL", "4XL", "5XL", "6XL", "7XL", "8XL",
-        "39", "40", "41", "42", "43", "44", "45", "46",
-        # Числові розміри (також додаємо їх буквені еквіваленти)
-        "48", "50", "52", "54", "56", "58", "60"
-    }
-    
-    details = data[category]
-    for link in details["link"]:
-        sheet_numbers = details["sheet"]
-        
-        if isinstance(sheet_numbers, list):
-            for sheet_number in sheet_numbers:
-                try:
-                    sheet = client.open_by_url(link).get_worksheet(sheet_number)
-                    all_data = sheet.get_all_values()
-                    
-                    art_column = [row[details["art"] - 1] if len(row) > details["art"] - 1 else "" for row in all_data]
-                    size_column = [
-                        row[details["size"] - 1] if len(row) > details["size"] - 1 and row[details["size"] - 1].strip() else "-"
-                        for row in all_data
-                    ]
-                    amount_column = [
-                        row[details["amount"] - 1] if len(row) > details["amount"] - 1 else ""
-                        for row in all_data
-                    ]
-                    
-                    for i, row_art in enumerate(art_column):
-                        if not row_art or not row_art.strip() or _is_header_row(row_art):
-                            continue
-                        
-                        base_art = extract_base_art(row_art)
-                        normalized_art = normalize_art(base_art)
-                        row_size = size_column[i] if i < len(size_column) else "-"
-                        row_amount = amount_column[i] if i < len(amount_column) else ""
-                        
-                        # Логування для діагностики
-                        import logging
-                        logging.debug(f"[load_all_arts] Читаємо артикул: {row_art}, розміри: '{row_size}', кількість: '{row_amount}'")
-                        
-                        # Ініціалізуємо dict для артикулу, якщо його ще немає
-                        # Структура: {'sizes': {розмір: кількість}, 'amount': кількість, 'original_art': оригінальний_артикул}
-                        if normalized_art not in all_arts_data:
-                            all_arts_data[normalized_art] = {
-                                'sizes': {},
-                                'amount': 0,
-                                'original_art': base_art  # Базовий артикул для відображення
-                            }
-                        
-                        # Для товарів без розмірів читаємо amount (колонка amount, не size)
-                        # Обробляємо формат "2, (,1,-склад)" — сумуємо всі числа
-                        if not category_has_sizes:
-                            all_arts_data[normalized_art]['amount'] += parse_amount_from_cell(row_amount)
-                        # Обробляємо розміри тільки якщо вони є та категорія має розміри
-                        elif row_size and row_size != "-" and row_size.strip():
-                            # Використовуємо split_allsizes для правильного розбиття по комах (зберігає дефіси)
-                            row_sizes_list = split_allsizes(row_size)
-                            
-                            # Обробляємо розміри з кількістю
-                            # Формат: "M,-2, L," де -2 - це кількість для попереднього розміру M
-                            current_size = None
-                            for size_item in row_sizes_list:
-                                size_item = size_item.strip()
-                                # Пропускаємо порожні
-                                if not size_item:
-                                    continue
-                                
-                                # Перевіряємо, чи це кількість (починається з - і містить тільки цифри, наприклад "-2")
-                                if size_item.startswith('-') and size_item[1:].isdigit():
-                                    # Це кількість для попереднього розміру
-                                    if current_size is not None:
-                                        quantity = int(size_item[1:])  # Видаляємо мінус
-                                        sizes_dict = all_arts_data[normalized_art]['sizes']
-                                        if current_size in sizes_dict:
-                                            sizes_dict[current_size] += quantity
-                                        else:
-                                            sizes_dict[current_size] = quantity
-                                    current_size = None
-                                    continue
-                                
-                                # Пропускаємо фільтри (починаються з / і містить тільки цифри)
-                                if size_item.startswith('/') and size_item[1:].isdigit():
-                                    continue
-                                
-                                # Це розмір
-                                # Якщо був попередній розмір без кількості, додаємо його з кількістю 1
-                                if current_size is not None:
-                                    sizes_dict = all_arts_data[normalized_art]['sizes']
-                                    if current_size in sizes_dict:
-                                        sizes_dict[current_size] += 1
-                                    else:
-                                        sizes_dict[current_size] = 1
-                                
-                                adjusted_size = size_item
-                                
-                                # Нормалізуємо розмір (конвертуємо кирилицю в латиницю та числові в буквені)
-                                normalized_adjusted_size = normalize_size(adjusted_size)
-                                
-                                # Перевіряємо, чи це валідний розмір
-                                # Також перевіряємо оригінальний розмір (для числових розмірів)
-                                if normalized_adjusted_size in allsize_values or adjusted_size in allsize_values:
-                                    # Використовуємо нормалізований розмір (буквений еквівалент для числових)
-                                    current_size = normalized_adjusted_size
-                                else:
-                                    current_size = None
-                            
-                            # Додаємо останній розмір, якщо він не мав кількості
-                            if current_size is not None:
-                                if current_size in all_arts_data[normalized_art]['sizes']:
-                                    all_arts_data[normalized_art]['sizes'][current_size] += 1
-                                else:
-                                    all_arts_data[normalized_art]['sizes'][current_size] = 1
-                        # Якщо розмірів немає (порожній або "-"), артикул все одно додається з порожнім dict()
-                        # Це означає, що товар існує, але не має розмірів (наприклад, шапки)
-                except Exception as e:
-                    print(f"Помилка при читанні таблиці {link}, sheet {sheet_number}: {e}")
-                    continue
-        else:
-            try:
-                sheet = client.open_by_url(link).get_worksheet(sheet_numbers)
-                all_data = sheet.get_all_values()
-                
-                art_column = [row[details["art"] - 1] if len(row) > details["art"] - 1 else "" for row in all_data]
-                size_column = [
-                    row[details["size"] - 1] if len(row) > details["size"] - 1 and row[details["size"] - 1].strip() else "-"
-                    for row in all_data
-                ]
-                amount_column = [
-                    row[details["amount"] - 1] if len(row) > details["amount"] - 1 else ""
-                    for row in all_data
-                ]
-                
-                for i, row_art in enumerate(art_column):
-                    if not row_art or not row_art.strip() or _is_header_row(row_art):
-                        continue
-                    
-                    base_art = extract_base_art(row_art)
-                    normalized_art = normalize_art(base_art)
-                    row_size = size_column[i] if i < len(size_column) else "-"
-                    row_amount = amount_column[i] if i < len(amount_column) else ""
-                    
-                    # Логування для діагностики
-                    import logging
-                    logging.debug(f"[load_all_arts] Читаємо артикул: {row_art}, base: {base_art}, розміри: '{row_size}', кількість: '{row_amount}'")
-                    
-                    # Ініціалізуємо dict для артикулу, якщо його ще немає
-                    if normalized_art not in all_arts_data:
-                        all_arts_data[normalized_art] = {
-                            'sizes': {},
-                            'amount': 0,
-                            'original_art': base_art
-                        }
-                    
-                    # Для товарів без розмірів читаємо amount (колонка amount, не size)
-                    if not category_has_sizes:
-                        all_arts_data[normalized_art]['amount'] += parse_amount_from_cell(row_amount)
-                    elif row_size and row_size != "-" and row_size.strip():
-                        # Використовуємо split_allsizes для правильного розбиття по комах (зберігає дефіси)
-                        row_sizes_list = split_allsizes(row_size)
-                        
-                        # Обробляємо розміри з кількістю
-                        # Формат: "M,-2, L," де -2 - це кількість для попереднього розміру M
-                        current_size = None
-                        for size_item in row_sizes_list:
-                            size_item = size_item.strip()
-                            # Пропускаємо порожні
-                            if not size_item:
-                                continue
-                            
-                            # Перевіряємо, чи це кількість (починається з - і містить тільки цифри, наприклад "-2")
-                            if size_item.startswith('-') and size_item[1:].isdigit():
-                                # Це кількість для попереднього розміру
-                                if current_size is not None:
-                                    quantity = int(size_item[1:])  # Видаляємо мінус
-                                    sizes_dict = all_arts_data[normalized_art]['sizes']
-                                    if current_size in sizes_dict:
-                                        sizes_dict[current_size] += quantity
-                                    else:
-                                        sizes_dict[current_size] = quantity
-                                current_size = None
-                                continue
-                            
-                            # Пропускаємо фільтри (починаються з / і містять тільки цифри)
-                            if size_item.startswith('/') and size_item[1:].isdigit():
-                                continue
-                            
-                            # Це розмір
-                            # Якщо був попередній розмір без кількості, додаємо його з кількістю 1
-                            if current_size is not None:
-                                sizes_dict = all_arts_data[normalized_art]['sizes']
-                                if current_size in sizes_dict:
-                                    sizes_dict[current_size] += 1
-                                else:
-                                    sizes_dict[current_size] = 1
-                            
-                            adjusted_size = size_item
-                            
-                            # Нормалізуємо розмір (конвертуємо кирилицю в латиницю та числові в буквені)
-                            normalized_adjusted_size = normalize_size(adjusted_size)
-                            
-                            # Перевіряємо, чи це валідний розмір
-                            # Також перевіряємо оригінальний розмір (для числових розмірів)
-                            if normalized_adjusted_size in allsize_values or adjusted_size in allsize_values:
-                                # Використовуємо нормалізований розмір (буквений еквівалент для числових)
-                                current_size = normalized_adjusted_size
-                            else:
-                                current_size = None
-                        
-                        # Додаємо останній розмір, якщо він не мав кількості
-                        if current_size is not None:
-                            if current_size in all_arts_data[normalized_art]['sizes']:
-                                all_arts_data[normalized_art]['sizes'][current_size] += 1
-                            else:
-                                all_arts_data[normalized_art]['sizes'][current_size] = 1
-                    # Якщо розмірів немає (порожній або "-"), артикул все одно додається з порожнім dict()
-                    # Це означає, що товар існує, але не має розмірів (наприклад, шапки)
-            except Exception as e:
-                print(f"Помилка при читанні таблиці {link}, sheet {sheet_numbers}: {e}")
-                continue
-    
+    failed = False
+
+    for link, sheet_number in get_category_worksheets(category):
+        try:
+            sheet_arts_data = category_sheet_flight.do(
+                (category, get_spreadsheet_id(link), sheet_number),
+                _load_category_sheet, client, category, link, sheet_number
+            )
+        except Exception as e:
+            logging.error(f"Помилка при читанні таблиці {link}, sheet {sheet_number}: {e}")
+            invalidate_spreadsheet(link)
+            failed = True
+            continue
+        # Розібраний лист спільний для одночасних викликів - в результат категорії копіюємо
+        merge_arts_data(all_arts_data, sheet_arts_data)
+
+    if failed:
+        from utils.category_loader import load_error
+        raise load_error([category])
     return all_arts_data
 
 
-def compare_inventory_with_sheets(client, inventory_data):
+def compare_inventory_with_sheets(client, inventory_data, category_sheet_data=None, trace=None):
     """
     Порівнює дані з файлу з даними в Google таблицях
     Зчитує всю таблицю одним запитом для оптимізації
+    category_sheet_data - вже завантажені дані категорій {категорія: результат load_all_arts_from_category}
+    (наприклад, з асинхронного завантажувача); відсутні категорії дочитуються через client (batchGet)
+    trace - ReconciliationTrace для діагностики (utils.trace); None - без діагностики
     Повертає словник з результатами порівняння
     """
     results = {
-        'missing_sizes': {},  # {артикул: [розміри яких немає]}
-        'extra_sizes': {},    # {артикул: [розміри яких більше]}
+        'missing_sizes': {},  # {артикул: [SizeDiff розмірів, яких не вистачає]}
+        'extra_sizes': {},    # {артикул: [SizeDiff розмірів, яких більше]}
         'not_found': [],      # Артикули які не знайдені в таблицях
         'not_scanned': {},    # {артикул: {розміри: кількість}} - є в таблицях, але немає в файлі
         'matched': []         # Артикули які повністю співпадають
@@ -928,6 +1115,8 @@ def compare_inventory_with_sheets(client, inventory_data):
         
         if not categories:
             results['not_found'].append(original_art)
+            if trace is not None and trace.wants(normalized_art):
+                trace.event("not_found", original_art, reason="unknown_prefix")
             continue
         
         # Для артикулів з кількома категоріями додаємо їх до всіх категорій
@@ -938,15 +1127,24 @@ def compare_inventory_with_sheets(client, inventory_data):
             arts_by_category[category].append((normalized_art, data_info))
     
     # Зчитуємо дані кожної категорії ОДИН РАЗ (без зайвих API-запитів)
-    category_sheet_data = {}
+    # Відсутні категорії читаємо одним batchGet запитом на таблицю
+    category_sheet_data = dict(category_sheet_data or {})
+    missing_categories = [category for category in arts_by_category if category not in category_sheet_data]
+    if missing_categories:
+        from utils.category_loader import load_categories_sync
+        category_sheet_data.update(load_categories_sync(client, missing_categories).data)
+
     category_has_sizes_map = {}
     for category in arts_by_category:
-        category_sheet_data[category] = load_all_arts_from_category(client, category)
         category_has_sizes_map[category] = has_sizes(category)
     
     # Відстежуємо оброблені артикули, щоб уникнути дублювання для артикулів з кількома категоріями
     processed_arts = set()
     
+    # Порівняння розмірів зі спільним кешем нормалізації на всю звірку
+    from utils.reconciliation_core import SizeComparator, normalize_size_quantities
+    size_comparator = SizeComparator()
+    
     # Для кожної категорії порівнюємо артикули з вже завантаженими даними
     for category, arts_list in arts_by_category.items():
         all_sheet_arts = category_sheet_data[category]
@@ -984,6 +1182,8 @@ def compare_inventory_with_sheets(client, inventory_data):
                 if sheet_art_data is None:
                     results['not_found'].append(original_art)
                     processed_arts.add(normalized_art)
+                    if trace is not None and trace.wants(normalized_art):
+                        trace.event("not_found", original_art, categories=art_categories)
                     continue
             
             # Позначаємо артикул як оброблений
@@ -992,19 +1192,15 @@ def compare_inventory_with_sheets(client, inventory_data):
             # Для товарів без розмірів порівнюємо amount
             if not category_has_sizes:
                 sheet_amount = sheet_art_data.get('amount', 0) if isinstance(sheet_art_data, dict) else 0
-                
-                import logging
-                logging.info(f"[DEBUG] Артикул без розмірів: {original_art}")
-                logging.info(f"[DEBUG] Кількість з файлу: {file_amount}, з таблиці: {sheet_amount}")
+                if trace is not None and trace.wants(normalized_art):
+                    trace.event("compare_amount", original_art, file_amount=file_amount, sheet_amount=sheet_amount)
                 
                 if file_amount == sheet_amount:
                     results['matched'].append(original_art)
                 elif file_amount < sheet_amount:
-                    diff = sheet_amount - file_amount
-                    results['missing_sizes'][original_art] = [f"Недостача {diff} шт"]
+                    results['missing_sizes'][original_art] = [SizeDiff(original_art, '', sheet_amount, file_amount)]
                 else:
-                    diff = file_amount - sheet_amount
-                    results['extra_sizes'][original_art] = [f"Надлишок {diff} шт"]
+                    results['extra_sizes'][original_art] = [SizeDiff(original_art, '', sheet_amount, file_amount)]
                 continue
             
             # Отримуємо розміри з даних таблиці
@@ -1014,125 +1210,35 @@ def compare_inventory_with_sheets(client, inventory_data):
                 # Старий формат (тільки sizes)
                 sheet_sizes_raw = sheet_art_data
             
-            # Нормалізуємо ключі розмірів для правильного порівняння
-            # Створюємо новий dict з нормалізованими ключами
-            sheet_sizes = {}
-            for size_key, qty in sheet_sizes_raw.items():
-                if size_key == '':
-                    # Пропускаємо порожній розмір
-                    continue
-                # Очищаємо та нормалізуємо розмір
-                size_key_clean = str(size_key).strip()
-                normalized_key = normalize_size(size_key_clean)
-                if normalized_key:  # Перевіряємо, що нормалізація дала результат
-                    if normalized_key in sheet_sizes:
-                        sheet_sizes[normalized_key] += qty
-                    else:
-                        sheet_sizes[normalized_key] = qty
-            
-            # Також нормалізуємо ключі в file_sizes для порівняння
-            file_sizes_normalized = {}
-            for size_key, qty in file_sizes.items():
-                if size_key == '':
-                    # Пропускаємо порожній розмір
-                    continue
-                # Очищаємо та нормалізуємо розмір
-                size_key_clean = str(size_key).strip()
-                normalized_key = normalize_size(size_key_clean)
-                if normalized_key:  # Перевіряємо, що нормалізація дала результат
-                    if normalized_key in file_sizes_normalized:
-                        file_sizes_normalized[normalized_key] += qty
-                    else:
-                        file_sizes_normalized[normalized_key] = qty
-            
-            # ДІАГНОСТИКА: Логуємо для діагностики проблеми
-            import logging
-            logging.info(f"[DEBUG] Артикул: {original_art}")
-            logging.info(f"[DEBUG] Розміри з файлу (оригінальні): {file_sizes}")
-            logging.info(f"[DEBUG] Розміри з файлу (нормалізовані): {file_sizes_normalized}")
-            logging.info(f"[DEBUG] Розміри з таблиці (оригінальні): {sheet_sizes_raw}")
-            logging.info(f"[DEBUG] Розміри з таблиці (нормалізовані): {sheet_sizes}")
-            
-            # Для товарів без розмірів (як шапки) - sheet_sizes може бути порожнім dict()
-            # Це означає, що артикул існує, але не має розмірів
-            
-            # Порівнюємо розміри з кількістю
-            missing_sizes_list = []  # Розміри, яких немає або не вистачає
-            extra_sizes_list = []    # Розміри, яких більше ніж потрібно
+            missing, extra = size_comparator.compare(original_art, file_sizes, sheet_sizes_raw)
             
-            # Перевіряємо всі розміри з таблиці
-            for size, sheet_qty in sheet_sizes.items():
-                file_qty = file_sizes_normalized.get(size, 0)
-                if file_qty < sheet_qty:
-                    # Недостача: в таблиці більше, ніж в файлі
-                    diff = sheet_qty - file_qty
-                    if diff > 0:
-                        if diff == 1:
-                            missing_sizes_list.append(size)
-                        else:
-                            missing_sizes_list.append(f"{size} (потрібно ще {diff})")
-            
-            # Перевіряємо всі розміри з файлу
-            for size, file_qty in file_sizes_normalized.items():
-                sheet_qty = sheet_sizes.get(size, 0)
-                logging.info(f"[DEBUG] Порівняння розміру '{size}': файл={file_qty}, таблиця={sheet_qty}")
-                if sheet_qty == 0:
-                    # Надлишок: розмір є в файлі, але відсутній в таблиці
-                    logging.info(f"[DEBUG] Розмір '{size}' відсутній в таблиці - додаємо до extra")
-                    if file_qty == 1:
-                        extra_sizes_list.append(size)
-                    else:
-                        extra_sizes_list.append(f"{size} ({file_qty} шт)")
-                elif file_qty > sheet_qty:
-                    # Надлишок: в файлі більше, ніж в таблиці
-                    diff = file_qty - sheet_qty
-                    logging.info(f"[DEBUG] Розмір '{size}': в файлі більше на {diff} - додаємо до extra")
-                    if diff > 0:
-                        if diff == 1:
-                            extra_sizes_list.append(size)
-                        else:
-                            extra_sizes_list.append(f"{size} (більше на {diff})")
-                elif file_qty == sheet_qty:
-                    logging.info(f"[DEBUG] Розмір '{size}': співпадає (файл={file_qty}, таблиця={sheet_qty})")
-                else:
-                    logging.info(f"[DEBUG] Розмір '{size}': в таблиці більше (файл={file_qty}, таблиця={sheet_qty})")
-            
-            # Перевіряємо, чи всі розміри співпадають
-            all_match = True
-            # Перевіряємо, чи всі розміри з таблиці є в файлі з правильною кількістю
-            for size, sheet_qty in sheet_sizes.items():
-                file_qty = file_sizes_normalized.get(size, 0)
-                if file_qty != sheet_qty:
-                    all_match = False
-                    logging.info(f"[DEBUG] all_match=False: розмір '{size}' не співпадає (файл={file_qty}, таблиця={sheet_qty})")
-                    break
-            # Перевіряємо, чи всі розміри з файлу є в таблиці з правильною кількістю
-            if all_match:
-                for size, file_qty in file_sizes_normalized.items():
-                    sheet_qty = sheet_sizes.get(size, 0)
-                    if file_qty != sheet_qty:
-                        all_match = False
-                        logging.info(f"[DEBUG] all_match=False: розмір '{size}' не співпадає (файл={file_qty}, таблиця={sheet_qty})")
-                        break
+            # Діагностика тільки для артикулів, які відстежуються (trace)
+            traced = trace is not None and trace.wants(normalized_art)
+            if traced:
+                trace.event(
+                    "compare_sizes", original_art,
+                    file_sizes=file_sizes,
+                    file_sizes_normalized=normalize_size_quantities(file_sizes),
+                    sheet_sizes=sheet_sizes_raw,
+                    sheet_sizes_normalized=normalize_size_quantities(sheet_sizes_raw)
+                )
             
-            logging.info(f"[DEBUG] all_match={all_match}, missing_sizes_list={missing_sizes_list}, extra_sizes_list={extra_sizes_list}")
+            if traced:
+                trace.event(
+                    "verdict", original_art,
+                    all_match=not missing and not extra,
+                    missing_sizes=[format_size_diff(size_diff) for size_diff in missing],
+                    extra_sizes=[format_size_diff(size_diff) for size_diff in extra]
+                )
             
-            # Для товарів без розмірів: якщо обидва порожні - це співпадіння
-            if not file_sizes_normalized and not sheet_sizes:
+            if not missing and not extra:
+                # Всі розміри співпадають (або обидва порожні - товар без розмірів)
                 results['matched'].append(original_art)
-            elif all_match and not missing_sizes_list and not extra_sizes_list:
-                # Всі розміри співпадають
-                results['matched'].append(original_art)
-            else:
-                # Якщо є недостача або надлишок - додаємо до відповідних категорій
-                if missing_sizes_list:
-                    results['missing_sizes'][original_art] = missing_sizes_list
-                if extra_sizes_list:
-                    results['extra_sizes'][original_art] = extra_sizes_list
-                # Якщо немає ні недостачі, ні надлишку, але all_match = False
-                # (наприклад, через порожні розміри), додаємо до matched
-                if not missing_sizes_list and not extra_sizes_list:
-                    results['matched'].append(original_art)
+                continue
+            if missing:
+                results['missing_sizes'][original_art] = missing
+            if extra:
+                results['extra_sizes'][original_art] = extra
         
         # Знаходимо артикули, які є в таблицях, але немає в файлі
         for sheet_normalized_art, sheet_art_data in all_sheet_arts.items():
@@ -1153,6 +1259,8 @@ def compare_inventory_with_sheets(client, inventory_data):
                     if sheet_amount > 0:
                         # Створюємо структуру для товарів без розмірів
                         results['not_scanned'][original_sheet_art] = {'': sheet_amount}
+                        if trace is not None and trace.wants(sheet_normalized_art):
+                            trace.event("not_scanned", original_sheet_art, sheet_amount=sheet_amount)
                     continue
                 
                 # Пропускаємо артикули без розмірів (якщо sizes порожній dict або містить тільки порожній ключ)
@@ -1161,5 +1269,39 @@ def compare_inventory_with_sheets(client, inventory_data):
                     continue
                 
                 results['not_scanned'][original_sheet_art] = sheet_sizes_data
+                if trace is not None and trace.wants(sheet_normalized_art):
+                    trace.event("not_scanned", original_sheet_art, sheet_sizes=sheet_sizes_data)
     
     return results
+
+
+def _may_be_not_scanned(sheet_art_data):
+    """
+    Чи може запис таблиці потрапити в results['not_scanned'] compare_inventory_with_sheets,
+    якщо артикулу немає в файлі: товар з кількістю або з розмірами (старий формат - завжди)
+    """
+    if not isinstance(sheet_art_data, dict) or 'original_art' not in sheet_art_data:
+        return True
+    if sheet_art_data.get('amount', 0) > 0:
+        return True
+    sheet_sizes_data = sheet_art_data.get('sizes', {})
+    return bool(sheet_sizes_data) and not (len(sheet_sizes_data) == 1 and '' in sheet_sizes_data)
+
+
+def select_sheet_data_for_inventory(inventory_data, category_sheet_data):
+    """
+    Частина category_sheet_data, від якої залежить результат compare_inventory_with_sheets для файлу:
+    категорії артикулів файлу, в них - артикули файлу та записи, які можуть бути в not_scanned
+    (для передачі в пул процесів - аргументи серіалізуються pickle)
+    """
+    selected = {}
+    for category in get_inventory_categories(inventory_data):
+        all_sheet_arts = category_sheet_data.get(category)
+        if all_sheet_arts is None:
+            continue
+        selected[category] = {
+            normalized_art: sheet_art_data
+            for normalized_art, sheet_art_data in all_sheet_arts.items()
+            if normalized_art in inventory_data or _may_be_not_scanned(sheet_art_data)
+        }
+    return selected
@@ -0,0 +1,85 @@
+import asyncio
+import threading
+from utils.metrics import metrics
+
+coalesced_requests = metrics.counter(
+    "coalesced_requests_total", "Виклики, які приєдналися до вже запущеного однакового завантаження"
+)
+
+
+class _Call:
+    """Один виклик, який виконується: результат або виняток для всіх, хто його чекає"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Об'єднує одночасні однакові виклики з різних потоків (пул потоків звірки):
+    перший виклик з ключем виконує func, решта з тим самим ключем чекають і отримують
+    той самий результат (або той самий виняток). Результат не кешується - після завершення
+    наступний виклик виконує func знову. Спільний результат викликачі не повинні змінювати.
+    name - назва в метриці coalesced_requests_total
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func, *args):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            coalesced_requests.inc(flight=self.name)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class AsyncSingleFlight:
+    """
+    Те саме для event loop: перший виклик запускає корутину окремою задачею, решта чекають її результату.
+    Скасування одного з викликачів не скасовує задачу для інших (asyncio.shield)
+    """
+
+    def __init__(self, name):
+        self.name = name
+        # {ключ: Task} - завантаження, які вже виконуються
+        self._tasks = {}
+
+    def _forget(self, key, task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        # Виняток отримують викликачі; якщо всі вони скасовані - не логуємо "never retrieved"
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key, coroutine_function, *args):
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(coroutine_function(*args))
+            self._tasks[key] = task
+            task.add_done_callback(lambda done_task: self._forget(key, done_task))
+        else:
+            coalesced_requests.inc(flight=self.name)
+        return await asyncio.shield(task)
@@ -0,0 +1,98 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from config import snapshot_db_path, snapshots_enabled
+
+
+class SnapshotStore:
+    """
+    Локальне сховище розібраних листів категорій (SQLite на диску).
+    Ключ - (категорія, spreadsheet_id, індекс_листа, колонки), версія - modifiedTime таблиці з Google Drive.
+    Якщо таблиця не змінювалась, звірка бере дані з диску без завантаження листів,
+    і вони переживають перезапуски бота.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self):
+        # Окреме з'єднання на кожну операцію - сховище використовується з різних потоків
+        connection = sqlite3.connect(self.path, timeout=30)
+        if not self._initialized:
+            with self._lock:
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS snapshots ("
+                    " category TEXT NOT NULL,"
+                    " spreadsheet_id TEXT NOT NULL,"
+                    " sheet_number INTEGER NOT NULL,"
+                    " columns TEXT NOT NULL,"
+                    " version TEXT NOT NULL,"
+                    " payload BLOB NOT NULL,"
+                    " saved_at REAL NOT NULL,"
+                    " PRIMARY KEY (category, spreadsheet_id, sheet_number, columns))"
+                )
+                connection.commit()
+                self._initialized = True
+        return connection
+
+    def get(self, category, spreadsheet_id, sheet_number, columns, version):
+        """Повертає розібраний лист, якщо збережена версія збігається з version, інакше None"""
+        connection = self._connect()
+        try:
+            row = connection.execute(
+                "SELECT version, payload FROM snapshots"
+                " WHERE category = ? AND spreadsheet_id = ? AND sheet_number = ? AND columns = ?",
+                (category, spreadsheet_id, sheet_number, columns)
+            ).fetchone()
+        finally:
+            connection.close()
+
+        if row is None or row[0] != version:
+            return None
+        return json.loads(zlib.decompress(row[1]).decode('utf-8'))
+
+    def put(self, category, spreadsheet_id, sheet_number, columns, version, sheet_arts_data):
+        """Зберігає (або замінює) розібраний лист з версією таблиці"""
+        payload = zlib.compress(json.dumps(sheet_arts_data, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        connection = self._connect()
+        try:
+            with self._lock:
+                connection.execute(
+                    "INSERT OR REPLACE INTO snapshots"
+                    " (category, spreadsheet_id, sheet_number, columns, version, payload, saved_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (category, spreadsheet_id, sheet_number, columns, version, payload, time.time())
+                )
+                connection.commit()
+        finally:
+            connection.close()
+
+    def invalidate(self, spreadsheet_id=None):
+        """Видаляє знімки однієї таблиці або всі знімки"""
+        connection = self._connect()
+        try:
+            with self._lock:
+                if spreadsheet_id is None:
+                    connection.execute("DELETE FROM snapshots")
+                else:
+                    connection.execute("DELETE FROM snapshots WHERE spreadsheet_id = ?", (spreadsheet_id,))
+                connection.commit()
+        finally:
+            connection.close()
+
+
+def _create_snapshot_store():
+    if not snapshots_enabled:
+        return None
+    directory = os.path.dirname(snapshot_db_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    return SnapshotStore(snapshot_db_path)
+
+
+snapshot_store = _create_snapshot_store()
@@ -0,0 +1,78 @@
+import itertools
+import json
+import logging
+import zlib
+from config import trace_arts, trace_sample_rate
+from utils.sheets_utils import extract_base_art, normalize_art
+
+trace_logger = logging.getLogger("reconciliation.trace")
+# Увімкнений трейс пишеться незалежно від загального LOG_LEVEL
+trace_logger.setLevel(logging.INFO)
+
+_request_ids = itertools.count(1)
+
+# {user_id: set нормалізованих артикулів або None (всі артикули)} - трейс, увімкнений командою /trace
+_user_traces = {}
+
+
+def _normalize_arts(arts):
+    return {normalize_art(extract_base_art(art)) for art in arts if art and art.strip()}
+
+
+class ReconciliationTrace:
+    """
+    Діагностика однієї звірки: кожна подія - один JSON рядок в логері reconciliation.trace
+    з ідентифікатором запиту, етапом, артикулом та даними етапу.
+
+    arts - нормалізовані артикули, які відстежуються (None - відбір за sample_rate)
+    sample_rate - частка артикулів (0..1); відбір детермінований по артикулу,
+    тому той самий артикул відстежується в усіх звірках
+    Коли трейс вимкнено, звірка отримує None і не витрачає нічого, крім перевірки на None.
+    """
+
+    def __init__(self, request_id, arts=None, sample_rate=1.0):
+        self.request_id = request_id
+        self.arts = arts or None
+        self.sample_rate = sample_rate
+        self._threshold = int(sample_rate * 10000)
+
+    def wants(self, normalized_art):
+        """Чи відстежується артикул"""
+        if self.arts is not None:
+            return normalized_art in self.arts
+        if self._threshold >= 10000:
+            return True
+        return zlib.crc32(normalized_art.encode('utf-8')) % 10000 < self._threshold
+
+    def event(self, stage, art, **fields):
+        """Записує подію етапу звірки для артикулу"""
+        trace_logger.info(json.dumps(
+            {"request": self.request_id, "stage": stage, "art": art, **fields},
+            ensure_ascii=False,
+            default=str
+        ))
+
+
+def enable_user_trace(user_id, arts=()):
+    """Вмикає трейс звірок користувача (для вказаних артикулів або для всіх)"""
+    _user_traces[user_id] = _normalize_arts(arts) or None
+
+
+def disable_user_trace(user_id):
+    """Вимикає трейс звірок користувача; повертає True, якщо він був увімкнений"""
+    return _user_traces.pop(user_id, False) is not False
+
+
+def create_trace(user_id):
+    """
+    Трейс для нової звірки користувача або None, якщо діагностика вимкнена
+    Трейс користувача (/trace) має пріоритет над глобальними TRACE_ARTS / TRACE_SAMPLE_RATE
+    """
+    request_id = f"{user_id}-{next(_request_ids)}"
+    if user_id in _user_traces:
+        return ReconciliationTrace(request_id, _user_traces[user_id])
+    if trace_arts:
+        return ReconciliationTrace(request_id, _normalize_arts(trace_arts))
+    if trace_sample_rate > 0:
+        return ReconciliationTrace(request_id, sample_rate=trace_sample_rate)
+    return None